@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+import sys
+import time
+
+import argparse
+
+libs_dir = './libs'
+sys.path.append(libs_dir)
+
+from settings import *
+from cdp_capture import CaptureError, get_capture_time, is_pcap, parse_time, read_capture, read_pcap
+from columnar_export import ColumnarExporter
+from retention_policy import parse_type
+
+#####################################################
+#Parse command line options and store appropriately #
+#####################################################
+parser = argparse.ArgumentParser(description=("Exports the data items of CDP recordings, capture files written by " +
+                                              "CuwbMonitor.py --record or pcap files, into numpy columns per data item type"))
+
+parser.add_argument("captures", nargs='+', metavar="CAPTURE_FILE",
+                    help="Capture files (.cdpcap) or pcap files, exported in the order given")
+parser.add_argument("-o", "--output", action="store", dest='output', required=True, metavar="DIRECTORY",
+                    help="Directory the data item types are exported to")
+parser.add_argument("-f", "--format", action="store", choices=('npz', 'npy'), dest='format', default='npz',
+                    help="One .npz archive per type, or one directory of memory mappable .npy files per type (default: npz)")
+parser.add_argument("--compress", action="store_true", dest='compress',
+                    help="Compress the .npz archives")
+parser.add_argument("-t", "--types", action="store", dest='types', metavar="TYPE[,TYPE...]",
+                    help="Only export these data item types, by name or number, e.g. PositionV3,0x0139")
+parser.add_argument("-d", "--device-id", action="append", type=lambda value: int(value, 0), dest='device_ids',
+                    help="Only export the packets of this device, repeatable")
+parser.add_argument("--start", action="store", dest='start',
+                    help="Only export the packets received from this date and time, or time of day on the day of the first file, e.g. 14:02")
+parser.add_argument("--end", action="store", dest='end',
+                    help="Only export the packets received before this date and time, or time of day, e.g. 14:05")
+
+
+def get_reference_time(path):
+    """Time of day ranges are relative to the day a capture was started, or of the first packet of a pcap."""
+    if not is_pcap(path):
+        return get_capture_time(path)
+    for timestamp, key, datagram in read_pcap(path):
+        return timestamp
+    return time.time()
+
+
+############################
+## MAIN CODE STARTS HERE  ##
+############################
+
+if __name__ == "__main__":
+
+    option_dict = vars(parser.parse_args())
+
+    types = None
+    if option_dict['types'] is not None:
+        try:
+            types = {parse_type(name.strip()) for name in option_dict['types'].split(',')}
+        except ValueError as e:
+            parser.error(str(e))
+
+    start = end = None
+    if option_dict['start'] is not None or option_dict['end'] is not None:
+        try:
+            reference = get_reference_time(option_dict['captures'][0])
+            start, end = (None if value is None else parse_time(value, reference) for value in (option_dict['start'], option_dict['end']))
+        except (OSError, CaptureError) as e:
+            parser.error("Invalid time range: {}".format(e))
+
+    exporter = ColumnarExporter(option_dict['output'], option_dict['format'] == 'npz', option_dict['compress'],
+                                serials=option_dict['device_ids'], types=types)
+    export_start = time.perf_counter()
+    for path in option_dict['captures']:
+        print("Exporting {}".format(path))
+        try:
+            if is_pcap(path):
+                datagrams = read_pcap(path, start, end)
+            else:
+                datagrams = read_capture(path, start, end, option_dict['device_ids'], types)
+            for timestamp, key, datagram in datagrams:
+                exporter.add_datagram(timestamp, datagram)
+        except (OSError, CaptureError) as e:
+            print("Unable to export {}: {}".format(path, e))
+    rows = exporter.close()
+    elapsed = time.perf_counter() - export_start
+
+    for name, count in sorted(rows.items()):
+        print("{:<32} {:>12} rows".format(name, count))
+    if exporter.errors:
+        print("{} datagrams were not CDP packets".format(exporter.errors))
+    print("Exported {} rows from {} datagrams in {:.1f} s to {}".format(sum(rows.values()), exporter.datagrams, elapsed, option_dict['output']))
@@ -4,27 +4,29 @@
 # Licensed under: creativecommons.org/licenses/by/4.0
 
 import sys
+import atexit
 import signal
-import pyqtgraph as pg
 
 import argparse
 
 libs_dir = './libs'
 sys.path.append(libs_dir)
 
+# Qt and the plots are only imported when there is a display, see --headless
+import settings
 from settings import *
 from network_objects import *
 from socket_processing import *
-from plots import *
-from ui_main_window import *
+from capture_replay import CaptureReplay
+from cdp_capture import CAPTURE_CODECS, CaptureError, CaptureRecorder, get_capture_time, parse_time
+from memory_budget import format_bytes
+from retention_policy import parse_bytes
 
 VERSION = '1.0.X'
 UDP_IP = None
 UDP_PORT = None
 IFACE_IP = None
 
-print("CuwbMonitor.py v{}".format(VERSION))
-
 #####################################################
 #Parse command line options and store appropriately #
 #####################################################
@@ -37,37 +39,79 @@ parser.add_argument("-u", "--udp", action="store",
 parser.add_argument("-i", "--iface-ip", action="store",
                     dest="iface_ip", help="Interface IP for VLAN")
 parser.add_argument("-p", "--processes", action="store", type=int, dest='num_processes',
-                    default=1, help="Set the number of processes to use for CDP decoding.")
+                    default=1, help="Set the number of processes to use for CDP decoding. Only the decoding runs in "
+                    "them: duplicate filtering, sequence tracking and node updates stay in this process and bound the ingest rate. "
+                    "Needs Python 3.8+ above 1.")
+parser.add_argument("-e", "--engine", action="store", choices=INGEST_ENGINES, dest='engine',
+                    help="Receive with one thread per CDP stream or with a single event loop thread (default: {})".format(THREAD_ENGINE))
+parser.add_argument("-r", "--rcvbuf", action="store", type=int, dest='rcvbuf',
+                    help="Socket receive buffer size in bytes for each CDP stream (default: {})".format(SOCKET_RECEIVE_BUFFER_SIZE))
+parser.add_argument("-q", "--queue-size", action="store", type=int, dest='queue_size',
+                    help="Number of datagrams each CDP stream can hold while waiting to be decoded (default: {})".format(RECEIVE_BUFFER_COUNT))
+parser.add_argument("--overflow", action="store", choices=DatagramRing.overflow_policies, dest='overflow',
+                    help="What to do with datagrams when a CDP stream queue is full (default: {}, or {} with --processes above 1, "
+                    "which cannot drop datagrams already handed to the decoding processes)".format(DatagramRing.DROP_OLDEST, DatagramRing.DROP_NEWEST))
+parser.add_argument("--dedup-window", action="store", type=float, dest='dedup_window',
+                    help="Seconds a packet is remembered to drop copies received on other interfaces, 0 disables (default: {})".format(DUPLICATE_WINDOW))
+parser.add_argument("--lazy-decode", action="store_true", dest='lazy_decode',
+                    help="Store raw data items and only decode them when a window looks at them")
+parser.add_argument("--retention-file", action="store", dest='retention_file',
+                    help="JSON file of the data items kept per type, e.g. {\"default\": {\"count\": 1000}, \"AccelerometerV2\": {\"age\": 10}}")
+parser.add_argument("--retain", action="append", dest='retain', default=[], metavar="TYPE:LIMIT=VALUE[,...]",
+                    help="Data items kept for a type name, number or 'default', by count, age in seconds or bytes (k, M, G), e.g. DeviceStatus:count=60,bytes=64k. Repeatable, overrides --retention-file")
+parser.add_argument("--memory-budget", action="store", dest='memory_budget',
+                    help="Bytes (k, M, G) of data item history kept over every node before the least recently used is evicted, 0 never evicts (default: {}M)".format(MEMORY_BUDGET // 1024**2))
+parser.add_argument("--record", action="store", dest='record', metavar="DIRECTORY",
+                    help="Write every received CDP datagram, with its reception time and listening address, to capture files in DIRECTORY")
+parser.add_argument("--record-rotate-size", action="store", dest='record_rotate_size',
+                    help="Bytes (k, M, G) at which a new capture file is started, 0 never rotates by size (default: {}M)".format(CAPTURE_ROTATE_SIZE // 1024**2))
+parser.add_argument("--record-rotate-time", action="store", type=float, dest='record_rotate_time',
+                    help="Seconds after which a new capture file is started, 0 never rotates by time (default: {})".format(CAPTURE_ROTATE_TIME))
+parser.add_argument("--record-compression", action="store", choices=sorted(CAPTURE_CODECS), dest='record_compression',
+                    help="Codec every block of the capture files is compressed with (default: {})".format(CAPTURE_COMPRESSION))
+parser.add_argument("--record-level", action="store", type=int, dest='record_level',
+                    help="zlib compression level (0-9) or lzma preset (0-9) of the capture files, -1 for the codec default (default: {})".format(CAPTURE_COMPRESSION_LEVEL))
+parser.add_argument("--record-no-delta", action="store_false", dest='record_delta', default=CAPTURE_DELTA,
+                    help="Store the reception times and CDP sequences of the capture files as received instead of delta encoded")
+parser.add_argument("--replay", action="store", nargs='+', dest='replay', metavar="CAPTURE_FILE",
+                    help="Feed the datagrams of capture files, written with --record, to the monitor instead of listening. In headless mode, the monitor stops once they are over")
+parser.add_argument("--replay-speed", action="store", type=float, dest='replay_speed', default=1.0,
+                    help="Speed factor of the replay, 0 replays as fast as the datagrams are decoded (default: 1)")
+parser.add_argument("--replay-start", action="store", dest='replay_start',
+                    help="Only replay the datagrams received from this date and time, or time of day on the day the first capture file was started, e.g. 14:02")
+parser.add_argument("--replay-end", action="store", dest='replay_end',
+                    help="Only replay the datagrams received before this date and time, or time of day, e.g. 14:05")
 parser.add_argument("-d", "--device-id", action="store", type=int,
                     dest='device_id', help="Only listen for packets from [Device ID]")
+parser.add_argument("--headless", action="store_true", dest='headless',
+                    help="Run without a display and periodically write node and data type statistics as JSON lines")
+parser.add_argument("--stats-interval", action="store", type=float, dest='stats_interval', default=HEADLESS_REPORT_INTERVAL,
+                    help="Seconds between two statistics reports in headless mode (default: {})".format(HEADLESS_REPORT_INTERVAL))
+parser.add_argument("--stats-file", action="store", dest='stats_file',
+                    help="Append the headless statistics reports to this file instead of stdout")
 parser.add_argument('-4k',               action="store_true",        help="Fix display issues with plotting on 4K monitors.")
 parser.add_argument('--dark',               action="store_true",        help="Contrasting Text for Dark Mode")
 
 
-option_dict = vars(parser.parse_args())
-
-if option_dict['udp_cfg'] is not None:
-    [UDP_IP, UDP_PORT] = option_dict['udp_cfg'].split(':')
-    UDP_PORT = int(UDP_PORT)
-    print("Using IP: {} Port: {}".format(UDP_IP, UDP_PORT))
-
-if option_dict['iface_ip'] is not None:
-    IFACE_IP = option_dict['iface_ip']
-    print("Using Interface IP: {}".format(IFACE_IP))
-
-if option_dict['num_processes'] > 1:
-    NUM_PROCESSES = option_dict['num_processes']
-    print("Using {} processes".format(NUM_PROCESSES))
+def run_headless(option_dict):
+    from headless_monitor import HeadlessMonitor
 
-if option_dict['device_id'] is not None:
-    print('Monitoring device {:08X}'.format(option_dict['device_id']))
+    # Only the counts are reported, keep as little as possible of every data item
+    Node.trail_length = HEADLESS_TRAIL_LENGTH
+    UwbNetwork.lazy_decode = True
+    SocketProcessing.print_timeouts = False
 
-if option_dict['4k'] :
-    pg.QtWidgets.QApplication.setAttribute(pg.QtCore.Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
+    def stop(signum, frame):
+        UwbNetwork.running = False
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
 
-if option_dict['dark'] :
-    SetClickableColor("color : cyan")
-    SetTitleColor("color : white")
+    output = sys.stdout if option_dict['stats_file'] is None else open(option_dict['stats_file'], 'a')
+    monitor = HeadlessMonitor(UDP_IP or settings.UDP_IP, UDP_PORT or settings.UDP_PORT, IFACE_IP or settings.IFACE_IP,
+                              NUM_PROCESSES, option_dict['engine'] or THREAD_ENGINE, option_dict['stats_interval'], output,
+                              option_dict['replay'], option_dict['replay_speed'] or None, *replay_range)
+    monitor.run()
+    sys.exit(0)
 
 
 ############################
@@ -76,11 +120,152 @@ if option_dict['dark'] :
 
 if __name__ == "__main__":
 
+    print("CuwbMonitor.py v{}".format(VERSION))
+
+    option_dict = vars(parser.parse_args())
+
+    if not option_dict['headless']:
+        # Imported before the options are applied, the star imports bring the settings defaults along
+        import pyqtgraph as pg
+        from plots import *
+        from ui_main_window import *
+        from network_discovery_window import NetworkDiscoveryWindow
+
+    if option_dict['udp_cfg'] is not None:
+        [UDP_IP, UDP_PORT] = option_dict['udp_cfg'].split(':')
+        UDP_PORT = int(UDP_PORT)
+        print("Using IP: {} Port: {}".format(UDP_IP, UDP_PORT))
+
+    if option_dict['iface_ip'] is not None:
+        IFACE_IP = option_dict['iface_ip']
+        print("Using Interface IP: {}".format(IFACE_IP))
+
+    if option_dict['num_processes'] > 1:
+        if sys.version_info < (3, 8):
+            parser.error("--processes above 1 needs Python 3.8 or later")
+        NUM_PROCESSES = option_dict['num_processes']
+        print("Using {} processes".format(NUM_PROCESSES))
+
+    if option_dict['engine'] is not None:
+        print("Using the {} ingest engine".format(option_dict['engine']))
+
+    if option_dict['rcvbuf'] is not None:
+        SocketProcessing.receive_buffer_size = option_dict['rcvbuf']
+        print("Using socket receive buffer size: {} bytes".format(option_dict['rcvbuf']))
+
+    if option_dict['queue_size'] is not None:
+        SocketProcessing.queue_capacity = option_dict['queue_size']
+        print("Using queue size: {} datagrams".format(option_dict['queue_size']))
+
+    if NUM_PROCESSES > 1:
+        # The decoding processes read the datagrams in place, the oldest one can no longer be dropped
+        if option_dict['overflow'] == DatagramRing.DROP_OLDEST:
+            parser.error("--overflow {} is not available with --processes above 1, use {} or {}".format(
+                DatagramRing.DROP_OLDEST, DatagramRing.DROP_NEWEST, DatagramRing.BLOCK))
+        if option_dict['overflow'] is None:
+            option_dict['overflow'] = DatagramRing.DROP_NEWEST
+
+    if option_dict['overflow'] is not None:
+        SocketProcessing.overflow_policy = option_dict['overflow']
+        print("Using queue overflow policy: {}".format(option_dict['overflow']))
+
+    if option_dict['dedup_window'] is not None:
+        SocketProcessing.duplicate_filter.window = option_dict['dedup_window']
+        print("Using duplicate packet window: {} s".format(option_dict['dedup_window']))
+
+    if option_dict['lazy_decode']:
+        UwbNetwork.lazy_decode = True
+        print("Using lazy data item decoding")
+
+    if option_dict['retention_file'] is not None or option_dict['retain']:
+        try:
+            if option_dict['retention_file'] is not None:
+                Node.retention_policy.load_file(option_dict['retention_file'])
+            for spec in option_dict['retain']:
+                Node.retention_policy.parse_spec(spec)
+        except (OSError, ValueError) as e:
+            parser.error("Invalid retention policy: {}".format(e))
+        print("Using retention limits: {}".format(Node.retention_policy.limits))
+
+    if option_dict['memory_budget'] is not None:
+        try:
+            memory_budget = parse_bytes(option_dict['memory_budget'])
+        except ValueError as e:
+            parser.error("Invalid memory budget: {}".format(e))
+        UwbNetwork.memory_budget.budget = memory_budget if memory_budget > 0 else None
+        print("Using memory budget: {}".format('none' if memory_budget <= 0 else format_bytes(memory_budget)))
+
+    if option_dict['record'] is not None:
+        if option_dict['record_rotate_size'] is not None:
+            try:
+                rotate_size = parse_bytes(option_dict['record_rotate_size'])
+            except ValueError as e:
+                parser.error("Invalid capture rotation size: {}".format(e))
+            CaptureRecorder.rotate_size = rotate_size if rotate_size > 0 else None
+        if option_dict['record_rotate_time'] is not None:
+            CaptureRecorder.rotate_time = option_dict['record_rotate_time'] if option_dict['record_rotate_time'] > 0 else None
+        if option_dict['record_compression'] is not None:
+            CaptureRecorder.compression = option_dict['record_compression']
+        if option_dict['record_level'] is not None:
+            if not -1 <= option_dict['record_level'] <= 9:
+                parser.error("Invalid compression level: {}, expected -1 to 9".format(option_dict['record_level']))
+            CaptureRecorder.compression_level = option_dict['record_level']
+        CaptureRecorder.delta = option_dict['record_delta']
+        try:
+            recorder = CaptureRecorder(option_dict['record'])
+        except OSError as e:
+            parser.error("Unable to record to {}: {}".format(option_dict['record'], e))
+        SocketProcessing.recorder = recorder
+        recorder.start()
+
+        def stop_recorder():
+            # Writes the datagrams still waiting before the interpreter stops the recorder thread
+            recorder.wait()
+            recorder.join(5.0)
+        atexit.register(stop_recorder)
+        print("Recording CDP datagrams to {}".format(option_dict['record']))
+
+    if option_dict['replay'] is not None:
+        if option_dict['replay_speed'] < 0:
+            parser.error("Invalid replay speed: {}".format(option_dict['replay_speed']))
+        print("Replaying {} {}".format(', '.join(option_dict['replay']),
+                                       'as fast as possible' if not option_dict['replay_speed'] else 'at x{}'.format(option_dict['replay_speed'])))
+    replay_range = (None, None)
+    if option_dict['replay'] is not None and (option_dict['replay_start'] is not None or option_dict['replay_end'] is not None):
+        try:
+            reference = get_capture_time(option_dict['replay'][0])
+            replay_range = tuple(None if value is None else parse_time(value, reference)
+                                 for value in (option_dict['replay_start'], option_dict['replay_end']))
+        except (OSError, CaptureError) as e:
+            parser.error("Invalid replay range: {}".format(e))
+
+    if option_dict['device_id'] is not None:
+        print('Monitoring device {:08X}'.format(option_dict['device_id']))
+        UwbNetwork.device_filter = {option_dict['device_id']}
+
+    if option_dict['headless']:
+        run_headless(option_dict)
+
+    if option_dict['engine'] is not None:
+        NetworkDiscoveryWindow.ingest_engine = option_dict['engine']
+
+    if option_dict['4k'] :
+        pg.QtWidgets.QApplication.setAttribute(pg.QtCore.Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
+
+    if option_dict['dark'] :
+        SetClickableColor("color : cyan")
+        SetTitleColor("color : white")
+
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     app = pg.mkQApp()
 
     main_window = UiMainWindow(NUM_PROCESSES, UDP_IP, UDP_PORT, IFACE_IP)
 
+    if option_dict['replay'] is not None:
+        # Decoded by threads, the decoding processes belong to the Network Discovery window
+        main_window.replay = CaptureReplay(option_dict['replay'], option_dict['replay_speed'] or None, None, *replay_range)
+        main_window.replay.start()
+
     if option_dict['device_id'] is None:
         main_window.show()
     else:
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Compares the CDP decoding throughput of the single thread decoder (CdpProcess)
+# with the process pool decoder (DecodePool) used when --processes is above 1, from the
+# datagrams to the data items stored in the nodes. The thread decoder stores data items that
+# cdp decodes on first attribute access, the pool stores data items decoded by its processes:
+# "thread (decoded)" adds the cost of reading every data item once, as a window showing them does.
+# Run from the repository root: ./benchmarks/bench_decode_engines.py -h
+
+import argparse
+import os
+import sys
+import time
+
+libs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libs')
+sys.path.append(libs_dir)
+
+import cdp
+from datagram_ring import DatagramRing
+from decode_pool import DecodePool
+from network_objects import UwbNetwork, Node
+from settings import RECEIVE_BUFFER_COUNT, RECEIVE_BATCH_SIZE
+from socket_processing import CdpProcess, apply_decoded_items, DATA_ITEM_FORMATS, KNOWN_DATA_ITEM_TYPES
+
+
+def make_packets(num_packets, items_per_packet, num_sources):
+    packets = []
+    for seq in range(num_packets):
+        packet = cdp.CDP(serial_number=0x1000 + (seq % num_sources))
+        packet.sequence = seq
+        for idx in range(items_per_packet):
+            packet.add_data_item(cdp.PositionV3(serial_number=cdp.CiholasSerialNumber(0x2000 + idx), network_time=seq,
+                                                x=idx, y=-idx, z=seq % 1000, quality=100, anchor_count=4, flags=0, smoothing=0))
+        packets.append(packet.encode())
+    return packets
+
+
+def read_data_items():
+    """Reads an attribute of every data item stored, decoding the ones that are not decoded yet."""
+    for node in list(UwbNetwork.nodes.values()):
+        for stream in list(node.streams.values()):
+            for data_item in stream.data:
+                data_item.network_time
+
+
+def bench_thread(packets, lazy_decode, read=False):
+    """Same work CdpProcess does for each datagram"""
+    UwbNetwork.nodes.clear()
+    UwbNetwork.lazy_decode = lazy_decode
+    ring = DatagramRing(1)
+    decoder = CdpProcess(ring)
+    start = time.perf_counter()
+    for data in packets:
+        decoder.process_datagram(data, ring, time.monotonic())
+    if read:
+        read_data_items()
+    elapsed = time.perf_counter() - start
+    UwbNetwork.lazy_decode = False
+    return elapsed
+
+
+def bench_processes(packets, num_processes):
+    """Same work SocketProcessing, the decoding processes and CdpCollector do for each datagram"""
+    UwbNetwork.nodes.clear()
+    decode_pool = DecodePool(num_processes, KNOWN_DATA_ITEM_TYPES, DATA_ITEM_FORMATS)
+    ring = decode_pool.create_ring('bench', RECEIVE_BUFFER_COUNT, DatagramRing.DROP_NEWEST)
+    # Make sure every process is up before timing
+    time.sleep(1.0)
+
+    start = time.perf_counter()
+    submitted = 0
+    received = 0
+    batch = []
+    for data in packets:
+        idx = ring.reserve()
+        while idx is None:
+            received += collect(decode_pool)
+            idx = ring.reserve()
+        ring.slots[idx][:len(data)] = data
+        ring.timestamps[idx] = time.monotonic()
+        batch.append((idx, len(data)))
+        if len(batch) == RECEIVE_BATCH_SIZE:
+            decode_pool.submit(ring, batch)
+            submitted += len(batch)
+            batch = []
+    decode_pool.submit(ring, batch)
+    submitted += len(batch)
+    while received < submitted:
+        received += collect(decode_pool)
+    elapsed = time.perf_counter() - start
+
+    decode_pool.stop()
+    return elapsed
+
+
+def collect(decode_pool):
+    results = decode_pool.get_results(1.0)
+    if results is None:
+        return 0
+    ring, records = results
+    for serial_number, sequence, items, timestamp in records:
+        apply_decoded_items(serial_number, sequence, items, timestamp=timestamp)
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CDP decoding throughput benchmark")
+    parser.add_argument("-n", "--packets", type=int, default=50000, help="Number of CDP packets")
+    parser.add_argument("-i", "--items", type=int, default=10, help="PositionV3 data items per packet")
+    parser.add_argument("-p", "--processes", type=int, nargs='+', default=[1, 2, 4, 8], help="Process counts to benchmark")
+    option_dict = vars(parser.parse_args())
+
+    packets = make_packets(option_dict['packets'], option_dict['items'], 16)
+    num_packets = len(packets)
+
+    elapsed = bench_thread(packets, lazy_decode=False)
+    print("{:<28} {:>10.0f} packets/s".format("thread", num_packets / elapsed))
+    elapsed = bench_thread(packets, lazy_decode=False, read=True)
+    print("{:<28} {:>10.0f} packets/s".format("thread (decoded)", num_packets / elapsed))
+    elapsed = bench_thread(packets, lazy_decode=True)
+    print("{:<28} {:>10.0f} packets/s".format("thread (lazy decode)", num_packets / elapsed))
+
+    for num_processes in option_dict['processes']:
+        elapsed = bench_processes(packets, num_processes)
+        print("{:<28} {:>10.0f} packets/s".format("{} processes".format(num_processes), num_packets / elapsed))
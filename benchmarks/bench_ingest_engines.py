@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Compares the two ingest engines the Network Discovery window can use with many CDP streams:
+# one receiving and one decoding thread per listening address (threads) against a single
+# selector thread serving every address plus a single decoding thread (reactor).
+# Packets are sent over loopback by another process as fast as it can.
+# Run from the repository root: ./benchmarks/bench_ingest_engines.py -h
+
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+libs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libs')
+sys.path.append(libs_dir)
+
+import cdp
+from cdp_reactor import CdpReactor
+from datagram_ring import DatagramRing
+from network_objects import UwbNetwork
+from socket_processing import SocketProcessing, CdpProcess
+
+BASE_PORT = 17667
+
+
+def send_packets(num_streams, num_packets, items_per_packet, sending):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    datagrams = []
+    for seq in range(num_packets):
+        for stream in range(num_streams):
+            packet = cdp.CDP(serial_number=0x1000 + stream)
+            packet.sequence = seq
+            for idx in range(items_per_packet):
+                packet.add_data_item(cdp.PositionV3(serial_number=cdp.CiholasSerialNumber(0x2000 + idx), network_time=seq,
+                                                    x=idx, y=-idx, z=0, quality=100, anchor_count=4, flags=0, smoothing=0))
+            datagrams.append((packet.encode(), ('127.0.0.1', BASE_PORT + stream)))
+    sending.set()
+    for data, address in datagrams:
+        sock.sendto(data, address)
+
+
+def bench_engine(engine, num_streams, num_packets, items_per_packet):
+    UwbNetwork.nodes.clear()
+    UwbNetwork.running = True
+    streams = [SocketProcessing('127.0.0.1', BASE_PORT + idx, '127.0.0.1') for idx in range(num_streams)]
+    threads = []
+    if engine == 'reactor':
+        reactor = CdpReactor()
+        for stream in streams:
+            reactor.add_stream(stream)
+        threads = [reactor, reactor.decoder]
+        reactor.start()
+    else:
+        for stream in streams:
+            threads += [stream, CdpProcess(stream.ring)]
+        for thread in threads:
+            thread.start()
+    time.sleep(0.5)
+
+    context = multiprocessing.get_context('spawn')
+    sending = context.Event()
+    sender = context.Process(target=send_packets, args=(num_streams, num_packets, items_per_packet, sending))
+    sender.start()
+    sending.wait()
+    start = time.perf_counter()
+
+    # Wait until nothing was decoded for half a second
+    last_total = -1
+    last_change = time.perf_counter()
+    while time.perf_counter() - last_change < 0.5:
+        time.sleep(0.05)
+        total = sum(node.cdp_total for node in list(UwbNetwork.nodes.values()))
+        if total != last_total:
+            last_total = total
+            last_change = time.perf_counter()
+    elapsed = last_change - start
+    sender.join()
+
+    UwbNetwork.running = False
+    time.sleep(0.5)
+    ring_drops = sum(stream.ring.drops for stream in streams)
+    kernel_drops = sum(stream.kernel_drops or 0 for stream in streams)
+    return len(threads), last_total // items_per_packet, elapsed, ring_drops, kernel_drops
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CDP ingest engine benchmark")
+    parser.add_argument("-s", "--streams", type=int, nargs='+', default=[1, 4, 8], help="Numbers of simultaneous streams")
+    parser.add_argument("-n", "--packets", type=int, default=5000, help="CDP packets sent to every stream")
+    parser.add_argument("-i", "--items", type=int, default=5, help="PositionV3 data items per packet")
+    parser.add_argument("--overflow", choices=DatagramRing.overflow_policies, default=DatagramRing.BLOCK,
+                        help="Queue overflow policy of the streams (default: {})".format(DatagramRing.BLOCK))
+    option_dict = vars(parser.parse_args())
+
+    # Every run sends the same packet ids again
+    SocketProcessing.duplicate_filter.window = 0
+    SocketProcessing.overflow_policy = option_dict['overflow']
+
+    print("{:<8} {:>7} {:>7} {:>10} {:>14} {:>10} {:>12}".format("engine", "streams", "threads", "decoded", "packets/s", "ring drops", "kernel drops"))
+    for num_streams in option_dict['streams']:
+        for engine in ('threads', 'reactor'):
+            num_threads, decoded, elapsed, ring_drops, kernel_drops = bench_engine(engine, num_streams, option_dict['packets'], option_dict['items'])
+            print("{:<8} {:>7} {:>7} {:>10} {:>14.0f} {:>10} {:>12}".format(engine, num_streams, num_threads, decoded,
+                                                                          decoded / elapsed, ring_drops, kernel_drops))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Measures the cost of Node.update per data item, the last step of the CDP ingest path,
+# for data items stored in numpy columns, data items of several other types and while
+# filtering data types. Only relies on the Node API, so --libs can point it to the libs of
+# an older checkout (e.g. a git worktree) to compare against it on the same machine.
+# Run from the repository root: ./benchmarks/bench_node_update.py -h
+
+import argparse
+import os
+import sys
+import time
+
+libs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libs')
+
+
+def load_libs(libs_dir):
+    """Imports the modules measured from libs_dir."""
+    global cdp, UwbNetwork, Node
+    sys.path.insert(0, os.path.abspath(libs_dir))
+    import cdp
+    from network_objects import UwbNetwork, Node
+
+
+def make_data_items(count):
+    """Returns decoded data items of the three types the scenarios use, count of each."""
+    packet = cdp.CDP(serial_number=0x1000)
+    packet.add_data_item(cdp.PositionV3(serial_number=cdp.CiholasSerialNumber(0x2000), network_time=1,
+                                        x=1, y=-1, z=2, quality=100, anchor_count=4, flags=0, smoothing=0))
+    packet.add_data_item(cdp.DeviceActivityState(serial_number=cdp.CiholasSerialNumber(0x2000), interface_id=1,
+                                                 x=1, y=2, z=3, role_id=1, connectivity_state=2, synchronization_state=3))
+    packet.add_data_item(cdp.AnchorPositionStatusV2(serial_number=cdp.CiholasSerialNumber(0x2000), interface_id=1,
+                                                    status=1, first_path=-80, total_path=-75, quality=100))
+    decoded = list(cdp.CDP(packet.encode()).data_items)
+    return [[data_item] * count for data_item in decoded]
+
+
+def bench(data_items, repeats, filter_set=None):
+    """Returns the best time per data item, in nanoseconds."""
+    best = None
+    for repeat in range(repeats):
+        UwbNetwork.nodes.clear()
+        node = Node(0x1000)
+        if filter_set is not None:
+            node.start_filtering(filter_set)
+        timestamp = time.monotonic()
+        start = time.perf_counter()
+        for data_item in data_items:
+            node.update(data_item, data_item.di_name, timestamp)
+        elapsed = (time.perf_counter() - start) / len(data_items) * 1e9
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Node.update micro-benchmark")
+    parser.add_argument("-n", "--items", type=int, default=100000, help="Data items per scenario")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="Runs per scenario, the best one is reported")
+    parser.add_argument("-l", "--libs", default=libs_dir, help="Directory of the libs measured, those of this tree by default")
+    option_dict = vars(parser.parse_args())
+
+    load_libs(option_dict['libs'])
+
+    positions, activity_states, anchor_statuses = make_data_items(option_dict['items'])
+    mixed = [data_item for items in zip(positions, activity_states, anchor_statuses) for data_item in items][:option_dict['items']]
+    scenarios = [('PositionV3', positions, None),
+                 ('DeviceActivityState', activity_states, None),
+                 ('3 types', mixed, None),
+                 ('3 types, 1 filtered in', mixed, {cdp.AnchorPositionStatusV2.type})]
+
+    print("{:<24} {:>12}".format("scenario", "ns/item"))
+    for name, data_items, filter_set in scenarios:
+        print("{:<24} {:>12.0f}".format(name, bench(data_items, option_dict['repeats'], filter_set)))
@@ -0,0 +1,163 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import threading
+import time
+
+# Local libraries
+from cdp_capture import CaptureError, read_capture
+from datagram_ring import DatagramRing
+from network_objects import UwbNetwork
+from settings import *
+from socket_processing import SocketProcessing, CdpProcess, get_packet_filters
+
+
+class CaptureReplay(threading.Thread):
+    """
+    Feeds the datagrams of capture files to the decode stage as if they were being received:
+    every listening address of the capture gets its own ring, decoded by a CdpProcess or the
+    decode pool, and duplicates are filtered like on a socket. Datagrams are paced by their
+    reception times divided by speed, or handed off as fast as the decoders take them when
+    speed is None. Rings block instead of dropping, so every datagram reaches the nodes.
+    Only the datagrams received within [start, end), in time.time() seconds, and sent by the
+    devices of UwbNetwork.device_filter are replayed, the capture index skipping the other blocks.
+    """
+    queue_capacity = RECEIVE_BUFFER_COUNT
+
+    def __init__(self, paths, speed=1.0, decode_pool=None, start=None, end=None):
+        threading.Thread.__init__(self, daemon=True)
+        self._stopevent = False
+        self.paths = paths
+        self.speed = speed
+        self.start_time_filter = start
+        self.end_time_filter = end
+        self.decode_pool = decode_pool
+        self.rings = dict()    # DatagramRing indexed by recorded listening address
+        self.decoders = []
+        self.path = None       # Capture file being replayed
+        self.datagrams = 0     # Datagrams handed off
+        self.bytes = 0
+        self.capture_time = 0  # in seconds, since the first datagram of the capture, of the last datagram handed off
+        self.start_time = None # time.monotonic() at which the replay started
+        self.end_time = None   # time.monotonic() at which every datagram was decoded
+        self.finished = False
+
+    def get_ring(self, key):
+        ring = self.rings.get(key)
+        if ring is None:
+            if self.decode_pool is None:
+                ring = DatagramRing(self.queue_capacity, overflow_policy=DatagramRing.BLOCK, key=key)
+                decoder = CdpProcess(ring)
+                decoder.start()
+                self.decoders.append(decoder)
+            else:
+                ring = self.decode_pool.create_ring(key, self.queue_capacity, DatagramRing.BLOCK)
+            self.rings[key] = ring
+        return ring
+
+    def hand_off(self, ring, batch):
+        """Same steps as SocketProcessing.service once a batch is received."""
+        ring.stats.record_received(batch)
+        batch = SocketProcessing.duplicate_filter.remove_duplicates(ring, batch)
+        if self.decode_pool is None:
+            ring.commit(batch)
+        else:
+            self.decode_pool.submit(ring, batch, *get_packet_filters())
+
+    def run(self):
+        self.start_time = time.monotonic()
+        first = None
+        ring = None
+        batch = []
+        # Only the device filter skips blocks, the type filter may change during the replay
+        # and packets without the selected types still count for the loss
+        device_filter, type_filter = get_packet_filters()
+        for path in self.paths:
+            self.path = path
+            try:
+                for timestamp, key, datagram in read_capture(path, self.start_time_filter, self.end_time_filter, device_filter):
+                    if not UwbNetwork.running or self._stopevent:
+                        break
+                    if first is None:
+                        first = timestamp
+                    if self.speed is not None:
+                        delay = self.start_time + (timestamp - first) / self.speed - time.monotonic()
+                        if delay > 0.001:
+                            # Hand off what is waiting before sleeping until the next datagram is due
+                            if batch:
+                                self.hand_off(ring, batch)
+                                batch = []
+                            time.sleep(delay)
+
+                    next_ring = self.get_ring(key)
+                    if next_ring is not ring or len(batch) >= RECEIVE_BATCH_SIZE:
+                        if batch:
+                            self.hand_off(ring, batch)
+                            batch = []
+                        ring = next_ring
+                    idx = ring.reserve()
+                    while idx is None:
+                        if batch:
+                            self.hand_off(ring, batch)
+                            batch = []
+                        if not UwbNetwork.running or self._stopevent:
+                            break
+                        ring.wait_for_slot(0.250)
+                        idx = ring.reserve()
+                    if idx is None:
+                        break
+
+                    nbytes = len(datagram)
+                    ring.slots[idx][:nbytes] = datagram
+                    ring.timestamps[idx] = time.monotonic()
+                    batch.append((idx, nbytes))
+                    self.datagrams += 1
+                    self.bytes += nbytes
+                    self.capture_time = timestamp - first
+            except (OSError, CaptureError) as e:
+                print("Unable to replay {}: {}".format(path, e))
+            if not UwbNetwork.running or self._stopevent:
+                break
+        if batch:
+            self.hand_off(ring, batch)
+
+        # The replay is over once the decoders went through every datagram handed off
+        while UwbNetwork.running and not self._stopevent and any(ring.stats.decoded < ring.received for ring in list(self.rings.values())):
+            time.sleep(0.010)
+        self.end_time = time.monotonic()
+        self.finished = True
+        for decoder in self.decoders:
+            decoder.wait()
+
+    def get_status(self):
+        """Datagrams replayed and the achieved rate and speed, relative to the capture times."""
+        elapsed = ((self.end_time or time.monotonic()) - self.start_time) if self.start_time is not None else 0
+        return dict(path=self.path, finished=self.finished, datagrams=self.datagrams, bytes=self.bytes,
+                    capture_time=round(self.capture_time, 3), elapsed=round(elapsed, 3),
+                    datagrams_per_second=round(self.datagrams / elapsed, 1) if elapsed > 0 else 0.0,
+                    speed=round(self.capture_time / elapsed, 3) if elapsed > 0 else 0.0)
+
+    def get_summary(self):
+        """One line description of the replay for the windows."""
+        status = self.get_status()
+        return 'Replay{}: {datagrams} datagrams, {capture_time:.1f} s of capture in {elapsed:.1f} s, {datagrams_per_second:.0f} datagrams/s, x{speed:.2f}'.format(
+            ' finished' if status['finished'] else '', **status)
+
+    def get_diagnostics(self):
+        """Diagnostics of every replayed listening address, like SocketProcessing.get_diagnostics, indexed by address."""
+        diagnostics = dict()
+        for (ip, port, interface), ring in list(self.rings.items()):
+            ring_diagnostics = ring.counters()
+            ring_diagnostics['kernel_drops'] = None
+            ring_diagnostics.update(ring.stats.snapshot())
+            diagnostics['{}:{} on {}'.format(ip, port, interface)] = ring_diagnostics
+        return diagnostics
+
+    def wait(self):
+        self._stopevent = True
+        for decoder in self.decoders:
+            decoder.wait()
+
+    def __del__(self):
+        self.wait()
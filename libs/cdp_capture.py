@@ -0,0 +1,675 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import json
+import lzma
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, time as time_of_day
+
+# Local libraries
+import numpy as np
+from memory_budget import format_bytes
+from network_objects import UwbNetwork
+from packet_parsing import add_data_item_types, peek_packet_id
+from settings import *
+
+# A capture file is a file header followed by blocks. Every block is a block header and the
+# records of the datagrams received during a short period, and is self contained: the
+# listening addresses its datagrams were received on are defined within the block.
+# All the integers and floats are little endian.
+CAPTURE_MAGIC = b'CUWBCAP\0'
+CAPTURE_VERSION = 1
+BLOCK_MAGIC = b'CBLK'
+FILE_HEADER = struct.Struct('<8sHHd')     # magic, version, flags, creation time (time.time())
+BLOCK_HEADER = struct.Struct('<4sIIdd')   # magic, records size as stored, record count, earliest and latest reception time
+RECORD_HEADER = struct.Struct('<BHId')    # kind, stream id, payload size, reception time (time.time())
+
+DATAGRAM_RECORD = 0  # Payload is a raw CDP datagram received on the stream
+STREAM_RECORD = 1    # Payload is the JSON [ip, port, interface] of the listening address the stream id stands for
+
+# The flags of the file header give the codec the records of every block are compressed with,
+# each block on its own so any block can be decompressed without the others, and whether the
+# records are delta encoded. Delta encoded records hold the nanoseconds since the previous
+# datagram record, or since the earliest reception time of the block for the first one, and the
+# CDP header sequence of a datagram is replaced by its difference, modulo 2**32, with the
+# previous sequence of the same serial number in the block, 0 for the first one.
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODEC_MASK = 0x0F
+DELTA_FLAG = 0x10
+CAPTURE_CODECS = {'none': CODEC_NONE, 'zlib': CODEC_ZLIB, 'lzma': CODEC_LZMA}
+DELTA_RECORD_HEADER = struct.Struct('<BHIq')  # kind, stream id, payload size, nanoseconds since the previous datagram record
+SEQUENCE = struct.Struct('<I')                # CDP header sequence
+SEQUENCE_OFFSET = 4                           # of the CDP header sequence in a datagram
+
+# Every capture file has a sidecar index file, appended to after every block is written. The
+# index is an index header followed by one entry per block: the entry header, then the serial
+# numbers of the devices (uint32) and the data item types (uint16) the datagrams of the block hold.
+INDEX_MAGIC = b'CUWBIDX\0'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<8sH')      # magic, version
+INDEX_ENTRY = struct.Struct('<QIIddHH')   # block offset in the capture file, records size, record count,
+                                          # earliest and latest reception time, serial and type count
+
+# Classic libpcap files, e.g. from tcpdump, of UDP over IPv4. pcapng is not supported.
+PCAP_MAGICS = {b'\xd4\xc3\xb2\xa1': ('<', 1e-6), b'\xa1\xb2\xc3\xd4': ('>', 1e-6),   # Microsecond timestamps
+               b'\x4d\x3c\xb2\xa1': ('<', 1e-9), b'\xa1\xb2\x3c\x4d': ('>', 1e-9)}   # Nanosecond timestamps
+PCAPNG_MAGIC = b'\x0a\x0d\x0d\x0a'
+PCAP_LINK_HEADERS = {0: (4, None),      # BSD loopback, the address family is not checked
+                     1: (14, 12),       # Ethernet, EtherType at 12
+                     101: (0, None),    # Raw IP
+                     113: (16, 14),     # Linux cooked capture
+                     228: (0, None),    # Raw IPv4
+                     276: (20, 0)}      # Linux cooked capture v2
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = 0x8100
+IP_PROTOCOL_UDP = 17
+
+
+class CaptureError(ValueError):
+    pass
+
+
+def read_file_header(capture_file):
+    """Returns the (creation time, flags) of a capture file, with capture_file positioned on its first block."""
+    header = capture_file.read(FILE_HEADER.size)
+    if len(header) < FILE_HEADER.size:
+        raise CaptureError("{} is too short to be a capture file".format(capture_file.name))
+    magic, version, flags, created = FILE_HEADER.unpack(header)
+    if magic != CAPTURE_MAGIC:
+        raise CaptureError("{} is not a capture file".format(capture_file.name))
+    if version != CAPTURE_VERSION:
+        raise CaptureError("{} is a version {} capture file, only version {} is supported".format(capture_file.name, version, CAPTURE_VERSION))
+    if flags & CODEC_MASK not in CAPTURE_CODECS.values():
+        raise CaptureError("{} is compressed with an unknown codec: {}".format(capture_file.name, flags & CODEC_MASK))
+    return created, flags
+
+
+def get_capture_time(path):
+    """Returns the creation time of a capture file, in time.time() seconds."""
+    with open(path, 'rb') as capture_file:
+        return read_file_header(capture_file)[0]
+
+
+def parse_time(value, reference):
+    """
+    Returns the time.time() seconds of an ISO 8601 date and time, e.g. 2024-05-02T14:02, or
+    of a time of day, e.g. 14:02:30, on the day of reference in time.time() seconds. Local time
+    unless a time zone is given.
+    """
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        pass
+    try:
+        return datetime.combine(datetime.fromtimestamp(reference).date(), time_of_day.fromisoformat(value)).timestamp()
+    except ValueError:
+        raise CaptureError("Invalid time: {}, expected a date and time or a time of day".format(value))
+
+
+def get_index_path(path):
+    """Path of the sidecar index of a capture file."""
+    return os.path.splitext(path)[0] + CAPTURE_INDEX_EXTENSION
+
+
+def read_block(capture_file, start=None, end=None):
+    """
+    Returns the (earliest time, latest time, records) of the block at the current position of capture_file,
+    records as stored, see decompress_records. None at the end of the file or on a truncated block, as left
+    by a monitor that did not stop cleanly.
+    The records of a block without any datagram within [start, end) are skipped and returned as None.
+    """
+    header = capture_file.read(BLOCK_HEADER.size)
+    if len(header) < BLOCK_HEADER.size:
+        return None
+    magic, size, count, first_time, last_time = BLOCK_HEADER.unpack(header)
+    if magic != BLOCK_MAGIC:
+        raise CaptureError("Corrupted block at offset {} of {}".format(capture_file.tell() - BLOCK_HEADER.size, capture_file.name))
+    if (start is not None and last_time < start) or (end is not None and first_time >= end):
+        capture_file.seek(size, os.SEEK_CUR)
+        return first_time, last_time, None
+    records = capture_file.read(size)
+    if len(records) < size:
+        return None
+    return first_time, last_time, records
+
+
+def read_blocks(capture_file, start=None, end=None):
+    """Yields the blocks from the current position of capture_file, see read_block."""
+    while True:
+        block = read_block(capture_file, start, end)
+        if block is None:
+            return
+        yield block
+
+
+def compress_records(records, flags, level=-1):
+    """Returns the records of a block as stored in a capture file of the given flags, level is the codec's, -1 its default."""
+    codec = flags & CODEC_MASK
+    if codec == CODEC_ZLIB:
+        return zlib.compress(records, level)
+    if codec == CODEC_LZMA:
+        return lzma.compress(records, preset=None if level < 0 else level)
+    return records
+
+
+def decompress_records(records, flags):
+    """Returns the records of a block as written, from the bytes stored in a capture file of the given flags."""
+    codec = flags & CODEC_MASK
+    try:
+        if codec == CODEC_ZLIB:
+            return zlib.decompress(records)
+        if codec == CODEC_LZMA:
+            return lzma.decompress(records)
+    except (zlib.error, lzma.LZMAError) as e:
+        raise CaptureError("Corrupted compressed block: {}".format(e))
+    return records
+
+
+def iter_records(records, flags=0, first_time=0.0):
+    """
+    Yields the (time, listening address, datagram) of the decompressed records of one block, datagrams
+    as memoryviews. Delta encoded records are decoded in place from first_time, the earliest time of the block.
+    """
+    if flags & DELTA_FLAG:
+        yield from iter_delta_records(records, first_time)
+        return
+    streams = dict()
+    view = memoryview(records)
+    offset = 0
+    unpack_from = RECORD_HEADER.unpack_from
+    while offset < len(view):
+        kind, stream_id, size, timestamp = unpack_from(view, offset)
+        offset += RECORD_HEADER.size
+        payload = view[offset:offset + size]
+        offset += size
+        if kind == DATAGRAM_RECORD:
+            yield timestamp, streams[stream_id], payload
+        elif kind == STREAM_RECORD:
+            streams[stream_id] = tuple(json.loads(bytes(payload)))
+
+
+def iter_delta_records(records, first_time):
+    """Yields the records of one block like iter_records, restoring the times and CDP sequences of delta encoded records."""
+    streams = dict()
+    sequences = dict()  # Previous sequence of every serial number in the block
+    records = bytearray(records)
+    view = memoryview(records)
+    offset = 0
+    nanoseconds = 0
+    unpack_from = DELTA_RECORD_HEADER.unpack_from
+    pack_sequence = SEQUENCE.pack_into
+    while offset < len(view):
+        kind, stream_id, size, delta = unpack_from(view, offset)
+        offset += DELTA_RECORD_HEADER.size
+        payload = view[offset:offset + size]
+        if kind == DATAGRAM_RECORD:
+            nanoseconds += delta
+            packet_id = peek_packet_id(payload)
+            if packet_id is not None:
+                serial = packet_id[0]
+                sequence = (sequences.get(serial, 0) + packet_id[1]) & 0xFFFFFFFF
+                sequences[serial] = sequence
+                pack_sequence(records, offset + SEQUENCE_OFFSET, sequence)
+            offset += size
+            yield first_time + nanoseconds * 1e-9, streams[stream_id], payload
+        else:
+            offset += size
+            if kind == STREAM_RECORD:
+                streams[stream_id] = tuple(json.loads(bytes(payload)))
+
+
+def read_capture(path, start=None, end=None, serials=None, types=None):
+    """
+    Yields the (time, listening address, datagram) of the datagrams of a capture file, in the order
+    received. Only the datagrams received within [start, end), in time.time() seconds, sent by one of
+    the serials and holding one of the data item types are yielded when given. The sidecar index,
+    when there is one, is used to only read the blocks holding any of them.
+    """
+    if serials is not None: serials = frozenset(serials)
+    if types is not None: types = frozenset(types)
+    index = None
+    if start is not None or end is not None or serials is not None or types is not None:
+        try:
+            index = CaptureIndex(path)
+        except (OSError, CaptureError):
+            # Captures without an index are read from start to end, skipping blocks by time only
+            pass
+
+    with open(path, 'rb') as capture_file:
+        created, flags = read_file_header(capture_file)
+        if index is None:
+            blocks = read_blocks(capture_file, start, end)
+        else:
+            blocks = index.read_blocks(capture_file, index.find_blocks(start, end, serials, types))
+
+        for first_time, last_time, records in blocks:
+            if records is None:
+                continue
+            records = decompress_records(records, flags)
+            if start is None and end is None and serials is None and types is None:
+                yield from iter_records(records, flags, first_time)
+                continue
+            for timestamp, key, datagram in iter_records(records, flags, first_time):
+                if (start is not None and timestamp < start) or (end is not None and timestamp >= end):
+                    continue
+                if serials is not None:
+                    packet_id = peek_packet_id(datagram)
+                    if packet_id is None or packet_id[0] not in serials:
+                        continue
+                if types is not None:
+                    datagram_types = set()
+                    add_data_item_types(datagram, datagram_types)
+                    if types.isdisjoint(datagram_types):
+                        continue
+                yield timestamp, key, datagram
+
+
+def is_pcap(path):
+    """True for a libpcap file, False for a capture file written by the monitor."""
+    with open(path, 'rb') as capture_file:
+        magic = capture_file.read(4)
+    if magic == PCAPNG_MAGIC:
+        raise CaptureError("{} is a pcapng file, only pcap files are supported, e.g. convert it with editcap -F pcap".format(path))
+    return magic in PCAP_MAGICS
+
+
+def read_pcap(path, start=None, end=None):
+    """
+    Yields the (time, listening address, datagram) of the UDP over IPv4 datagrams of a pcap file received
+    within [start, end) when given, like read_capture. The listening address is the destination
+    address and port, without an interface. Fragmented datagrams are skipped.
+    """
+    with open(path, 'rb') as pcap_file:
+        header = pcap_file.read(24)
+        if len(header) < 24 or header[:4] not in PCAP_MAGICS:
+            raise CaptureError("{} is not a pcap file".format(path))
+        byte_order, resolution = PCAP_MAGICS[header[:4]]
+        link_type = struct.unpack(byte_order + 'I', header[20:24])[0] & 0xFFFF
+        if link_type not in PCAP_LINK_HEADERS:
+            raise CaptureError("{} has an unsupported link type: {}".format(path, link_type))
+        link_size, ethertype_offset = PCAP_LINK_HEADERS[link_type]
+        unpack_record = struct.Struct(byte_order + 'IIII').unpack
+
+        while True:
+            record = pcap_file.read(16)
+            if len(record) < 16:
+                return
+            seconds, fraction, size, original_size = unpack_record(record)
+            frame = pcap_file.read(size)
+            if len(frame) < size:
+                return
+            timestamp = seconds + fraction * resolution
+            if (start is not None and timestamp < start) or (end is not None and timestamp >= end):
+                continue
+
+            ip_start = link_size
+            if ethertype_offset is not None:
+                ethertype = int.from_bytes(frame[ethertype_offset:ethertype_offset + 2], 'big')
+                if ethertype == ETHERTYPE_VLAN and link_type == 1:
+                    ethertype = int.from_bytes(frame[16:18], 'big')
+                    ip_start += 4
+                if ethertype != ETHERTYPE_IPV4:
+                    continue
+            if len(frame) < ip_start + 20 or frame[ip_start] >> 4 != 4 or frame[ip_start + 9] != IP_PROTOCOL_UDP:
+                continue
+            if int.from_bytes(frame[ip_start + 6:ip_start + 8], 'big') & 0x3FFF:
+                # More fragments flag or fragment offset
+                continue
+            udp_start = ip_start + (frame[ip_start] & 0x0F) * 4
+            if len(frame) < udp_start + 8:
+                continue
+            port = int.from_bytes(frame[udp_start + 2:udp_start + 4], 'big')
+            udp_size = int.from_bytes(frame[udp_start + 4:udp_start + 6], 'big')
+            key = ('.'.join(str(byte) for byte in frame[ip_start + 16:ip_start + 20]), port, '')
+            yield timestamp, key, memoryview(frame)[udp_start + 8:udp_start + udp_size]
+
+
+class CaptureIndex:
+    """
+    Sidecar index of a capture file, read through a memory map. Blocks are the unit of seeking:
+    the earliest and latest times of every block act as time checkpoints, at most
+    CaptureRecorder.flush_interval apart, and every device serial number and data item type has
+    a bitmap of the blocks holding it. The index of a capture still being written covers the
+    blocks written when it was opened.
+    """
+
+    def __init__(self, path):
+        offsets, sizes, first_times, last_times = [], [], [], []
+        serial_blocks = dict()  # Blocks holding every serial number
+        type_blocks = dict()    # Blocks holding every data item type
+        with open(get_index_path(path), 'rb') as index_file:
+            if os.fstat(index_file.fileno()).st_size < INDEX_HEADER.size:
+                raise CaptureError("{} is too short to be a capture index".format(index_file.name))
+            with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index_map:
+                magic, version = INDEX_HEADER.unpack_from(index_map)
+                if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                    raise CaptureError("{} is not a version {} capture index".format(index_file.name, INDEX_VERSION))
+                position = INDEX_HEADER.size
+                while position + INDEX_ENTRY.size <= len(index_map):
+                    offset, size, count, first_time, last_time, serial_count, type_count = INDEX_ENTRY.unpack_from(index_map, position)
+                    position += INDEX_ENTRY.size
+                    if position + serial_count * 4 + type_count * 2 > len(index_map):
+                        # Entry being written
+                        break
+                    block = len(offsets)
+                    for serial in struct.unpack_from('<{}I'.format(serial_count), index_map, position):
+                        serial_blocks.setdefault(serial, []).append(block)
+                    position += serial_count * 4
+                    for di_type in struct.unpack_from('<{}H'.format(type_count), index_map, position):
+                        type_blocks.setdefault(di_type, []).append(block)
+                    position += type_count * 2
+                    offsets.append(offset)
+                    sizes.append(size)
+                    first_times.append(first_time)
+                    last_times.append(last_time)
+
+        self.offsets = np.array(offsets, dtype=np.uint64)
+        self.sizes = np.array(sizes, dtype=np.uint32)
+        self.first_times = np.array(first_times)
+        self.last_times = np.array(last_times)
+        self.serials = {serial: self.get_bitmap(blocks) for serial, blocks in serial_blocks.items()}
+        self.types = {di_type: self.get_bitmap(blocks) for di_type, blocks in type_blocks.items()}
+
+    def get_bitmap(self, blocks):
+        bitmap = np.zeros(len(self.offsets), dtype=bool)
+        bitmap[blocks] = True
+        return bitmap
+
+    def find_blocks(self, start=None, end=None, serials=None, types=None):
+        """
+        Returns the numbers of the blocks that may hold datagrams received within [start, end), sent by one
+        of the serials and holding one of the data item types, in file order.
+        """
+        selected = np.ones(len(self.offsets), dtype=bool)
+        if start is not None:
+            selected &= self.last_times >= start
+        if end is not None:
+            selected &= self.first_times < end
+        for keys, bitmaps in ((serials, self.serials), (types, self.types)):
+            if keys is not None:
+                matching = np.zeros(len(self.offsets), dtype=bool)
+                for key in keys:
+                    if key in bitmaps:
+                        matching |= bitmaps[key]
+                selected &= matching
+        return np.flatnonzero(selected)
+
+    def read_blocks(self, capture_file, blocks):
+        """Yields the blocks of capture_file with the given numbers, see read_block."""
+        for block in blocks:
+            capture_file.seek(int(self.offsets[block]))
+            block = read_block(capture_file)
+            if block is None:
+                return
+            yield block
+
+
+class CaptureRecorder(threading.Thread):
+    """
+    Appends every datagram received on any listening address to capture files, with its
+    reception time and listening address. Receiving threads only copy the datagrams of a batch
+    and queue them, records are packed and written in blocks by the recorder thread. When the
+    disk does not keep up, batches beyond max_pending bytes are dropped and counted.
+    Files are named after the time they were started and rotated by size and age. Blocks are
+    compressed on their own with the codec of CAPTURE_CODECS named compression, and their
+    records delta encoded when delta is set.
+    """
+    block_size = CAPTURE_BLOCK_SIZE                # in bytes, datagrams gathered before a block is written
+    flush_interval = CAPTURE_FLUSH_INTERVAL        # in seconds, longest a datagram waits for its block to be written
+    rotate_size = CAPTURE_ROTATE_SIZE              # in bytes, None never rotates by size
+    rotate_time = CAPTURE_ROTATE_TIME              # in seconds, None never rotates by age
+    max_pending = CAPTURE_MAX_PENDING              # in bytes, datagrams waiting to be written
+    compression = CAPTURE_COMPRESSION              # codec name, 'none' writes the blocks as packed
+    compression_level = CAPTURE_COMPRESSION_LEVEL  # zlib level or lzma preset, -1 for the codec default
+    delta = CAPTURE_DELTA                          # delta encode record times and CDP sequences
+
+    def __init__(self, directory, prefix='cuwb'):
+        threading.Thread.__init__(self, daemon=True)
+        self._stopevent = False
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+        self.flags = CAPTURE_CODECS[self.compression] | (DELTA_FLAG if self.delta else 0)
+
+        self.lock = threading.Lock()
+        self.batch_ready = threading.Condition(self.lock)
+        self.batches = deque()   # (listening address, [(time.monotonic(), datagram)]) waiting to be written
+        self.pending = 0         # in bytes, datagrams of the queued batches
+
+        self.stream_ids = dict() # Stream id of every listening address, shared by every file
+        self.capture_file = None
+        self.index_file = None
+        self.path = None
+        self.file_size = 0
+        self.file_end = 0        # time.monotonic() at which the current file is rotated
+        self.clock_offset = 0.0  # time.time() - time.monotonic() when the current block was started
+        self.block = bytearray()
+        self.block_streams = set()
+        self.block_serials = set()
+        self.block_types = set()
+        self.block_count = 0
+        self.block_first = None  # Earliest and latest reception times of the block, time.monotonic()
+        self.block_last = None
+        self.block_end = 0       # time.monotonic() at which the current block is written
+        self.block_sequences = dict()  # Previous CDP sequence of every serial number in the block, when delta encoding
+        self.block_time = None   # Nanoseconds of the previous datagram record of the block, when delta encoding
+        self.block_first_record = None  # Offset of the time of the first datagram record of the block, when delta encoding
+
+        self.files = 0           # Files started
+        self.datagrams = 0       # Datagrams written
+        self.bytes = 0           # Bytes written, over every file
+        self.drops = 0           # Datagrams dropped because too many were waiting to be written
+        self.raw_bytes = 0       # Records before compression, over every block
+        self.stored_bytes = 0    # Records as written, over every block
+        self.compress_time = 0.0 # in seconds of the recorder thread's CPU time, spent compressing
+        self.start_time = time.monotonic()
+
+    def record(self, ring, batch):
+        """Queues the (slot, nbytes) of a batch received into ring. Called by the receiving threads."""
+        if not batch:
+            return
+        slots = ring.slots
+        timestamps = ring.timestamps
+        datagrams = [(timestamps[idx], bytes(slots[idx][:nbytes])) for idx, nbytes in batch]
+        size = sum(nbytes for idx, nbytes in batch)
+        with self.lock:
+            if self.pending + size > self.max_pending:
+                self.drops += len(datagrams)
+                return
+            self.pending += size
+            self.batches.append((ring.key, datagrams))
+            self.batch_ready.notify()
+
+    def run(self):
+        while UwbNetwork.running and not self._stopevent:
+            with self.lock:
+                self.batch_ready.wait_for(lambda: self.batches or self._stopevent, self.flush_interval)
+                batches = list(self.batches)
+                self.batches.clear()
+                self.pending = 0
+            for key, datagrams in batches:
+                self.add_datagrams(key, datagrams)
+            if self.block_count and (len(self.block) >= self.block_size or time.monotonic() >= self.block_end):
+                self.write_block()
+
+        with self.lock:
+            batches = list(self.batches)
+            self.batches.clear()
+            self.pending = 0
+        for key, datagrams in batches:
+            self.add_datagrams(key, datagrams)
+        self.write_block()
+        self.close_file()
+
+    def add_datagrams(self, key, datagrams):
+        stream_id = self.stream_ids.get(key)
+        if stream_id is None:
+            stream_id = len(self.stream_ids)
+            self.stream_ids[key] = stream_id
+        if stream_id not in self.block_streams:
+            # Every block defines the listening addresses it uses, so blocks can be read on their own
+            payload = json.dumps(key).encode()
+            self.block += RECORD_HEADER.pack(STREAM_RECORD, stream_id, len(payload), 0.0)
+            self.block += payload
+            self.block_streams.add(stream_id)
+        if self.block_first is None:
+            # Records hold time.time(), converted with the same offset within a block
+            self.clock_offset = time.time() - time.monotonic()
+            self.block_first = self.block_last = datagrams[0][0]
+            self.block_end = time.monotonic() + self.flush_interval
+
+        block = self.block
+        serials = self.block_serials
+        types = self.block_types
+        if self.delta:
+            self.add_delta_records(stream_id, datagrams)
+        else:
+            pack = RECORD_HEADER.pack
+            offset = self.clock_offset
+            for timestamp, datagram in datagrams:
+                block += pack(DATAGRAM_RECORD, stream_id, len(datagram), timestamp + offset)
+                block += datagram
+                packet_id = peek_packet_id(datagram)
+                if packet_id is not None:
+                    serials.add(packet_id[0])
+                    add_data_item_types(datagram, types)
+        self.block_count += len(datagrams)
+        # Batches of several listening addresses may interleave
+        self.block_first = min(self.block_first, min(timestamp for timestamp, datagram in datagrams))
+        self.block_last = max(self.block_last, max(timestamp for timestamp, datagram in datagrams))
+        if len(block) >= self.block_size:
+            self.write_block()
+
+    def add_delta_records(self, stream_id, datagrams):
+        block = self.block
+        pack = DELTA_RECORD_HEADER.pack
+        pack_sequence = SEQUENCE.pack_into
+        sequences = self.block_sequences
+        serials = self.block_serials
+        types = self.block_types
+        previous = self.block_time
+        if previous is None:
+            # Made relative to the earliest time of the block once the block is written
+            self.block_first_record = len(block) + DELTA_RECORD_HEADER.size - 8
+            previous = 0
+        for timestamp, datagram in datagrams:
+            nanoseconds = round(timestamp * 1e9)
+            block += pack(DATAGRAM_RECORD, stream_id, len(datagram), nanoseconds - previous)
+            previous = nanoseconds
+            position = len(block)
+            block += datagram
+            packet_id = peek_packet_id(datagram)
+            if packet_id is not None:
+                serial, sequence = packet_id
+                pack_sequence(block, position + SEQUENCE_OFFSET, (sequence - sequences.get(serial, 0)) & 0xFFFFFFFF)
+                sequences[serial] = sequence
+                serials.add(serial)
+                add_data_item_types(datagram, types)
+        self.block_time = previous
+
+    def write_block(self):
+        if not self.block_count:
+            return
+        if self.delta:
+            first_nanoseconds = struct.unpack_from('<q', self.block, self.block_first_record)[0]
+            struct.pack_into('<q', self.block, self.block_first_record, first_nanoseconds - round(self.block_first * 1e9))
+        start = time.thread_time()
+        records = compress_records(self.block, self.flags, self.compression_level)
+        self.compress_time += time.thread_time() - start
+        self.raw_bytes += len(self.block)
+        self.stored_bytes += len(records)
+
+        now = time.monotonic()
+        size = BLOCK_HEADER.size + len(records)
+        if self.capture_file is not None and ((self.rotate_size is not None and self.file_size + size > self.rotate_size) or
+                                              (self.rotate_time is not None and now >= self.file_end)):
+            self.close_file()
+        if self.capture_file is None:
+            self.open_file(now)
+        first_time = self.block_first + self.clock_offset
+        last_time = self.block_last + self.clock_offset
+        self.capture_file.write(BLOCK_HEADER.pack(BLOCK_MAGIC, len(records), self.block_count, first_time, last_time))
+        self.capture_file.write(records)
+        self.capture_file.flush()
+        # Only indexed once written, so readers of the index find complete blocks
+        self.index_file.write(INDEX_ENTRY.pack(self.file_size, len(records), self.block_count, first_time, last_time,
+                                               len(self.block_serials), len(self.block_types)) +
+                              struct.pack('<{}I'.format(len(self.block_serials)), *self.block_serials) +
+                              struct.pack('<{}H'.format(len(self.block_types)), *self.block_types))
+        self.file_size += size
+        self.bytes += size
+        self.datagrams += self.block_count
+
+        self.block = bytearray()
+        self.block_streams = set()
+        self.block_serials = set()
+        self.block_types = set()
+        self.block_count = 0
+        self.block_first = None
+        self.block_last = None
+        self.block_sequences = dict()
+        self.block_time = None
+        self.block_first_record = None
+
+    def open_file(self, now):
+        name = '{}_{}'.format(self.prefix, datetime.now().strftime('%Y%m%d_%H%M%S'))
+        path = os.path.join(self.directory, name + CAPTURE_EXTENSION)
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, '{}_{}{}'.format(name, suffix, CAPTURE_EXTENSION))
+            suffix += 1
+        self.capture_file = open(path, 'xb', buffering=0)
+        self.capture_file.write(FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, self.flags, now + self.clock_offset))
+        self.index_file = open(get_index_path(path), 'wb', buffering=0)
+        self.index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION))
+        self.path = path
+        self.file_size = FILE_HEADER.size
+        self.bytes += FILE_HEADER.size
+        self.file_end = now + self.rotate_time if self.rotate_time is not None else None
+        self.files += 1
+
+    def close_file(self):
+        if self.capture_file is not None:
+            self.capture_file.close()
+            self.capture_file = None
+            self.index_file.close()
+            self.index_file = None
+
+    def get_status(self):
+        """
+        Progress of the recording. The compression ratio is the size of the records before and after
+        compression, its CPU cost the compression time per datagram and as a percentage of one core.
+        """
+        elapsed = time.monotonic() - self.start_time
+        return dict(path=self.path, files=self.files, datagrams=self.datagrams, bytes=self.bytes,
+                    pending=self.pending, drops=self.drops, compression=self.compression, delta=self.delta,
+                    raw_bytes=self.raw_bytes, stored_bytes=self.stored_bytes,
+                    compression_ratio=round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else None,
+                    compression_us=round(self.compress_time * 1e6 / self.datagrams, 3) if self.datagrams else None,
+                    compression_cpu_percent=round(100 * self.compress_time / elapsed, 2) if elapsed > 0 else 0.0)
+
+    def get_summary(self):
+        """One line description of the recording for the windows."""
+        summary = 'Recording: {} ({} files, {} datagrams, {}) - Dropped: {}'.format(self.path, self.files, self.datagrams,
+                                                                                  format_bytes(self.bytes), self.drops)
+        status = self.get_status()
+        if self.compression != 'none' and status['compression_ratio'] is not None:
+            summary += ' - {compression} x{compression_ratio:.1f}, {compression_us:.1f} us/datagram, {compression_cpu_percent:.1f}% CPU'.format(**status)
+        return summary
+
+    def wait(self):
+        with self.lock:
+            self._stopevent = True
+            self.batch_ready.notify()
+
+    def __del__(self):
+        self.wait()
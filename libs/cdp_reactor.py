@@ -0,0 +1,107 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import queue
+import selectors
+import threading
+import time
+
+# Local libraries
+from network_objects import UwbNetwork
+from settings import *
+from socket_processing import SocketProcessing, CdpProcess
+
+
+class CdpReactor(threading.Thread):
+    """
+    Ingest engine serving every listening address from a single thread. A selector waits on
+    the sockets of all the streams and the datagrams of every ready socket are received and
+    handed to the decode stage in batches. Streams are SocketProcessing objects whose own
+    thread is never started.
+    """
+    block_timeout = 0.010  # A stream with a full ring must not hold up the other streams for long
+
+    def __init__(self, decode_pool=None):
+        threading.Thread.__init__(self, daemon=True)
+        self._stopevent = False
+        self.decode_pool = decode_pool
+        self.selector = selectors.DefaultSelector()
+        # The selector is only used from the reactor thread, other threads queue (stream, add) changes
+        self.changes = queue.SimpleQueue()
+        # Without decoding processes, rings holding new datagrams are queued for a single decoding thread
+        self.ready_rings = queue.SimpleQueue()
+        self.decoder = None
+        if decode_pool is None:
+            self.decoder = CdpRingDecoder(self.ready_rings)
+
+    def add_stream(self, stream):
+        stream.block_timeout = self.block_timeout
+        self.changes.put((stream, True))
+
+    def remove_stream(self, stream):
+        self.changes.put((stream, False))
+
+    def run(self):
+        if self.decoder is not None:
+            self.decoder.start()
+
+        while UwbNetwork.running and not self._stopevent:
+            self.apply_changes()
+            if not self.selector.get_map():
+                # Selecting without any socket is an error on Windows
+                time.sleep(0.250)
+                continue
+
+            events = self.selector.select(0.250)
+            if not events:
+                if SocketProcessing.print_timeouts: print("time out", end='\r', flush=True)
+                continue
+
+            for key, mask in events:
+                stream = key.data
+                batch = stream.service()
+                if batch and self.decoder is not None:
+                    self.ready_rings.put(stream.ring)
+
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+        self.selector.close()
+        if self.decoder is not None:
+            self.decoder.wait()
+
+    def apply_changes(self):
+        while True:
+            try:
+                stream, add = self.changes.get_nowait()
+            except queue.Empty:
+                return
+            if add:
+                self.selector.register(stream.sock, selectors.EVENT_READ, stream)
+            else:
+                self.selector.unregister(stream.sock)
+                stream.sock.close()
+
+    def wait(self):
+        self._stopevent = True
+
+    def __del__(self):
+        self.wait()
+
+
+class CdpRingDecoder(CdpProcess):
+    """Decodes the rings of all the streams of a CdpReactor, in the order they received datagrams."""
+
+    def __init__(self, ready_rings):
+        threading.Thread.__init__(self, daemon=True)
+        self.ready_rings = ready_rings
+        self._stopevent = False
+
+    def run(self):
+        while UwbNetwork.running and not self._stopevent:
+            try:
+                ring = self.ready_rings.get(timeout=0.250)
+            except queue.Empty:
+                continue
+            # Every queued ring matches one committed batch, that batch may already have been decoded
+            self.decode_slots(ring, ring.pop_batch(RECEIVE_BATCH_SIZE, 0))
@@ -0,0 +1,259 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import threading
+import numpy as np
+from collections import deque
+from operator import attrgetter
+
+# Local libraries
+import cdp
+from lazy_data_item import get_item_bytes
+from settings import *
+
+# Data item types whose numeric fields are stored in columns as soon as a node receives them.
+# Columns of any other type are only stored once a window asks for them.
+COLUMN_TYPES = set(getattr(cdp, name).type for name in
+                   ('PositionV3', 'DistanceV2', 'AccelerometerV2', 'AccelerometerV3', 'GyroscopeV2', 'GyroscopeV3',
+                    'MagnetometerV2', 'MagnetometerV3', 'PressureV2', 'TemperatureV2', 'QuaternionV2', 'QuaternionV3')
+                   if hasattr(cdp, name))
+
+# numpy types of the struct formats of the cdp data item attributes
+NUMPY_TYPES = {'b': np.int8, 'B': np.uint8, 'h': np.int16, 'H': np.uint16, 'i': np.int32, 'I': np.uint32,
+               'q': np.int64, 'Q': np.uint64, 'f': np.float32, 'd': np.float64, '?': np.bool_}
+
+
+def get_numeric_fields(di_type):
+    """Returns the (name, numpy type, is serial number) of the scalar numeric attributes of a data item type."""
+    data_item_class = cdp.CDP.data_item_classes.get(di_type)
+    fields = []
+    for attribute in getattr(data_item_class, 'definition', []):
+        if not attribute.is_list and attribute.format in NUMPY_TYPES:
+            fields.append((attribute.name, NUMPY_TYPES[attribute.format], isinstance(attribute, cdp.DISerialNumberAttr)))
+    return fields
+
+
+def get_fixed_dtype(di_type):
+    """
+    Returns a numpy structured type reading the numeric fields of a data item type straight
+    from its bytes, None when an attribute of variable size (e.g. a list) makes offsets unknown.
+    """
+    data_item_class = cdp.CDP.data_item_classes.get(di_type)
+    if data_item_class is not None and '_decode' in vars(data_item_class):
+        # Decoded by its own code, not attribute by attribute
+        return None
+    names, formats, offsets = [], [], []
+    offset = 0
+    for attribute in getattr(data_item_class, 'definition', []):
+        size = getattr(attribute, 'size', -1)
+        if attribute.is_list or size < 0:
+            return None
+        if attribute.format in NUMPY_TYPES:
+            names.append(attribute.name)
+            formats.append(np.dtype(NUMPY_TYPES[attribute.format]).newbyteorder('<'))
+            offsets.append(offset)
+        offset += size
+    return np.dtype(dict(names=names, formats=formats, offsets=offsets, itemsize=offset))
+
+
+def get_nearest(times, query_times):
+    """
+    Returns the index of the nearest of the ascending, non empty, times to every one of
+    query_times, e.g. to pair the data items of two types received at about the same time.
+    """
+    times = np.asarray(times)
+    query_times = np.asarray(query_times)
+    if len(times) < 2:
+        return np.zeros(len(query_times), dtype=np.intp)
+    indices = np.clip(np.searchsorted(times, query_times), 1, len(times) - 1)
+    # Step back where the previous time is closer
+    indices -= query_times - times[indices - 1] < times[indices] - query_times
+    return indices
+
+
+class ColumnStore:
+    """
+    Circular numpy columns holding the last capacity rows of values. Every column is twice
+    the capacity and every value is written at both its position and its position plus the
+    capacity, so the rows are always available in order as a contiguous view without copying.
+    Rows are appended to a short list first and written to the columns a few at a time.
+    """
+
+    def __init__(self, capacity, fields, serial_numbers=()):
+        """
+        fields is a list of (name, numpy type), rows are tuples of values in the same order.
+        The columns named in serial_numbers are given cdp.CiholasSerialNumber values.
+        """
+        self.capacity = max(capacity, 1)
+        self.names = [name for name, dtype in fields]
+        self.columns = {name: np.zeros(2 * self.capacity, dtype) for name, dtype in fields}
+        self.serial_numbers = frozenset(serial_numbers)
+        self.lock = threading.Lock()
+        self.pending = []  # Rows appended since the columns were last written
+        self.next = 0      # Position of the next row in the first half of the columns
+        self.count = 0     # Number of rows held, up to the capacity
+
+    def __len__(self):
+        with self.lock:
+            return min(self.count + len(self.pending), self.capacity)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def append(self, row):
+        with self.lock:
+            self.pending.append(row)
+            if len(self.pending) >= COLUMN_FLUSH_ROWS:
+                self.flush()
+
+    def get_columns(self, *names):
+        """
+        Returns views of the named columns holding their rows from oldest to newest. The views
+        share memory with the store, so copy them to keep values past the next append.
+        """
+        with self.lock:
+            self.flush()
+            start = (self.next - self.count) % self.capacity
+            return tuple(self.columns[name][start:start + self.count] for name in names)
+
+    def get_range(self, start, end, *names, key='time'):
+        """
+        Returns views of the named columns holding the rows whose key column is within
+        [start, end), found by binary search so the key column must be ascending, like the
+        reception 'time' or the 'network_time' of data items from a single device.
+        """
+        with self.lock:
+            self.flush()
+            first = (self.next - self.count) % self.capacity
+            keys = self.columns[key][first:first + self.count]
+            low, high = np.searchsorted(keys, (start, end))
+            return tuple(self.columns[name][first + low:first + high] for name in names)
+
+    def clear(self):
+        with self.lock:
+            self.pending = []
+            self.next = 0
+            self.count = 0
+
+    def flush(self):
+        """Writes the pending rows to the columns. The lock must be held."""
+        rows = self.pending[-self.capacity:]
+        self.pending = []
+        if not rows:
+            return
+        values = []
+        for name, column_values in zip(self.names, zip(*rows)):
+            if name in self.serial_numbers:
+                column_values = [value.as_int for value in column_values]
+            values.append(np.array(column_values, self.columns[name].dtype))
+        self.write(values)
+
+    def write(self, values):
+        """Writes arrays of values, one per column in the order of names, as the newest rows. The lock must be held."""
+        num_rows = len(values[0])
+        if num_rows > self.capacity:
+            values = [column_values[-self.capacity:] for column_values in values]
+            num_rows = self.capacity
+        start = self.next
+        first = min(num_rows, self.capacity - start)
+        for name, column_values in zip(self.names, values):
+            column = self.columns[name]
+            column[start:start + first] = column_values[:first]
+            column[start + self.capacity:start + self.capacity + first] = column_values[:first]
+            if first < num_rows:
+                column[:num_rows - first] = column_values[first:]
+                column[self.capacity:self.capacity + num_rows - first] = column_values[first:]
+        self.next = (start + num_rows) % self.capacity
+        self.count = min(self.count + num_rows, self.capacity)
+
+
+class DataItemColumns(ColumnStore):
+    """
+    Columns of the numeric fields of one data item type received by a node, along with their 'time'.
+    Data items are only queued as they are received and turned into rows in batches when the
+    columns are read, straight from their bytes with numpy for the data items not decoded yet.
+    With a max_age, rows older than max_age seconds before the newest one are dropped as rows are written.
+    """
+
+    def __init__(self, di_type, capacity, max_age=None):
+        fields = get_numeric_fields(di_type)
+        super().__init__(capacity, [('time', np.float64)] + [(name, dtype) for name, dtype, is_serial in fields],
+                         [name for name, dtype, is_serial in fields if is_serial])
+        self.max_age = max_age
+        self.fields = fields
+        self.dtype = get_fixed_dtype(di_type)  # Layout of the numeric fields in the bytes of a data item
+        # (data item, time) appended since the columns were last written, only the newest fit in the columns
+        self.pending_items = deque([], self.capacity)
+        # attrgetter only returns a tuple for several names
+        names = [name for name, dtype, is_serial in fields]
+        if len(names) > 1:
+            self.get_fields = attrgetter(*names)
+        elif names:
+            self.get_fields = lambda data_item: (getattr(data_item, names[0]),)
+        else:
+            self.get_fields = lambda data_item: ()
+
+    def __len__(self):
+        with self.lock:
+            return min(self.count + len(self.pending) + len(self.pending_items), self.capacity)
+
+    def append_item(self, data_item, time):
+        """Queues a data item received at time. Called by the receiving thread for every data item, without locking."""
+        self.pending_items.append((data_item, time))
+
+    def clear(self):
+        with self.lock:
+            self.pending_items.clear()
+        super().clear()
+
+    def get_rows(self, items):
+        """Returns the arrays of values of the (data item, time) of items, one per column in the order of names."""
+        num_rows = len(items)
+        values = [np.fromiter((time for data_item, time in items), np.float64, num_rows)]
+        payloads = []          # Bytes of the data items not decoded yet, padded or cut to the layout
+        payload_rows = []
+        decoded = []           # Fields of the others
+        decoded_rows = []
+        itemsize = None if self.dtype is None else self.dtype.itemsize
+        for row, (data_item, time) in enumerate(items):
+            payload = None if itemsize is None else get_item_bytes(data_item)
+            if payload is None:
+                decoded.append(self.get_fields(data_item))
+                decoded_rows.append(row)
+            else:
+                # cdp decodes missing trailing attributes as zeros as well
+                payloads.append(bytes(payload[:itemsize]).ljust(itemsize, b'\0'))
+                payload_rows.append(row)
+        payload_values = np.frombuffer(b''.join(payloads), self.dtype) if payloads else None
+        for field, (name, dtype, is_serial) in enumerate(self.fields):
+            if not decoded:
+                values.append(payload_values[name])
+                continue
+            if is_serial:
+                field_values = [fields[field].as_int for fields in decoded]
+            else:
+                field_values = [fields[field] for fields in decoded]
+            if not payloads:
+                values.append(np.array(field_values, dtype))
+                continue
+            column_values = np.empty(num_rows, dtype)
+            column_values[payload_rows] = payload_values[name]
+            column_values[decoded_rows] = field_values
+            values.append(column_values)
+        return values
+
+    def flush(self):
+        pending_items = self.pending_items
+        # Only this side pops, so every item counted is there
+        items = [pending_items.popleft() for _ in range(len(pending_items))]
+        if items:
+            self.write(self.get_rows(items))
+        written = items or self.pending
+        super().flush()
+        if written and self.max_age is not None and self.count:
+            start = (self.next - self.count) % self.capacity
+            times = self.columns['time'][start:start + self.count]
+            # Reception times are sorted but for the odd datagram reordered between streams, close enough here
+            self.count -= int(np.searchsorted(times, times[-1] - self.max_age))
@@ -0,0 +1,229 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from operator import attrgetter
+
+# Local libraries
+import cdp
+import numpy as np
+from column_store import get_fixed_dtype, get_numeric_fields
+from lazy_data_item import get_data_item_class
+from network_objects import UwbNetwork
+from packet_parsing import parse_cdp_header, parse_data_items
+from settings import *
+
+# Columns every data item type gets, before its own numeric fields
+HEADER_COLUMNS = (('reception_time', np.float64),      # time.time() seconds
+                  ('cdp_header_serial', np.uint32),    # Serial number of the device that sent the CDP packet
+                  ('cdp_header_sequence', np.uint32))
+NPY_HEADER_SIZE = 128  # in bytes, room for the header of a 1-D .npy file of any length
+
+
+class NpyWriter:
+    """
+    Appends to a 1-D .npy file without knowing its final length: the header is written with
+    room to spare and rewritten with the actual length on close. np.load(path, mmap_mode='r')
+    maps the result.
+    """
+
+    def __init__(self, path, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.length = 0
+        self.file = open(path, 'wb')
+        self.write_header()
+
+    def write_header(self):
+        header = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }}".format(np.lib.format.dtype_to_descr(self.dtype), self.length)
+        header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + '\n'
+        self.file.write(b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header.encode('latin1'))
+
+    def append(self, values):
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        self.file.write(values.data)
+        self.length += len(values)
+
+    def close(self):
+        self.file.seek(0)
+        self.write_header()
+        self.file.close()
+
+
+class TypeExport:
+    """
+    Columns of one data item type, gathered chunk_rows at a time and appended to one .npy file
+    per column. Data items of a fixed layout are kept as bytes and decoded together by numpy,
+    the others are decoded one by one by cdp.
+    """
+
+    def __init__(self, di_type, directory, chunk_rows, decoded=False):
+        self.di_type = di_type
+        self.name = get_data_item_class(di_type).__name__
+        self.directory = directory
+        self.chunk_rows = chunk_rows
+        self.fields = get_numeric_fields(di_type)
+        self.dtype = None if decoded else get_fixed_dtype(di_type)
+        self.getters = [attrgetter(name + '.as_int' if is_serial else name) for name, numpy_type, is_serial in self.fields]
+        os.makedirs(directory, exist_ok=True)
+        self.writers = [NpyWriter(os.path.join(directory, name + '.npy'), numpy_type)
+                        for name, numpy_type in HEADER_COLUMNS + tuple((name, numpy_type) for name, numpy_type, is_serial in self.fields)]
+        self.rows = 0
+        self.clear()
+
+    def clear(self):
+        self.times = []
+        self.serials = []
+        self.sequences = []
+        self.payloads = []                          # Fixed layout items, padded to the size of the layout
+        self.values = [[] for field in self.fields] # Decoded items
+
+    def add_payload(self, timestamp, serial, sequence, payload):
+        """Adds a data item from its bytes, timestamp in time.time() seconds."""
+        self.times.append(timestamp)
+        self.serials.append(serial)
+        self.sequences.append(sequence)
+        if self.dtype is not None:
+            itemsize = self.dtype.itemsize
+            payload = bytes(payload[:itemsize])
+            if len(payload) < itemsize:
+                # cdp decodes missing trailing attributes as zeros as well
+                payload = payload.ljust(itemsize, b'\0')
+            self.payloads.append(payload)
+        else:
+            self.add_values(get_data_item_class(self.di_type)(bytes(payload)))
+        if len(self.times) >= self.chunk_rows:
+            self.flush()
+
+    def add_data_item(self, timestamp, data_item):
+        """Adds a data item object, e.g. from a node history, timestamp in time.time() seconds."""
+        self.times.append(timestamp)
+        self.serials.append(data_item.cdp_header_serial.as_int)
+        self.sequences.append(data_item.cdp_header_sequence)
+        self.add_values(data_item)
+        if len(self.times) >= self.chunk_rows:
+            self.flush()
+
+    def add_values(self, data_item):
+        for values, getter in zip(self.values, self.getters):
+            values.append(getter(data_item))
+
+    def flush(self):
+        if not self.times:
+            return
+        writers = iter(self.writers)
+        for values in (self.times, self.serials, self.sequences):
+            next(writers).append(values)
+        if self.dtype is not None:
+            rows = np.frombuffer(b''.join(self.payloads), dtype=self.dtype)
+            for name, numpy_type, is_serial in self.fields:
+                next(writers).append(rows[name])
+        else:
+            for values in self.values:
+                next(writers).append(values)
+        self.rows += len(self.times)
+        self.clear()
+
+    def close(self):
+        self.flush()
+        for writer in self.writers:
+            writer.close()
+
+
+class ColumnarExporter:
+    """
+    Exports data items into one set of columns per data item type, a reception time, the
+    serial number and sequence of their CDP packet and their numeric attributes, in the order
+    added. Columns are written chunk_rows at a time so memory does not grow with the export.
+    With npz, every type becomes directory/TypeName.npz, otherwise directory/TypeName/column.npy.
+    """
+
+    def __init__(self, directory, npz=True, compress=False, chunk_rows=EXPORT_CHUNK_ROWS, serials=None, types=None):
+        self.directory = directory
+        self.npz = npz
+        self.compress = compress
+        self.chunk_rows = chunk_rows
+        self.serials = None if serials is None else frozenset(serials)
+        self.types = None if types is None else frozenset(types)
+        os.makedirs(directory, exist_ok=True)
+        # With npz, columns are written to a scratch directory first and zipped once complete
+        self.columns_directory = tempfile.mkdtemp(dir=directory) if npz else directory
+        self.exports = dict()  # TypeExport indexed by data item type
+        self.skipped_types = set()  # Types without any numeric attribute, e.g. unknown to cdp
+        self.datagrams = 0
+        self.errors = 0        # Datagrams that are not CDP packets
+
+    def get_export(self, di_type, decoded=False):
+        export = self.exports.get(di_type)
+        if export is None:
+            export = TypeExport(di_type, os.path.join(self.columns_directory, get_data_item_class(di_type).__name__), self.chunk_rows, decoded)
+            self.exports[di_type] = export
+        return export
+
+    def has_fields(self, di_type):
+        if get_numeric_fields(di_type):
+            return True
+        self.skipped_types.add(di_type)
+        return False
+
+    def add_datagram(self, timestamp, datagram):
+        """Adds the data items of a CDP datagram received at timestamp, in time.time() seconds."""
+        self.datagrams += 1
+        try:
+            serial, sequence = parse_cdp_header(datagram)
+        except ValueError:
+            self.errors += 1
+            return
+        if self.serials is not None and serial not in self.serials:
+            return
+        exports = self.exports
+        for di_type, start, end in parse_data_items(datagram)[0]:
+            if self.types is not None and di_type not in self.types:
+                continue
+            export = exports.get(di_type)
+            if export is None:
+                if di_type in self.skipped_types or not self.has_fields(di_type):
+                    continue
+                export = self.get_export(di_type)
+            export.add_payload(timestamp, serial, sequence, datagram[start:end])
+
+    def add_history(self, nodes):
+        """Adds the data items nodes, a dict of Node indexed by serial number, hold, by node then type."""
+        # Node times are time.monotonic() since UwbNetwork.time_initial
+        offset = UwbNetwork.time_initial + time.time() - time.monotonic()
+        for serial in sorted(list(nodes)):
+            if self.serials is not None and serial not in self.serials:
+                continue
+            for di_type, stream in sorted(list(nodes[serial].streams.items())):
+                if (self.types is not None and di_type not in self.types) or not self.has_fields(di_type):
+                    continue
+                export = self.get_export(di_type, decoded=True)
+                # Paired consistently while the receiving thread appends to them
+                data_items, times = stream.get_history()
+                for data_item, relative_time in zip(data_items, times):
+                    export.add_data_item(relative_time + offset, data_item)
+
+    def close(self):
+        """Writes what is left and returns the number of rows exported indexed by data item type name."""
+        for export in self.exports.values():
+            export.close()
+        if self.npz:
+            for export in self.exports.values():
+                compression = zipfile.ZIP_DEFLATED if self.compress else zipfile.ZIP_STORED
+                with zipfile.ZipFile(os.path.join(self.directory, export.name + '.npz'), 'w', compression, allowZip64=True) as archive:
+                    for writer in export.writers:
+                        archive.write(writer.path, os.path.basename(writer.path))
+            shutil.rmtree(self.columns_directory)
+        return {export.name: export.rows for export in self.exports.values()}
+
+
+def export_history(nodes, directory, npz=True):
+    """Exports the data items held by nodes, see ColumnarExporter.add_history. Returns the rows exported per type."""
+    exporter = ColumnarExporter(directory, npz)
+    exporter.add_history(nodes)
+    return exporter.close()
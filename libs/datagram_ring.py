@@ -0,0 +1,141 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import mmap
+import threading
+from collections import deque
+
+# Local libraries
+from ingest_stats import IngestStats
+from settings import *
+
+
+class DatagramRing:
+    """
+    Bounded ring of preallocated datagram buffers between the thread receiving a
+    listening address and the decoders. Datagrams are received directly into a
+    free slot, queued by slot index and the slot is released once decoded.
+    """
+
+    DROP_OLDEST = 'drop-oldest'  # Overwrite the oldest datagram still waiting to be decoded
+    DROP_NEWEST = 'drop-newest'  # Discard the datagram that was just received
+    BLOCK = 'block'              # Stop receiving until a decoder frees a slot
+    overflow_policies = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+    def __init__(self, capacity=RECEIVE_BUFFER_COUNT, slot_size=MAX_CDP_PACKET_SIZE, overflow_policy=DROP_OLDEST, arena=None, key=None):
+        if overflow_policy not in self.overflow_policies:
+            raise ValueError("Unknown overflow policy: {}".format(overflow_policy))
+        self.key = key  # Listening address the ring receives datagrams from
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.overflow_policy = overflow_policy
+
+        if arena is None:
+            # Anonymous memory is only committed by the OS once it is written to,
+            # so slots that only ever hold small CDP packets stay cheap.
+            arena = mmap.mmap(-1, capacity * slot_size)
+        self.arena = arena
+        arena_view = memoryview(arena)
+        self.slots = [arena_view[idx*slot_size:(idx+1)*slot_size] for idx in range(capacity)]
+        self.lengths = [0] * capacity
+        self.timestamps = [0.0] * capacity  # time.monotonic() at which every slot's datagram was received
+
+        self.free_slots = deque(range(capacity))
+        self.ready = deque()  # Indexes of the slots waiting to be decoded, oldest first
+        self.lock = threading.Lock()
+        self.slot_freed = threading.Condition(self.lock)
+        self.datagram_ready = threading.Condition(self.lock)
+
+        self.high_water = 0  # Highest number of slots in use at once
+        self.drops = 0       # Datagrams lost because the ring was full
+        self.received = 0    # Datagrams committed to the ring
+        self.duplicates = 0  # Datagrams discarded because the same packet was already received
+        self.stats = IngestStats()  # Rates and timings of the listening address the ring belongs to
+
+    @property
+    def occupancy(self):
+        """Number of slots holding a datagram that is queued or being decoded"""
+        return self.capacity - len(self.free_slots)
+
+    def reserve(self):
+        """Returns the index of a free slot to receive the next datagram into, or None if the ring is full."""
+        with self.lock:
+            if not self.free_slots:
+                return None
+            idx = self.free_slots.popleft()
+            occupancy = self.capacity - len(self.free_slots)
+            if occupancy > self.high_water:
+                self.high_water = occupancy
+            return idx
+
+    def evict_oldest(self):
+        """Drops the oldest queued datagram and returns its slot, or None if nothing is queued."""
+        with self.lock:
+            if not self.ready:
+                return None
+            self.drops += 1
+            return self.ready.popleft()
+
+    def wait_for_slot(self, timeout):
+        """Blocks until a slot is free. Returns False if the timeout expired first."""
+        with self.lock:
+            return self.slot_freed.wait_for(lambda: self.free_slots, timeout)
+
+    def commit(self, batch):
+        """Queues a batch of (slot, nbytes) that were received into reserved slots."""
+        with self.lock:
+            for idx, nbytes in batch:
+                self.lengths[idx] = nbytes
+                self.ready.append(idx)
+            self.received += len(batch)
+            if batch:
+                self.datagram_ready.notify()
+
+    def hand_off(self, batch):
+        """Accounts for a batch of received slots that are decoded outside of the ring."""
+        with self.lock:
+            self.received += len(batch)
+
+    def release_duplicates(self, indexes):
+        """Returns the slots of datagrams that were discarded as duplicates."""
+        with self.lock:
+            self.free_slots.extend(indexes)
+            self.duplicates += len(indexes)
+            self.slot_freed.notify()
+
+    def drop(self):
+        """Accounts for a datagram that was discarded because the ring was full."""
+        with self.lock:
+            self.drops += 1
+
+    def pop_batch(self, max_count, timeout):
+        """
+        Blocks until datagrams are queued and returns the slot indexes of up to max_count of them,
+        oldest first. Returns an empty list if the timeout expired first.
+        """
+        with self.lock:
+            if not self.datagram_ready.wait_for(lambda: self.ready, timeout):
+                return []
+            count = min(max_count, len(self.ready))
+            return [self.ready.popleft() for _ in range(count)]
+
+    def datagram(self, idx):
+        return self.slots[idx][:self.lengths[idx]]
+
+    def release(self, idx):
+        """Returns a slot to the ring once its datagram has been decoded (or abandoned)."""
+        with self.lock:
+            self.free_slots.append(idx)
+            self.slot_freed.notify()
+
+    def release_batch(self, indexes):
+        """Returns several slots to the ring at once."""
+        with self.lock:
+            self.free_slots.extend(indexes)
+            if indexes:
+                self.slot_freed.notify()
+
+    def counters(self):
+        return dict(occupancy=self.occupancy, capacity=self.capacity, high_water=self.high_water,
+                    drops=self.drops, received=self.received, duplicates=self.duplicates)
@@ -0,0 +1,181 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import multiprocessing
+import queue
+import struct
+import time
+
+# Local libraries
+from datagram_ring import DatagramRing
+from packet_parsing import parse_cdp_header, parse_data_items, select_data_items
+from settings import *
+
+
+class SharedDatagramRing(DatagramRing):
+    """
+    Datagram ring backed by shared memory so decoding processes can read the datagrams in place.
+    Slots are handed to the processes as soon as they are received, so the oldest datagram
+    can no longer be evicted: a full ring drops the newest one or blocks, never the oldest.
+    """
+
+    def __init__(self, key, capacity=RECEIVE_BUFFER_COUNT, slot_size=MAX_CDP_PACKET_SIZE, overflow_policy=DatagramRing.DROP_NEWEST):
+        if overflow_policy == DatagramRing.DROP_OLDEST:
+            raise ValueError("Overflow policy {} is not available with decoding processes".format(overflow_policy))
+        # Python 3.8+, imported here so the monitor still runs on 3.7 with a single process
+        from multiprocessing import shared_memory
+        self.shm = shared_memory.SharedMemory(create=True, size=capacity * slot_size)
+        self.name = self.shm.name
+        super().__init__(capacity, slot_size, overflow_policy, self.shm.buf, key)
+
+    def close(self):
+        for slot in self.slots:
+            slot.release()
+        self.slots = []
+        try:
+            self.shm.close()
+        except BufferError:
+            # A receive thread still holds a view of a slot, the mapping goes away with it
+            pass
+        self.shm.unlink()
+
+
+def decode_worker(task_queue, result_queue, known_types, item_formats):
+    """
+    Decoding process main loop. Tasks are (ring_name, slot_size, datagrams, timestamps, device_filter, type_filter)
+    where datagrams is a list of (slot, nbytes), timestamps the reception times of the datagrams and the
+    filters are sets, or None when not filtering. item_formats holds the struct format of the types
+    whose attributes are decoded here, indexed by type.
+    Results are (ring_name, slots, records, errors, decode_times) where each record is
+    (serial_number, sequence, [(type, size, values), ...], timestamp), values being the tuple of the
+    decoded attributes, or the bytes of the data item for the other types, and decode_times holds
+    the seconds spent on every datagram.
+    """
+    from multiprocessing import shared_memory  # Python 3.8+, see SharedDatagramRing
+    item_structs = {di_type: struct.Struct(item_format) for di_type, item_format in item_formats.items()}
+    attached = {}
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        ring_name, slot_size, datagrams, timestamps, device_filter, type_filter = task
+
+        if ring_name not in attached:
+            attached[ring_name] = shared_memory.SharedMemory(name=ring_name)
+        buf = attached[ring_name].buf
+
+        slots = []
+        records = []
+        errors = []
+        decode_times = []
+        for (idx, nbytes), timestamp in zip(datagrams, timestamps):
+            decode_start = time.perf_counter()
+            slots.append(idx)
+            start = idx * slot_size
+            data = bytes(buf[start:start+nbytes])
+            try:
+                serial_number, sequence = parse_cdp_header(data)
+            except ValueError as e:
+                errors.append(str(e))
+                decode_times.append(time.perf_counter() - decode_start)
+                continue
+            if device_filter is not None and not serial_number in device_filter:
+                decode_times.append(time.perf_counter() - decode_start)
+                continue
+            items, leftover = parse_data_items(data)
+            if leftover:
+                errors.append('Incomplete CDP Packet')
+            if type_filter is not None:
+                items = select_data_items(items, type_filter, known_types)
+            decoded = []
+            for di_type, item_start, item_end in items:
+                item_struct = item_structs.get(di_type)
+                if item_struct is not None and item_end - item_start >= item_struct.size:
+                    decoded.append((di_type, item_end - item_start, item_struct.unpack_from(data, item_start)))
+                else:
+                    # Short data items decode to default values, cdp takes care of them
+                    decoded.append((di_type, item_end - item_start, data[item_start:item_end]))
+            # Packets left without any data item are still recorded so their node gets created
+            records.append((serial_number, sequence, decoded, timestamp))
+            decode_times.append(time.perf_counter() - decode_start)
+
+        result_queue.put((ring_name, slots, records, errors, decode_times))
+
+    for shm in attached.values():
+        shm.close()
+
+
+class DecodePool:
+    """Pool of processes that decode raw CDP datagrams into compact data item records."""
+
+    def __init__(self, num_processes, known_types=frozenset(), item_formats=None):
+        """
+        known_types are the data item types cdp decodes, the others match the Unknown type filter.
+        The attributes of the types of item_formats, see lazy_data_item.get_item_formats, are decoded
+        by the processes, the other data items are handed over as bytes.
+        """
+        # Spawned processes do not inherit the state of the Qt threads running in this process
+        context = multiprocessing.get_context('spawn')
+        self.task_queue = context.Queue()
+        self.result_queue = context.Queue()
+        self.rings = dict()
+        self.processes = []
+        for n in range(num_processes):
+            process = context.Process(target=decode_worker, args=(self.task_queue, self.result_queue, known_types, item_formats or dict()),
+                                      name='CdpDecodeWorker{}'.format(n), daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def create_ring(self, key, capacity, overflow_policy):
+        """Returns the shared datagram ring for a listening address, reusing it when listening again."""
+        for ring in self.rings.values():
+            if ring.key == key:
+                return ring
+        ring = SharedDatagramRing(key, capacity, overflow_policy=overflow_policy)
+        self.rings[ring.name] = ring
+        return ring
+
+    def submit(self, ring, batch, device_filter=None, type_filter=None):
+        """
+        Hands a batch of (slot, nbytes) received into a shared ring to the decoding processes.
+        Packets from devices outside device_filter and data items outside type_filter are skipped.
+        """
+        if batch:
+            ring.hand_off(batch)
+            timestamps = [ring.timestamps[idx] for idx, nbytes in batch]
+            self.task_queue.put((ring.name, ring.slot_size, batch, timestamps, device_filter, type_filter))
+
+    def get_results(self, timeout):
+        """
+        Returns the next (ring, records) of decoded records, or None when nothing arrived before the timeout.
+        The shared memory slots the records were decoded from are released back to their ring and
+        the decode errors and times are recorded in its stats. The ring is None once it was closed.
+        """
+        try:
+            ring_name, slots, records, errors, decode_times = self.result_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        ring = self.rings.get(ring_name)
+        if ring is not None:
+            ring.release_batch(slots)
+            for decode_time in decode_times:
+                ring.stats.record_decode(decode_time)
+        for error in errors:
+            if ring is not None:
+                ring.stats.record_error(error)
+            if 'Packet Size Error' not in error:
+                print(error)
+        return ring, records
+
+    def stop(self):
+        for process in self.processes:
+            self.task_queue.put(None)
+        for process in self.processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = dict()
@@ -1,5 +1,14 @@
 from cdp.cdp import *
 
+DEVICE_DATA_HEADER = struct.Struct("<BIBH")  # typing, device id, sequence number, type and length
+
+
+def get_device_data_header(device_data):
+    """Returns (device_id, ddi_type, ddi_length) of the device_data bytes of a DeviceData data item."""
+    typing, device_id, sequence_num, tlv_header = DEVICE_DATA_HEADER.unpack_from(device_data)
+    # Type in the upper 10 bits, length in the lower 6
+    return device_id, tlv_header >> 6, tlv_header & 0x3F
+
 #Collection of the data items that can come in a Device Data UWB Packet
 
 class DeviceDataItem():
@@ -0,0 +1,88 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+from pyqtgraph import QtCore, QtWidgets
+
+# Local libraries
+from ingest_stats import get_rates, DECODE_ERROR_KINDS, OTHER_DECODE_ERROR
+from network_objects import UwbNetwork
+from settings import *
+from socket_processing import SocketProcessing
+
+
+class DiagnosticsWindow(QtWidgets.QMainWindow):
+    """Rates, queue depth, timings and decode errors of every listening address."""
+
+    columns = ['Address', 'Datagrams/s', 'KB/s', 'Queue', 'Drops', 'Kernel Drops', 'Duplicates'] + \
+              ['Decode p{} (us)'.format(percent) for percent in INGEST_PERCENTILES] + \
+              ['Update p{} (us)'.format(percent) for percent in INGEST_PERCENTILES] + \
+              ['Queue wait p{} (us)'.format(percent) for percent in INGEST_PERCENTILES] + \
+              list(DECODE_ERROR_KINDS) + [OTHER_DECODE_ERROR]
+
+    def __init__(self, network_discovery_window):
+        super().__init__()
+        self.setWindowTitle('CUWB Monitor - Ingest Diagnostics')
+        self.network_discovery_window = network_discovery_window
+        self.central = QtWidgets.QWidget()
+        self.grid_layout = QtWidgets.QGridLayout()
+        self.central.setLayout(self.grid_layout)
+        self.setCentralWidget(self.central)
+
+        for col, title in enumerate(self.columns):
+            label = QtWidgets.QLabel(title)
+            label.setStyleSheet(GetTitleColor())
+            label.setAlignment(QtCore.Qt.AlignCenter)
+            label.setMargin(5)
+            self.grid_layout.addWidget(label, 0, col)
+
+        # Labels and previous diagnostics indexed by listening address
+        self.row_labels = dict()
+        self.previous_diagnostics = dict()
+        self.timer = self.startTimer(1000)
+
+    def timerEvent(self, e):
+        if not UwbNetwork.running:
+            self.killTimer(self.timer)
+            self.close()
+            return
+        if not self.isVisible():
+            return
+
+        diagnostics = self.network_discovery_window.get_diagnostics()
+        for address in list(self.row_labels):
+            if address not in diagnostics:
+                for label in self.row_labels.pop(address):
+                    self.grid_layout.removeWidget(label)
+                    label.deleteLater()
+                self.previous_diagnostics.pop(address, None)
+
+        for row, address in enumerate(sorted(diagnostics), 1):
+            if address not in self.row_labels:
+                self.row_labels[address] = [QtWidgets.QLabel() for title in self.columns]
+            for col, label in enumerate(self.row_labels[address]):
+                self.grid_layout.addWidget(label, row, col)
+            current = diagnostics[address]
+            previous = self.previous_diagnostics.get(address, current)
+            self.previous_diagnostics[address] = current
+            for label, text in zip(self.row_labels[address], self.get_row(address, previous, current)):
+                label.setText(text)
+
+        # Size and CPU cost of the recording next to the cost of the ingest
+        if SocketProcessing.recorder is not None:
+            self.statusBar().showMessage(SocketProcessing.recorder.get_summary())
+
+    def get_row(self, address, previous, current):
+        datagram_rate, byte_rate = get_rates(previous, current)
+        row = [address,
+               '{:.0f}'.format(datagram_rate),
+               '{:.1f}'.format(byte_rate / 1000),
+               '{occupancy}/{capacity} (max {high_water})'.format(**current),
+               str(current['drops']),
+               '-' if current['kernel_drops'] is None else str(current['kernel_drops']),
+               str(current['duplicates'])]
+        row += ['-' if value is None else str(value) for value in current['decode_us'].values()]
+        row += ['-' if value is None else str(value) for value in current['update_us'].values()]
+        row += ['-' if value is None else str(value) for value in current['queue_wait_us'].values()]
+        row += [str(count) for count in current['decode_errors'].values()]
+        return row
@@ -0,0 +1,68 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import threading
+import time
+
+# Local libraries
+from packet_parsing import peek_packet_id
+from settings import *
+
+
+class DuplicateFilter:
+    """
+    Drops CDP packets received more than once, as happens when the same stream is received
+    on several local interfaces. Packets are identified by (serial number, sequence) and
+    remembered for one to two windows: the ids seen during the current window are checked
+    along with the ids of the previous window, which is forgotten when the current one ends.
+    Shared by every receiving thread so duplicates are caught across listening addresses.
+    """
+
+    def __init__(self, window=DUPLICATE_WINDOW):
+        self.window = window  # In seconds, 0 disables the filter
+        self.lock = threading.Lock()
+        self.current_ids = set()
+        self.previous_ids = set()
+        self.window_start = time.monotonic()
+
+    def remove_duplicates(self, ring, batch):
+        """
+        Returns the (slot, nbytes) of the batch that were not seen before. The slots
+        of the duplicates are released to the ring and counted as duplicates.
+        """
+        if not self.window or not batch:
+            return batch
+
+        unique = []
+        duplicates = []
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start > self.window:
+                # Ids of a window that ended more than a window ago are forgotten as well
+                self.previous_ids = self.current_ids if now - self.window_start < 2 * self.window else set()
+                self.current_ids = set()
+                self.window_start = now
+
+            for idx, nbytes in batch:
+                packet_id = peek_packet_id(ring.slots[idx][:nbytes])
+                if packet_id is None:
+                    # Not a CDP packet, let the decoder report it
+                    unique.append((idx, nbytes))
+                elif packet_id in self.current_ids or packet_id in self.previous_ids:
+                    duplicates.append(idx)
+                else:
+                    self.current_ids.add(packet_id)
+                    unique.append((idx, nbytes))
+
+        if duplicates:
+            ring.release_duplicates(duplicates)
+        return unique
+
+    def get_sequence_stream(self, stream):
+        """
+        Returns the key under which the CDP sequences of the packets kept from the listening address
+        stream continue. Once duplicates are dropped across listening addresses, the copies received
+        on one address are missing from the others, so every address shares the same key, None.
+        """
+        return None if self.window else stream
@@ -33,12 +33,9 @@ class PlotStatMonitorSubWindow(pg.GraphicsLayoutWidget):
         self.graph.showGrid(x=True, y=True)
         self.plot= self.graph.plot(pen='b', name=self.data_label)
 
-        self.last_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type_name.type]
-        self.data = deque([], TRAIL_LENGTH)
-        self.time = deque([], TRAIL_LENGTH)
-        _current_size = len(UwbNetwork.nodes[self.serial].cdp_pkts[self.type_name.type])
-
-        self.updateTime(_current_size)
+        # Values are plotted straight from the numpy columns of the node once they exist
+        self.last_count = None
+        self.plottable = True
 
     def timerEvent(self, e):
         if not self.running:
@@ -46,29 +43,40 @@ class PlotStatMonitorSubWindow(pg.GraphicsLayoutWidget):
             self.close()
             return
 
-        _current_size = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type_name.type] - self.last_count
-        self.last_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type_name.type]
-        if _current_size == 0: return
+        if not self.plottable: return
 
-        self.updateTime(_current_size)
+        _node = UwbNetwork.nodes[self.serial]
+        _count = _node.cdp_pkts_count.get(self.type_name.type, 0)
+        if _count == 0 or _count == self.last_count: return
+        self.last_count = _count
 
-        _data = np.array(self.data)
-        _times = np.array(self.time)
+        _columns = _node.get_column_store(self.type_name.type)
+        if _columns is not None and self.feature in _columns.columns:
+            _times, _data = _columns.get_columns('time', self.feature)
+        else:
+            # Until the columns are built, and for fields that have no column
+            _times, _data = self.getHistory(_node)
+            if _data is None: return
 
         self.plot.setData(_times, _data)
 
+    def getHistory(self, node):
+        _data_items = list(node.cdp_pkts[self.type_name.type])
+        _times = list(node.cdp_pkts_time[self.type_name.type])
+        _count = min(len(_data_items), len(_times))
+        try:
+            _data = np.array([getattr(_data_item, self.feature) for _data_item in _data_items[len(_data_items) - _count:]], dtype=float)
+        except (TypeError, ValueError):
+            self.plottable = False
+            self.graph.setTitle('{} is not a numeric value and cannot be plotted'.format(self.data_label))
+            return None, None
+        return np.array(_times[len(_times) - _count:]), _data
+
     def closeEvent(self, e):
         self.killTimer(self.timer)
         self.running = False
         self.close()
 
-    def updateTime(self, _current_size):
-
-        if _current_size > TRAIL_LENGTH: _current_size = TRAIL_LENGTH
-        for idx in range(_current_size):
-            self.data.append(getattr(UwbNetwork.nodes[self.serial].cdp_pkts[self.type_name.type][idx - _current_size], self.feature))
-            self.time.append(UwbNetwork.nodes[self.serial].cdp_pkts_time[self.type_name.type][idx - _current_size])
-
 
 def makeClickable(serial, label_to_change, data_label, feature, grid_row, type_name, sub_windows, col):
     label_to_change.setStyleSheet(GetClickableColor())
@@ -0,0 +1,123 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import json
+import math
+import sys
+import time
+from datetime import datetime, timezone
+
+# Local libraries
+import cdp
+from capture_replay import CaptureReplay
+from cdp_reactor import CdpReactor
+from decode_pool import DecodePool
+from ingest_stats import get_rates
+from network_objects import *
+from settings import *
+from socket_processing import SocketProcessing, CdpProcess, CdpCollector, DATA_ITEM_FORMATS, KNOWN_DATA_ITEM_TYPES
+
+
+class HeadlessMonitor:
+    """
+    Receives and decodes one CDP stream without Qt and periodically writes the counts and
+    frequencies of every node and data item type, one JSON object per line. With replay_paths,
+    capture files are replayed at replay_speed (None as fast as possible) instead, from replay_start
+    to replay_end when given, and the monitor stops once they are over.
+    """
+
+    def __init__(self, ip, port, interface, num_processes=1, engine=THREAD_ENGINE,
+                 report_interval=HEADLESS_REPORT_INTERVAL, output=sys.stdout, replay_paths=None, replay_speed=1.0,
+                 replay_start=None, replay_end=None):
+        self.report_interval = report_interval
+        self.output = output
+        self.threads = []
+        self.decode_pool = None
+        if num_processes > 1:
+            self.decode_pool = DecodePool(num_processes, KNOWN_DATA_ITEM_TYPES, DATA_ITEM_FORMATS)
+            self.threads.append(CdpCollector(self.decode_pool))
+
+        self.replay = None
+        self.previous_diagnostics = dict()
+        if replay_paths:
+            self.replay = CaptureReplay(replay_paths, replay_speed, self.decode_pool, replay_start, replay_end)
+            self.threads.append(self.replay)
+            return
+
+        self.stream = SocketProcessing(ip, port, interface, self.decode_pool)
+        self.address = '{}:{} on {}'.format(ip, port, interface)
+        if engine == REACTOR_ENGINE:
+            reactor = CdpReactor(self.decode_pool)
+            reactor.add_stream(self.stream)
+            self.threads.append(reactor)
+        else:
+            if self.decode_pool is None:
+                self.threads.append(CdpProcess(self.stream.ring))
+            self.threads.append(self.stream)
+        self.previous_diagnostics = self.get_stream_diagnostics()
+
+    def run(self):
+        """Runs until UwbNetwork.running is cleared, e.g. by a signal handler, or the replay is over."""
+        for thread in self.threads:
+            thread.start()
+
+        next_report = time.monotonic() + self.report_interval
+        while UwbNetwork.running and not (self.replay is not None and self.replay.finished):
+            time.sleep(QPLOT_FREQUENCY * MS_TO_SECONDS)
+            UwbNetwork.memory_budget.update(UwbNetwork.nodes)
+            if time.monotonic() >= next_report:
+                next_report += self.report_interval
+                self.write_report()
+
+        self.stop()
+
+    def get_stream_diagnostics(self):
+        """Diagnostics of every listening address, received or replayed, indexed by address."""
+        if self.replay is not None:
+            return self.replay.get_diagnostics()
+        return {self.address: self.stream.get_diagnostics()}
+
+    def get_report(self):
+        streams = self.get_stream_diagnostics()
+        for address, diagnostics in streams.items():
+            previous = self.previous_diagnostics.get(address)
+            if previous is None:
+                diagnostics['datagrams_per_second'], diagnostics['bytes_per_second'] = 0.0, 0.0
+            else:
+                diagnostics['datagrams_per_second'], diagnostics['bytes_per_second'] = get_rates(previous, diagnostics)
+        self.previous_diagnostics = streams
+        report = dict(time=datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                      uptime=round(time.monotonic() - UwbNetwork.time_initial, 3),
+                      streams=streams,
+                      memory=UwbNetwork.memory_budget.get_status(),
+                      nodes=dict())
+        if self.replay is not None:
+            report['replay'] = self.replay.get_status()
+        if SocketProcessing.recorder is not None:
+            report['recording'] = SocketProcessing.recorder.get_status()
+        for serial in sorted(list(UwbNetwork.nodes)):
+            node = UwbNetwork.nodes[serial]
+            types = dict()
+            for di_type, stream in sorted(list(node.streams.items())):
+                types[stream.name] = dict(count=stream.count, frequency=round(stream.freq, 3))
+            loss = node.get_loss_percentage()
+            report['nodes'][str(cdp.CiholasSerialNumber(serial))] = dict(total=node.cdp_total, types=types,
+                                                                         loss=None if math.isnan(loss) else round(loss, 3),
+                                                                         sequence=node.get_sequence_counters(),
+                                                                         memory=UwbNetwork.memory_budget.node_footprints.get(serial, 0))
+        return report
+
+    def write_report(self):
+        self.output.write(json.dumps(self.get_report()) + '\n')
+        self.output.flush()
+
+    def stop(self):
+        UwbNetwork.running = False
+        for thread in self.threads:
+            thread.wait()
+        for thread in self.threads:
+            thread.join(1.0)
+        if self.decode_pool is not None:
+            self.decode_pool.stop()
+        self.write_report()
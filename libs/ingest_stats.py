@@ -0,0 +1,90 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import time
+from collections import deque
+
+# Local libraries
+from settings import *
+
+# Kinds of decode errors, matched against the ValueError messages of cdp and packet_parsing
+DECODE_ERROR_KINDS = ('Incomplete CDP Packet', 'Unrecognized String', 'Packet Size Error', 'Unrecognized Mark')
+OTHER_DECODE_ERROR = 'Other'
+
+
+def get_error_kind(message):
+    for kind in DECODE_ERROR_KINDS:
+        if kind in message:
+            return kind
+    return OTHER_DECODE_ERROR
+
+
+def get_percentiles(samples, percents=INGEST_PERCENTILES):
+    """Returns the percentiles of samples in seconds, nearest rank, as a dict indexed by percent."""
+    if not samples:
+        return {percent: None for percent in percents}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {percent: ordered[round(last * percent / 100)] for percent in percents}
+
+
+class IngestStats:
+    """
+    Instrumentation of one listening address from the socket to Node.update. Every counter
+    has a single writer thread: the receiving thread for the reception counters and the
+    decoding (or result collecting) thread for the rest, so no lock is needed.
+    Timings keep the most recent INGEST_TIMING_SAMPLES datagrams to compute percentiles.
+    """
+
+    def __init__(self):
+        self.datagrams = 0   # Datagrams read from the socket, duplicates included
+        self.bytes = 0       # Bytes of these datagrams
+        self.decoded = 0     # Datagrams that went through the decoder, errors included
+        self.decode_errors = {kind: 0 for kind in DECODE_ERROR_KINDS + (OTHER_DECODE_ERROR,)}
+        self.decode_times = deque([], INGEST_TIMING_SAMPLES)  # Seconds to parse one datagram and build its items
+        self.update_times = deque([], INGEST_TIMING_SAMPLES)  # Seconds spent in Node.update for one datagram
+        self.queue_waits = deque([], INGEST_TIMING_SAMPLES)   # Seconds from reception to Node.update for one datagram
+
+    def record_received(self, batch):
+        self.datagrams += len(batch)
+        self.bytes += sum(nbytes for idx, nbytes in batch)
+
+    def record_decode(self, decode_time):
+        self.decoded += 1
+        self.decode_times.append(decode_time)
+
+    def record_update(self, update_time):
+        self.update_times.append(update_time)
+
+    def record_queue_wait(self, queue_wait):
+        self.queue_waits.append(queue_wait)
+
+    def record_error(self, message):
+        self.decode_errors[get_error_kind(message)] += 1
+
+    def snapshot(self):
+        """Returns the cumulative counters and the timing percentiles, in microseconds."""
+        decode_percentiles = get_percentiles(list(self.decode_times))
+        update_percentiles = get_percentiles(list(self.update_times))
+        queue_wait_percentiles = get_percentiles(list(self.queue_waits))
+        return dict(time=time.monotonic(),
+                    datagrams=self.datagrams,
+                    bytes=self.bytes,
+                    decoded=self.decoded,
+                    decode_errors=dict(self.decode_errors),
+                    decode_us={percent: to_microseconds(value) for percent, value in decode_percentiles.items()},
+                    update_us={percent: to_microseconds(value) for percent, value in update_percentiles.items()},
+                    queue_wait_us={percent: to_microseconds(value) for percent, value in queue_wait_percentiles.items()})
+
+
+def to_microseconds(seconds):
+    return None if seconds is None else round(seconds * 1e6, 1)
+
+
+def get_rates(previous, current):
+    """Returns (datagrams/s, bytes/s) between two snapshots."""
+    elapsed = current['time'] - previous['time']
+    if elapsed <= 0:
+        return 0.0, 0.0
+    return (current['datagrams'] - previous['datagrams']) / elapsed, (current['bytes'] - previous['bytes']) / elapsed
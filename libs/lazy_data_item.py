@@ -0,0 +1,134 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Local libraries
+import cdp
+
+# Attribute decoders that amount to a struct.unpack of the attribute's format
+PLAIN_DECODERS = (cdp.DataItemAttribute._decode, cdp.DISerialNumberAttr._decode, cdp.DIFixedLengthBytesAttr._decode)
+
+# (class, attribute names, serial number attribute names) of the types built by make_decoded_item
+decoded_layouts = dict()
+
+
+def get_data_item_class(di_type):
+    try:
+        return cdp.CDP.data_item_classes[di_type]
+    except KeyError:
+        # Same dynamic registration of unrecognized types that cdp.CDP does while decoding
+        di_class = type('Unknown0x{:04X}'.format(di_type), (cdp.CDPDataItem,), dict(type=di_type))
+        cdp.CDP.register_data_item(di_class)
+        return di_class
+
+
+def get_item_bytes(data_item):
+    """Returns the bytes a cdp or lazy data item was built from, None once it was decoded."""
+    if isinstance(data_item, LazyDataItem):
+        # Read before the data item, decoding drops the packet once the data item is set
+        packet = data_item._packet
+        if packet is None:
+            return None
+        return packet[data_item._start:data_item._end]
+    attributes = data_item.__dict__
+    di_data = attributes.get('di_data')
+    # Decoding consumes di_data attribute by attribute, only complete bytes are the data item's
+    if di_data is None or len(di_data) != attributes.get('di_size'):
+        return None
+    return di_data
+
+
+def get_item_format(di_type):
+    """
+    Returns the struct format decoding every attribute of a data item type at once, to the values cdp
+    decodes one attribute at a time, or None when an attribute is a list, has a variable size or is
+    decoded otherwise. Serial numbers decode to integers.
+    """
+    data_item_class = cdp.CDP.data_item_classes.get(di_type)
+    if data_item_class is None or '_decode' in vars(data_item_class):
+        return None
+    item_format = '<'
+    for attribute in data_item_class.definition:
+        if attribute.is_list or attribute.size < 0 or type(attribute)._decode not in PLAIN_DECODERS:
+            return None
+        item_format += '{}s'.format(attribute.size) if attribute.format == 's' else attribute.format
+    return item_format
+
+
+def get_item_formats():
+    """Returns the formats of get_item_format of every type that has one, indexed by type."""
+    formats = dict()
+    for di_type in list(cdp.CDP.data_item_classes):
+        item_format = get_item_format(di_type)
+        if item_format is not None:
+            formats[di_type] = item_format
+    return formats
+
+
+def make_decoded_item(di_type, size, values, cdp_header_sequence, cdp_header_serial):
+    """
+    Returns the cdp data item of the attribute values decoded with get_item_format, already decoded
+    as if cdp had decoded it from its size bytes.
+    """
+    layout = decoded_layouts.get(di_type)
+    if layout is None:
+        data_item_class = get_data_item_class(di_type)
+        layout = (data_item_class,
+                  [attribute.name for attribute in data_item_class.definition],
+                  [attribute.name for attribute in data_item_class.definition if isinstance(attribute, cdp.DISerialNumberAttr)])
+        decoded_layouts[di_type] = layout
+    data_item_class, names, serial_names = layout
+    # Skips CDPDataItem.__init__, the attributes are set the way its decoding leaves them
+    data_item = data_item_class.__new__(data_item_class)
+    attributes = data_item.__dict__
+    attributes.update(zip(names, values))
+    for name in serial_names:
+        attributes[name] = cdp.CiholasSerialNumber(attributes[name])
+    attributes['cdp_header_sequence'] = cdp_header_sequence
+    attributes['cdp_header_serial'] = cdp_header_serial
+    attributes['di_size'] = size
+    attributes['di_data'] = None
+    attributes['di_name'] = data_item_class.__name__
+    return data_item
+
+
+class LazyDataItem:
+    """
+    Stand in for a cdp data item that only keeps the location of the item in the CDP packet it arrived in.
+    The cdp data item is built on first access to any of its attributes, so items that no plot
+    ever looks at are never decoded. The packet bytes are shared by all the items of a packet.
+    """
+    __slots__ = ('type', 'cdp_header_sequence', 'cdp_header_serial', '_packet', '_start', '_end', '_data_item')
+
+    def __init__(self, di_type, packet, start, end, cdp_header_sequence, cdp_header_serial):
+        self.type = di_type
+        self.cdp_header_sequence = cdp_header_sequence
+        self.cdp_header_serial = cdp_header_serial
+        self._packet = packet
+        self._start = start
+        self._end = end
+        self._data_item = None
+
+    @property
+    def di_name(self):
+        return get_data_item_class(self.type).__name__
+
+    @property
+    def di_size(self):
+        return self._end - self._start
+
+    def decode(self):
+        """Returns the cdp data item, building it the first time."""
+        if self._data_item is None:
+            data_item = get_data_item_class(self.type)(self._packet[self._start:self._end])
+            data_item.cdp_header_sequence = self.cdp_header_sequence
+            data_item.cdp_header_serial = self.cdp_header_serial
+            self._data_item = data_item
+            self._packet = None
+        return self._data_item
+
+    def __getattr__(self, key):
+        # Only called for attributes that are not slots, those belong to the cdp data item
+        return getattr(self.decode(), key)
+
+    def __str__(self):
+        return str(self.decode())
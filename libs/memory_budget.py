@@ -0,0 +1,84 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import time
+from operator import itemgetter
+
+# Local libraries
+from settings import *
+
+
+def format_bytes(size):
+    for unit in ('B', 'kB', 'MB'):
+        if size < 1024:
+            return '{:.1f} {}'.format(size, unit)
+        size /= 1024
+    return '{:.1f} GB'.format(size)
+
+
+class MemoryBudget:
+    """
+    Approximate bytes held by the data items and columns of every node and data item type.
+    Over budget, the history of the types least recently updated or viewed, on any node, is
+    evicted first until the footprint is back under MEMORY_BUDGET_TARGET of the budget.
+    Counters and frequencies are kept, and evicted types fill up again as data items arrive.
+    The bytes per data item of every node are re-estimated along with each measurement.
+    """
+
+    def __init__(self, budget=MEMORY_BUDGET, interval=MEMORY_BUDGET_INTERVAL):
+        self.budget = budget        # in bytes, None never evicts
+        self.interval = interval    # in seconds, between two footprint measurements
+        self.next_update = 0
+        self.footprint = 0          # in bytes, over every node
+        self.node_footprints = dict()  # in bytes, indexed by serial number
+        self.evictions = 0          # Histories evicted since the start
+        self.evicted_bytes = 0
+
+    def update(self, nodes):
+        """
+        Measures the footprint of nodes, a dict of Node indexed by serial number, and evicts
+        histories when over budget. Only does so once per interval, call it as often as needed.
+        Must run in the thread that resets the nodes.
+        """
+        now = time.monotonic()
+        if now < self.next_update:
+            return
+        self.next_update = now + self.interval
+
+        usage = []
+        node_footprints = dict()
+        for serial, node in list(nodes.items()):
+            node.update_item_sizes()
+            node_footprint = 0
+            for stream in list(node.streams.values()):
+                size = stream.get_footprint()
+                if size:
+                    node_footprint += size
+                    usage.append((stream.get_last_used(), size, serial, stream))
+            node_footprints[serial] = node_footprint
+        footprint = sum(node_footprints.values())
+
+        if self.budget is not None and footprint > self.budget:
+            target = self.budget * MEMORY_BUDGET_TARGET
+            usage.sort(key=itemgetter(0))
+            for last_used, size, serial, stream in usage:
+                if footprint <= target:
+                    break
+                stream.evict()
+                footprint -= size
+                node_footprints[serial] -= size
+                self.evictions += 1
+                self.evicted_bytes += size
+
+        self.footprint = footprint
+        self.node_footprints = node_footprints
+
+    def get_status(self):
+        return dict(footprint=self.footprint, budget=self.budget, evictions=self.evictions, evicted_bytes=self.evicted_bytes)
+
+    def get_summary(self):
+        """One line description of the footprint for the windows."""
+        budget = 'no budget' if self.budget is None else 'budget {}'.format(format_bytes(self.budget))
+        return 'Memory: {} ({}) - Evicted: {} histories, {}'.format(format_bytes(self.footprint), budget,
+                                                                     self.evictions, format_bytes(self.evicted_bytes))
@@ -12,10 +12,13 @@ import time
 from network_objects import UwbNetwork
 from network_discovery import CuwbNetworkInformationReceiver, StreamInformation, ListeningAddrInfo
 from settings import *
-from socket_processing import SocketProcessing, CdpProcess
+from socket_processing import SocketProcessing, CdpProcess, CdpCollector, DATA_ITEM_FORMATS, KNOWN_DATA_ITEM_TYPES
+from cdp_reactor import CdpReactor
+from decode_pool import DecodePool
 
 
 class NetworkDiscoveryWindow(QtWidgets.QMainWindow):
+    ingest_engine = THREAD_ENGINE
 
     def __init__(self, num_processes, ip, port, ifc):
         super().__init__()
@@ -42,6 +45,13 @@ class NetworkDiscoveryWindow(QtWidgets.QMainWindow):
         # All SocketProcessing and CdpProcess threads indexed by ListeningAddrInfo objects,
         # the values are lists of threads
         self.rx_threads = dict()
+        # When decoding with more than one process, every listening address shares
+        # the same pool of decoding processes and the thread applying their results
+        self.decode_pool = None
+        self.decode_collector = None
+        # With the reactor engine, the listening addresses it serves
+        self.reactor = None
+        self.reactor_addresses = set()
 
         # Add new connection if command line arguments were provided
         if (ip is not None) or (port is not None) or (ifc is not None):
@@ -65,6 +75,19 @@ class NetworkDiscoveryWindow(QtWidgets.QMainWindow):
             exit()
 
     def display_cuwb_networks(self):
+        engine_widget = QtWidgets.QWidget()
+        engine_layout = QtWidgets.QHBoxLayout()
+        engine_layout.setContentsMargins(0, 0, 0, 0)
+        engine_widget.setLayout(engine_layout)
+        engine_layout.addWidget(QtWidgets.QLabel("Ingest engine:"))
+        self.engine_combo_box = QtWidgets.QComboBox()
+        self.engine_combo_box.addItems(INGEST_ENGINES)
+        self.engine_combo_box.setCurrentText(self.ingest_engine)
+        self.engine_combo_box.currentTextChanged.connect(self.switch_ingest_engine)
+        engine_layout.addWidget(self.engine_combo_box)
+        engine_layout.addStretch()
+        self.central_layout.addWidget(engine_widget)
+
         label = QtWidgets.QLabel("Select a network:")
         label.setSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Minimum)
         self.central_layout.addWidget(label)
@@ -184,16 +207,36 @@ class NetworkDiscoveryWindow(QtWidgets.QMainWindow):
     def display_active_addresses_widget(self):
         self.addr_widget = QtWidgets.QWidget()
         self.addr_widget.setSizePolicy(QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Minimum)
-        addr_layout = QtWidgets.QVBoxLayout()
+        addr_layout = QtWidgets.QGridLayout()
         self.addr_widget.setLayout(addr_layout)
+        # Receive queue counters labels indexed by ListeningAddrInfo objects
+        self.queue_labels = dict()
         if len(self.active_addresses) > 0:
             label = QtWidgets.QLabel('Currently listening on:')
-            addr_layout.addWidget(label)
+            addr_layout.addWidget(label, 0, 0)
+        row = 1
         for stream in sorted(self.active_addresses, key=attrgetter('ip', 'port', 'interface')):
             label = QtWidgets.QLabel('{}:{} - Interface: {}'.format(stream.ip, stream.port, stream.interface))
-            addr_layout.addWidget(label)
+            addr_layout.addWidget(label, row, 0)
+            self.queue_labels[stream] = QtWidgets.QLabel()
+            addr_layout.addWidget(self.queue_labels[stream], row, 1, QtCore.Qt.AlignRight)
+            row += 1
+        self.update_queue_labels()
         self.central_layout.addWidget(self.addr_widget)
 
+    def update_queue_labels(self):
+        for listen_addr, label in self.queue_labels.items():
+            if listen_addr in self.rx_threads:
+                counters = self.rx_threads[listen_addr][0].ring.counters()
+                datagrams = counters['received'] + counters['duplicates']
+                duplicate_rate = 100 * counters['duplicates'] / datagrams if datagrams else 0
+                label.setText('Queue: {occupancy}/{capacity} (max {high_water}) - Drops: {drops}'.format(**counters) +
+                              ' - Duplicates: {} ({:.1f}%)'.format(counters['duplicates'], duplicate_rate))
+
+    def get_diagnostics(self):
+        """Returns the ingest diagnostics of every listening address, indexed by their description."""
+        return {str(listen_addr): thread_list[0].get_diagnostics() for listen_addr, thread_list in list(self.rx_threads.items())}
+
     def stream_click_event(self, idx):
         if idx in self.cdp_streams:
             stream = self.cdp_streams[idx]
@@ -241,19 +284,75 @@ class NetworkDiscoveryWindow(QtWidgets.QMainWindow):
         """
         for listen_addr in stream.equivalent_addresses:
             if listen_addr not in self.rx_threads:
-                thread_list = []
-                thread_list.append(SocketProcessing(listen_addr.ip, listen_addr.port, listen_addr.interface))
-                for n in range(self.num_processes):
-                    cdp_process = CdpProcess()
-                    cdp_process.start()
-                    thread_list.append(cdp_process)
-                thread_list[0].start()
-                self.set_address_to_active(listen_addr)
-                self.rx_threads[listen_addr] = thread_list
+                self.start_listening(listen_addr)
         if stream.interface == StreamInformation.any_interface:
             if stream not in self.active_any_interface_streams:
                 self.active_any_interface_streams.add(stream)
 
+    def start_listening(self, listen_addr):
+        if self.num_processes > 1:
+            self.start_decode_pool()
+        stream = SocketProcessing(listen_addr.ip, listen_addr.port, listen_addr.interface, self.decode_pool)
+        thread_list = [stream]
+        if self.ingest_engine == REACTOR_ENGINE:
+            self.start_reactor()
+            self.reactor.add_stream(stream)
+            self.reactor_addresses.add(listen_addr)
+        else:
+            if self.decode_pool is None:
+                cdp_process = CdpProcess(stream.ring)
+                cdp_process.start()
+                thread_list.append(cdp_process)
+            stream.start()
+        self.set_address_to_active(listen_addr)
+        self.rx_threads[listen_addr] = thread_list
+
+    def stop_listening(self, listen_addr):
+        thread_list = self.rx_threads.pop(listen_addr)
+        if listen_addr in self.reactor_addresses:
+            self.reactor_addresses.discard(listen_addr)
+            self.reactor.remove_stream(thread_list[0])
+        for thread in thread_list:
+            thread.wait()
+        self.set_address_to_inactive(listen_addr)
+
+    def switch_ingest_engine(self, engine):
+        """Restarts every listening address with the selected ingest engine."""
+        if engine == self.ingest_engine:
+            return
+        listen_addrs = list(self.rx_threads)
+        for listen_addr in listen_addrs:
+            self.stop_listening(listen_addr)
+        self.stop_reactor()
+        print("Using the {} ingest engine".format(engine))
+        self.ingest_engine = engine
+        for listen_addr in listen_addrs:
+            self.start_listening(listen_addr)
+
+    def start_reactor(self):
+        if self.reactor is None:
+            self.reactor = CdpReactor(self.decode_pool)
+            self.reactor.start()
+
+    def stop_reactor(self):
+        if self.reactor is not None:
+            self.reactor.wait()
+            self.reactor = None
+            self.reactor_addresses = set()
+
+    def start_decode_pool(self):
+        if self.decode_pool is None:
+            self.decode_pool = DecodePool(self.num_processes, KNOWN_DATA_ITEM_TYPES, DATA_ITEM_FORMATS)
+            self.decode_collector = CdpCollector(self.decode_pool)
+            self.decode_collector.start()
+
+    def stop_decode_pool(self):
+        if self.decode_pool is not None:
+            self.decode_collector.wait()
+            self.decode_pool.stop()
+            self.decode_pool = None
+            self.decode_collector = None
+
     def set_address_to_active(self, listen_addr):
         if listen_addr not in self.active_addresses:
             self.active_addresses.add(listen_addr)
@@ -267,10 +366,7 @@ class NetworkDiscoveryWindow(QtWidgets.QMainWindow):
         """
         for listen_addr in stream.equivalent_addresses:
             if listen_addr in self.rx_threads:
-                for thread in self.rx_threads[listen_addr]:
-                    thread.wait()
-                del self.rx_threads[listen_addr]
-                self.set_address_to_inactive(listen_addr)
+                self.stop_listening(listen_addr)
         if stream.interface == StreamInformation.any_interface:
             if stream in self.active_any_interface_streams:
                 self.active_any_interface_streams.discard(stream)
@@ -293,6 +389,8 @@ class NetworkDiscoveryWindow(QtWidgets.QMainWindow):
             self.close()
             return
 
+        self.update_queue_labels()
+
         new_cuwb_nets = set(self.network_discovery.available_networks.values())
         # Only refresh if the list of available networks changed
         if self.previous_cuwb_nets != new_cuwb_nets:
@@ -309,6 +407,8 @@ class NetworkDiscoveryWindow(QtWidgets.QMainWindow):
             # If network timers are not deleted first, the main window will close when they time out.
             self.network_discovery.rx_thread.join()
             self.network_discovery.network_timers = None
+            self.stop_reactor()
+            self.stop_decode_pool()
             self.killTimer(self.timer)
             self.close()
 
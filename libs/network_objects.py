@@ -3,15 +3,28 @@
 
 # System libraries
 import numpy as np
+import struct
 import sys
 import time
+from bisect import bisect_left
 from collections import deque
+from collections.abc import MutableMapping
+from itertools import islice
 from math import sqrt, log10, pi, e
-from scipy.signal import find_peaks_cwt
 
 # Local libraries
+import cdp
+from column_store import DataItemColumns, COLUMN_TYPES
+from device_data_items import get_device_data_header
+from memory_budget import MemoryBudget
+from rate_estimator import RateEstimator
+from retention_policy import RetentionPolicy, get_data_item_size
+from sequence_tracker import SequenceTracker, get_loss_percentage
+from serial_index import SerialIndex, get_serial_attribute
 from settings import *
 
+DEVICE_DATA_TYPE = cdp.DeviceData.type  # Rates are counted per device and device data type
+
 
 class UwbNetwork:
     """Global network class contains dictionaries of actors and some network variables"""
@@ -22,13 +35,237 @@ class UwbNetwork:
     system_repeat_rate = 30  # This is default, it should get updated with config file.
     prf = 64                 # This is default, it should get updated with config file.
     time_initial = time.monotonic()
+    device_filter = None     # Serial numbers of the devices whose packets are decoded, None decodes every device.
+    type_filter = None       # Data item types that are decoded, None decodes every type.
+    lazy_decode = False      # Store data items that decode on first attribute access.
+    memory_budget = MemoryBudget()  # Footprint of every node, evicts the least recently used history over budget.
 
     def stop_network(self):
         self.running = False
 
 
+class TypeStream:
+    """Data items of one type received by a node, with their reception times, counters and rate state."""
+    __slots__ = ('data', 'times', 'name', 'count', 'rate', 'selected', 'columns', 'max_age',
+                 'item_size', 'last_viewed', 'subscribers', 'serial_index', 'followed', 'resized_length')
+
+    def __init__(self, name, trail_length, max_age=None, item_size=0):
+        self.name = name
+        self.selected = False   # Data items are printed as they are received
+        self.columns = None     # DataItemColumns of the numeric fields, when stored
+        self.max_age = max_age  # in seconds, older data items are dropped as new ones arrive
+        self.item_size = item_size  # Estimated bytes per data item
+        self.last_viewed = -np.inf  # Last time a window read the data items, since UwbNetwork.time_initial
+        self.subscribers = ()       # Subscription of every window following the data items, replaced as a whole
+        self.serial_index = None    # SerialIndex of the data items by embedded serial number, for types with one
+        self.followed = False       # Node.update has more to do than keeping the data items, see Node.update_followed
+        self.resized_length = None  # Data items to keep from the next data item on, set by Node.update_item_sizes
+        self.data = deque([], trail_length)   # Last data items received
+        self.times = deque([], trail_length)  # Reception times of the data items, since UwbNetwork.time_initial
+        self.reset()
+
+    def reset(self):
+        self.data.clear()
+        self.times.clear()
+        self.count = 0
+        self.rate = RateEstimator()  # Data items per second, counted as they are received
+        if self.columns is not None:
+            self.columns.clear()
+        if self.serial_index is not None:
+            self.serial_index.clear()
+
+    @property
+    def freq(self):
+        """Data items per second over the last FREQUENCY_CALCULATION_TIME_INTERVAL seconds."""
+        return self.rate.get_rate(time.monotonic() - UwbNetwork.time_initial)
+
+    def evict(self):
+        """Drops the data items and columns to free their memory, keeping the counters."""
+        self.data.clear()
+        self.times.clear()
+        self.columns = None
+        if self.serial_index is not None:
+            self.serial_index.evict()
+
+    def get_item_size(self):
+        """
+        Estimated bytes per data item, averaged over the ITEM_SIZE_SAMPLES most recent ones, or
+        item_size when none is kept. Safe from any thread, the data items are read by index.
+        """
+        data = self.data
+        sizes = []
+        for index in range(1, ITEM_SIZE_SAMPLES + 1):
+            try:
+                sizes.append(get_data_item_size(data[-index]))
+            except IndexError:
+                break
+        return sum(sizes) // len(sizes) if sizes else self.item_size
+
+    def resize(self, trail_length):
+        """
+        Keeps up to trail_length data items from now on, dropping the oldest ones beyond it. The columns
+        and serial index are dropped, they are filled again from the data items kept if requested.
+        """
+        self.data = deque(self.data, trail_length)
+        self.times = deque(self.times, trail_length)
+        self.columns = None
+        self.serial_index = None
+        self.resized_length = None
+
+    def get_footprint(self):
+        """Approximate bytes held by the data items, columns and serial index."""
+        columns = self.columns
+        size = len(self.data) * self.item_size + (0 if columns is None else columns.nbytes)
+        serial_index = self.serial_index
+        if serial_index is not None:
+            times = self.times
+            size += serial_index.get_footprint(self.item_size, times[0] if times else np.inf)
+        return size
+
+    def get_history(self):
+        """
+        Returns copies of the data items and of their times, paired from the oldest, for threads
+        other than the receiving one. That thread appends each data item before its time, so the
+        times are copied first and both lists are trimmed to the shorter one.
+        """
+        times = list(self.times)
+        data_items = list(self.data)[:len(times)]
+        return data_items, times[:len(data_items)]
+
+    def get_last_used(self):
+        """Last time a data item was received or a window read them, since UwbNetwork.time_initial."""
+        times = self.times
+        return max(times[-1] if times else -np.inf, self.last_viewed)
+
+
+class Subscription:
+    """
+    Data items of one type of a node, pushed by Node.update as they are received and read in
+    batches with read(). Holds up to capacity unread data items, more are dropped and counted
+    as overruns, after which the reader catches up with Node.resync(). Only references to the
+    data items are kept, nothing is copied. The callback notifies the reader of every push.
+    """
+    __slots__ = ('pending', 'capacity', 'callback', 'overruns', 'read_overruns', 'last_read')
+
+    def __init__(self, capacity=TRAIL_LENGTH, callback=None):
+        self.pending = deque()     # (data item, time) not read yet
+        self.capacity = capacity
+        self.callback = callback   # Called with the subscription from the receiving thread, e.g. to emit a Qt signal
+        self.overruns = 0          # Data items dropped since the start
+        self.read_overruns = 0     # Overruns already reported by read()
+        self.last_read = None      # Newest data item returned to the reader
+
+    def push(self, data_item, time):
+        """Called by Node.update in the receiving thread."""
+        if len(self.pending) < self.capacity:
+            self.pending.append((data_item, time))
+        else:
+            self.overruns += 1
+        if self.callback is not None:
+            self.callback(self)
+
+    def add_history(self, data_items, times):
+        """
+        Puts data items received before subscribing ahead of the pending ones. The newest of
+        them may already have been pushed since subscribing, those are not repeated.
+        """
+        self.drop_pending(data_items)
+        room = max(self.capacity - len(self.pending), 0)
+        history = list(zip(data_items, times))[-room:] if room else []
+        self.overruns += len(data_items) - len(history)
+        self.pending.extendleft(reversed(history))
+
+    def read(self):
+        """
+        Returns the data items pushed since the previous read, oldest first, their reception
+        times and the number of data items dropped in between because the reader fell behind.
+        After an overrun, Node.resync() returns the data items of this read again with the
+        ones dropped that the node still holds.
+        """
+        data_items = []
+        times = []
+        # Only this side pops, so every item counted is there
+        for _ in range(len(self.pending)):
+            data_item, time = self.pending.popleft()
+            data_items.append(data_item)
+            times.append(time)
+        overruns = self.overruns
+        overrun = overruns - self.read_overruns
+        self.read_overruns = overruns
+        if data_items and not overrun:
+            self.last_read = data_items[-1]
+        return data_items, times, overrun
+
+    def resync(self, data_items, times):
+        """
+        Returns the data items of the stream and their times, given oldest first, to a reader
+        that had an overrun, with the index of the first of them it has not read yet. The
+        pending data items are among them and are dropped so they are not read twice.
+        """
+        self.drop_pending(data_items)
+        last_read = self.last_read
+        first_unread = 0
+        for index in range(len(data_items) - 1, -1, -1):
+            if data_items[index] is last_read:
+                first_unread = index + 1
+                break
+        if data_items:
+            self.last_read = data_items[-1]
+        return data_items, times, first_unread
+
+    def drop_pending(self, data_items):
+        """Drops the oldest pending data items as long as they are among data_items."""
+        data_item_ids = set(map(id, data_items))
+        while self.pending and id(self.pending[0][0]) in data_item_ids:
+            self.pending.popleft()
+
+    def clear(self):
+        """Drops the unread data items, e.g. when the reading window is reset."""
+        for _ in range(len(self.pending)):
+            self.pending.popleft()
+        self.read_overruns = self.overruns
+        self.last_read = None
+
+
+class StreamAttributeView(MutableMapping):
+    """
+    Dict of one TypeStream attribute indexed by data item type, standing in for the former
+    cdp_pkts, cdp_pkts_time, ... dicts of Node that the plots still use.
+    """
+    __slots__ = ('streams', 'attribute')
+
+    def __init__(self, streams, attribute):
+        self.streams = streams
+        self.attribute = attribute
+
+    def __getitem__(self, di_type):
+        stream = self.streams[di_type]
+        if self.attribute == 'data':
+            stream.last_viewed = time.monotonic() - UwbNetwork.time_initial
+        return getattr(stream, self.attribute)
+
+    def __setitem__(self, di_type, value):
+        setattr(self.streams[di_type], self.attribute, value)
+
+    def __delitem__(self, di_type):
+        # There is no stream without one of its attributes
+        del self.streams[di_type]
+
+    def __contains__(self, di_type):
+        return di_type in self.streams
+
+    def __iter__(self):
+        # The receiving thread may add types while a window iterates
+        return iter(list(self.streams))
+
+    def __len__(self):
+        return len(self.streams)
+
+
 class Node:
     """Network node class contains functions and parameters present for all devices in the network."""
+    trail_length = TRAIL_LENGTH              # Data items kept for every type without a retention limit
+    retention_policy = RetentionPolicy()     # Per type limits on the data items kept
 
     def __init__ (self, _serial):
         """Initialize position and serial number for network device"""
@@ -37,17 +274,24 @@ class Node:
         self.z = np.nan        # Device Z position as calculated
         self.serial = _serial  # Device serial number
 
-        self.cdp_pkts = dict()
-        self.cdp_pkts_time = dict()
-        self.cdp_pkts_name = dict()
-        self.cdp_pkts_count = dict()
-        self.cdp_pkts_freq = dict()
-        self.cdp_pkts_selected = dict()
-        self.cdp_pkts_frequency_deques = dict()
+        self.streams = dict()           # TypeStream of every data item type received, indexed by type
+        self.column_requests = set()    # Types whose columns a window asked for, created on their next data item
+        self.index_requests = set()     # Types whose serial index a window asked for, built on their next data item
+        self.subscriptions = dict()     # Subscription list indexed by data item type, also for types not received yet
+
+        # Per attribute views of the streams
+        self.cdp_pkts = StreamAttributeView(self.streams, 'data')
+        self.cdp_pkts_time = StreamAttributeView(self.streams, 'times')
+        self.cdp_pkts_name = StreamAttributeView(self.streams, 'name')
+        self.cdp_pkts_count = StreamAttributeView(self.streams, 'count')
+        self.cdp_pkts_freq = StreamAttributeView(self.streams, 'freq')
+        self.cdp_pkts_selected = StreamAttributeView(self.streams, 'selected')
 
         self.time_initial = time.monotonic()
 
         self.cdp_total = 0
+        self.sequence_trackers = dict()  # CDP sequence continuity indexed by listening address, None for all of them
+        self.device_data_rates = dict()  # RateEstimator of the DeviceData received, indexed by (device id, device data type)
 
         self.filtering = False
         self.filter_set = []
@@ -63,47 +307,244 @@ class Node:
         # If paused, update no nodes
         # If not filtering and not paused, update all nodes
         # If filtering, update only nodes selected in the filter window
-        if not self.paused and (not self.filtering or (self.filtering and (data_item.type in self.filter_set
-           or (UNKNOWN_FILTER_TYPE in self.filter_set and UNKNOWN_FILTER_NAME in data_item_name)))):
-            if not data_item.type in self.cdp_pkts:
-                self.cdp_pkts.update([(data_item.type, deque([], TRAIL_LENGTH))])
-                self.cdp_pkts_time.update([(data_item.type, deque([], TRAIL_LENGTH))])
-                self.cdp_pkts_name.update([(data_item.type, data_item_name)])
-                self.cdp_pkts_count.update([(data_item.type, 0)])
-                self.cdp_pkts_freq.update([(data_item.type, np.nan)])
-                self.cdp_pkts_selected.update([(data_item.type, False)])
-                self.cdp_pkts_frequency_deques.update([(data_item.type, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
-            self.cdp_pkts[data_item.type].append(data_item)
-            self.cdp_pkts_count[data_item.type] += 1
-            self.cdp_pkts_time[data_item.type].append(timestamp-UwbNetwork.time_initial)
-            self.cdp_total += 1
+        if self.paused:
+            return
+        di_type = data_item.type
+        if self.filtering and not (di_type in self.filter_set or (UNKNOWN_FILTER_TYPE in self.filter_set and UNKNOWN_FILTER_NAME in data_item_name)):
+            return
+
+        stream = self.streams.get(di_type)
+        if stream is None:
+            # Published complete, windows may look it up at any time
+            item_size = get_data_item_size(data_item)
+            trail_length, max_age = self.retention_policy.get_stream_limits(di_type, item_size, self.trail_length)
+            stream = TypeStream(data_item_name, trail_length, max_age, item_size)
+            stream.subscribers = tuple(self.subscriptions.get(di_type, ()))
+            self.streams[di_type] = stream
+            self.update_followed(di_type)
+        relative_time = timestamp - UwbNetwork.time_initial
+        stream.data.append(data_item)
+        stream.times.append(relative_time)
+        stream.count += 1
+        stream.rate.add(relative_time)
+        self.cdp_total += 1
+        if not stream.followed:
+            # Nothing more to do until a window follows the type, see update_followed()
+            return
+
+        if stream.resized_length is not None:
+            stream.resize(stream.resized_length)
+            self.update_followed(di_type)
+
+        if stream.max_age is not None:
+            # The data item just appended is never too old, so the loop stops
+            times = stream.times
+            oldest = relative_time - stream.max_age
+            while times[0] < oldest:
+                times.popleft()
+                stream.data.popleft()
+
+        for subscriber in stream.subscribers:
+            subscriber.push(data_item, relative_time)
+
+        # Read once, the memory budget may drop the columns meanwhile
+        columns = stream.columns
+        if columns is not None:
+            columns.append_item(data_item, relative_time)
+        elif di_type in self.column_requests or (di_type in COLUMN_TYPES and not UwbNetwork.lazy_decode):
+            # Filled from the data items kept so far, from this thread so none is missed
+            columns = DataItemColumns(di_type, stream.data.maxlen, stream.max_age)
+            for stored_item, stored_time in zip(list(stream.data), list(stream.times)):
+                columns.append_item(stored_item, stored_time)
+            stream.columns = columns
+
+        if di_type == DEVICE_DATA_TYPE:
+            self.add_device_data_rate(data_item, relative_time)
+
+        serial_index = stream.serial_index
+        if serial_index is not None:
+            serial_index.add(data_item, relative_time)
+        elif di_type in self.index_requests:
+            # Filled from the data items kept so far, from this thread so none is missed
+            serial_index = SerialIndex(di_type, stream.data.maxlen, stream.max_age)
+            for stored_item, stored_time in zip(list(stream.data), list(stream.times)):
+                serial_index.add(stored_item, stored_time)
+            stream.serial_index = serial_index
+
+    def add_device_data_rate(self, data_item, relative_time):
+        """Counts a DeviceData data item in the rate of its device and device data type."""
+        try:
+            device_id, ddi_type, ddi_length = get_device_data_header(data_item.device_data)
+        except struct.error:
+            # Too short to hold a device data header
+            return
+        rate = self.device_data_rates.get((device_id, ddi_type))
+        if rate is None:
+            rate = RateEstimator()
+            self.device_data_rates[(device_id, ddi_type)] = rate
+        rate.add(relative_time)
+
+    def update_followed(self, di_type):
+        """
+        Sets whether update() has more to do for a type than keeping its data items: an age limit,
+        subscribers, columns, a serial index, the DeviceData rates or a resize. Called whenever one
+        of them is added or removed.
+        """
+        stream = self.streams.get(di_type)
+        if stream is not None:
+            stream.followed = (di_type == DEVICE_DATA_TYPE or stream.max_age is not None or bool(stream.subscribers) or stream.columns is not None
+                               or stream.serial_index is not None or stream.resized_length is not None or di_type in self.column_requests
+                               or di_type in self.index_requests or (di_type in COLUMN_TYPES and not UwbNetwork.lazy_decode))
+
+    def update_item_sizes(self):
+        """
+        Re-estimates the bytes per data item of every type from its most recent data items, which
+        windows may have decoded since, and resizes the history of types with a byte budget once
+        its number of data items moves by more than ITEM_SIZE_TOLERANCE. The resize itself is left
+        to update(), in the receiving thread.
+        """
+        for di_type, stream in list(self.streams.items()):
+            stream.item_size = stream.get_item_size()
+            if 'bytes' not in self.retention_policy.get_limits(di_type):
+                continue
+            trail_length = self.retention_policy.get_stream_limits(di_type, stream.item_size, self.trail_length)[0]
+            if abs(trail_length - stream.data.maxlen) > stream.data.maxlen * ITEM_SIZE_TOLERANCE:
+                stream.resized_length = trail_length
+                self.update_followed(di_type)
+
+    def get_column_store(self, di_type):
+        """
+        Returns the DataItemColumns of a data item type, or None until the columns exist.
+        Types that are not stored in columns by default get them from their next data item on.
+        """
+        stream = self.streams.get(di_type)
+        columns = None if stream is None else stream.columns
+        if columns is None:
+            self.column_requests.add(di_type)
+            self.update_followed(di_type)
+            return None
+        stream.last_viewed = time.monotonic() - UwbNetwork.time_initial
+        return columns
+
+    def get_time_range(self, di_type, start, end):
+        """
+        Returns the data items of a type the node holds that were received within [start, end),
+        in seconds since UwbNetwork.time_initial like cdp_pkts_time, along with their times.
+        The items are found by binary search over the reception times and read from the nearer
+        end of the history, without copying it. For numeric fields or ranges of network_time, get_range() of the column store
+        returns views instead.
+        """
+        stream = self.streams.get(di_type)
+        if stream is None:
+            return [], []
+        stream.last_viewed = time.monotonic() - UwbNetwork.time_initial
+        times = stream.times
+        data_items = stream.data
+        # Counted back from the newest, so the receiving thread dropping the oldest meanwhile does
+        # not move them. Data items received meanwhile only shift the range, like any other read.
+        from_start = len(times) - bisect_left(times, start)  # Data items received at or after start
+        from_end = len(times) - bisect_left(times, end)      # Data items received at or after end
+        if from_end >= from_start:
+            return [], []
+        if len(times) - from_start < from_end:
+            # Walked from the oldest, only as far as the range
+            range_times = list(islice(times, len(times) - from_start, len(times) - from_end))
+            range_items = list(islice(data_items, len(data_items) - from_start, len(data_items) - from_end))
+            return range_items, range_times
+        # Walked from the newest, only as far as the range
+        range_times = list(islice(reversed(times), from_end, from_start))
+        range_items = list(islice(reversed(data_items), from_end, from_start))
+        range_times.reverse()
+        range_items.reverse()
+        return range_items, range_times
+
+    def get_serial_index(self, di_type):
+        """
+        Returns the SerialIndex of a data item type, or None until it exists. Types with a serial
+        number attribute get one from their next data item on, filled from the data items kept.
+        """
+        stream = self.streams.get(di_type)
+        serial_index = None if stream is None else stream.serial_index
+        if serial_index is None:
+            if get_serial_attribute(di_type) is not None:
+                self.index_requests.add(di_type)
+                self.update_followed(di_type)
+            return None
+        stream.last_viewed = time.monotonic() - UwbNetwork.time_initial
+        return serial_index
+
+    def subscribe(self, di_type, capacity=TRAIL_LENGTH, history=True, callback=None):
+        """
+        Returns a Subscription to the data items of a type, received or not yet. With history,
+        the first read also returns the data items the node holds already. callback is called
+        with the subscription from the receiving thread every time a data item is pushed.
+        """
+        subscription = Subscription(capacity, callback)
+        subscriptions = self.subscriptions.get(di_type, []) + [subscription]
+        self.subscriptions[di_type] = subscriptions
+        stream = self.streams.get(di_type)
+        if stream is not None:
+            stream.subscribers = tuple(subscriptions)
+            self.update_followed(di_type)
+            if history:
+                subscription.add_history(*stream.get_history())
+                stream.last_viewed = time.monotonic() - UwbNetwork.time_initial
+        return subscription
+
+    def resync(self, di_type, subscription):
+        """
+        Returns the data items of a type the node holds, their times and the index of the first
+        one the subscription did not return yet, for a reader that had an overrun.
+        """
+        stream = self.streams.get(di_type)
+        if stream is None:
+            return [], [], 0
+        stream.last_viewed = time.monotonic() - UwbNetwork.time_initial
+        return subscription.resync(*stream.get_history())
+
+    def unsubscribe(self, di_type, subscription):
+        subscriptions = [other for other in self.subscriptions.get(di_type, []) if other is not subscription]
+        self.subscriptions[di_type] = subscriptions
+        stream = self.streams.get(di_type)
+        if stream is not None:
+            stream.subscribers = tuple(subscriptions)
+            self.update_followed(di_type)
+
+    def update_sequence(self, stream, sequence):
+        if not stream in self.sequence_trackers:
+            self.sequence_trackers[stream] = SequenceTracker()
+        self.sequence_trackers[stream].update(sequence)
+
+    def get_loss_percentage(self):
+        """Percentage of the recent CDP packets of this node that were never received, over all listening addresses."""
+        return get_loss_percentage(list(self.sequence_trackers.values()))
+
+    def get_sequence_counters(self):
+        """Returns the totals of received, lost, gaps, reordered, duplicates and resets over all listening addresses."""
+        counters = dict(received=0, lost=0, gaps=0, reordered=0, duplicates=0, resets=0)
+        for tracker in list(self.sequence_trackers.values()):
+            for name in counters:
+                counters[name] += getattr(tracker, name)
+        return counters
 
     def start_filtering(self, filter_set):
         self.filtering = True
         self.filter_set = filter_set
-        for type in list(self.cdp_pkts):
+        for type, stream in list(self.streams.items()):
             # Clear all nodes not selected in the filter window
-            if (not type in self.filter_set) and not (UNKNOWN_FILTER_TYPE in self.filter_set and UNKNOWN_FILTER_NAME in self.cdp_pkts_name[type]):
-                del self.cdp_pkts[type]
-                del self.cdp_pkts_time[type]
-                del self.cdp_pkts_name[type]
-                self.cdp_total -= self.cdp_pkts_count[type]
-                del self.cdp_pkts_count[type]
-                del self.cdp_pkts_freq[type]
-                del self.cdp_pkts_selected[type]
-                del self.cdp_pkts_frequency_deques[type]
+            if (not type in self.filter_set) and not (UNKNOWN_FILTER_TYPE in self.filter_set and UNKNOWN_FILTER_NAME in stream.name):
+                del self.streams[type]
+                self.cdp_total -= stream.count
 
     def stop_filtering(self):
         self.filtering = False
 
     def reset(self):
-        for type in self.cdp_pkts:
+        self.sequence_trackers = dict()
+        self.device_data_rates = dict()
+        for stream in list(self.streams.values()):
             self.cdp_total = 0
-            self.cdp_pkts[type] = deque([], TRAIL_LENGTH)
-            self.cdp_pkts_time[type] = deque([], TRAIL_LENGTH)
-            self.cdp_pkts_count[type] = 0
-            self.cdp_pkts_freq[type] = np.nan
-            self.cdp_pkts_frequency_deques[type] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
+            stream.reset()
             UwbNetwork.time_initial = time.monotonic()
     def pause(self):
         self.paused = True
@@ -111,14 +552,25 @@ class Node:
     def resume(self):
         self.paused = False
 
-    def calculate_frequency(self, packet_time_deque):
+    def get_device_data_rate(self, device_id, ddi_type):
+        """Device data items per second of a type received from a device in DeviceData, 0 while paused."""
+        rate = self.device_data_rates.get((device_id, ddi_type))
+        if self.paused or rate is None:
+            return 0
+        return rate.get_rate(time.monotonic() - UwbNetwork.time_initial)
+
+    def get_serial_rate(self, di_type, serial):
+        """
+        Data items per second of a type received from one serial number, 0 while paused. Counted
+        by the serial index of the type, from the data items kept when a window first asked for it.
+        """
         if self.paused:
             return 0
-        if len(packet_time_deque) > 2:
-            packet_diff = packet_time_deque[-1][0] - packet_time_deque[0][0]
-            time_diff = packet_time_deque[-1][1] - packet_time_deque[0][1]
-            return packet_diff / time_diff
-        return 0
+        serial_index = self.get_serial_index(di_type)
+        serial_stream = None if serial_index is None else serial_index.serials.get(serial)
+        if serial_stream is None:
+            return 0
+        return serial_stream.rate.get_rate(time.monotonic() - UwbNetwork.time_initial)
 
     def set_xyz(self, _XYZ):
         """Change XYZ position. This is fed in as a numpy array."""
@@ -0,0 +1,89 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import struct
+
+# Local libraries
+from settings import *
+
+# Light weight CDP packet parsing that only walks the CDP header and the data item
+# type/size headers. It does not import the cdp library so that it can be used in
+# decoding worker processes without paying for the full library.
+
+CDP_MARK = 0x3230434c
+CDP_STRINGS = (b'CDP0002\x00', b'LCM_SELF')
+CDP_HEADER_SIZE = 20
+DI_HEADER_SIZE = 4
+
+unpack_cdp_header = struct.Struct("<II8sI").unpack_from
+unpack_di_header = struct.Struct("<HH").unpack_from
+unpack_packet_id = struct.Struct("<II8xI").unpack_from
+
+
+def parse_cdp_header(data):
+    """
+    Returns (serial_number, sequence) from the header of a CDP packet.
+    Raises the same ValueError messages as cdp.CDP for malformed headers.
+    """
+    if len(data) < CDP_HEADER_SIZE:
+        raise ValueError("Packet Size Error")
+
+    mark, sequence, string, serial_number = unpack_cdp_header(data)
+    if mark != CDP_MARK:
+        raise ValueError("CDP Header - Unrecognized Mark: 0x{:04x}".format(mark))
+    if string not in CDP_STRINGS:
+        raise ValueError(f"CDP Header - Unrecognized String: {string}")
+    return serial_number, sequence
+
+
+def peek_packet_id(data):
+    """Returns (serial_number, sequence) identifying a CDP packet, or None if data is not a CDP packet."""
+    if len(data) < CDP_HEADER_SIZE:
+        return None
+    mark, sequence, serial_number = unpack_packet_id(data)
+    if mark != CDP_MARK:
+        return None
+    return serial_number, sequence
+
+
+def parse_data_items(data):
+    """
+    Splits the data items of a CDP packet with a valid header without decoding them.
+    Returns (items, leftover) where items is a list of (type, start, end) offsets into data
+    and leftover is the number of trailing bytes that did not form a complete data item.
+    """
+    data_length = len(data)
+    items = []
+    current_idx = CDP_HEADER_SIZE
+    while data_length - current_idx >= DI_HEADER_SIZE:
+        di_type, di_size = unpack_di_header(data, current_idx)
+        current_idx += DI_HEADER_SIZE
+        if data_length - current_idx < di_size:
+            break
+        items.append((di_type, current_idx, current_idx + di_size))
+        current_idx += di_size
+
+    return items, data_length - current_idx
+
+
+def add_data_item_types(data, types):
+    """
+    Adds the types of the data items of a CDP packet with a valid header to the set types,
+    including the type of a truncated last data item. Cheaper than parse_data_items.
+    """
+    data_length = len(data)
+    current_idx = CDP_HEADER_SIZE
+    while data_length - current_idx >= DI_HEADER_SIZE:
+        di_type, di_size = unpack_di_header(data, current_idx)
+        types.add(di_type)
+        current_idx += DI_HEADER_SIZE + di_size
+
+
+def select_data_items(items, type_filter, known_types):
+    """
+    Keeps the (type, start, end) items whose type is in type_filter. Types missing from
+    known_types are unknown to the cdp library and are kept if UNKNOWN_FILTER_TYPE is selected.
+    """
+    keep_unknown = UNKNOWN_FILTER_TYPE in type_filter
+    return [item for item in items if item[0] in type_filter or (keep_unknown and item[0] not in known_types)]
@@ -41,7 +41,6 @@ class PlotDistanceToNeighboringAnchors(QtWidgets.QMainWindow):
         self.from_id_count = dict()
         self.from_ids = np.array([])
         self.from_id_roles = dict()
-        self.from_id_frequency_deques = dict()
 
         self.network_serials = dict()
         self.device_roles_count = dict()
@@ -92,7 +91,6 @@ class PlotDistanceToNeighboringAnchors(QtWidgets.QMainWindow):
                     self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
                     self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
                     self.from_id_count.update([(target_id, 0)])
-                    self.from_id_frequency_deques.update([(target_id, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
                     self.from_ids = np.sort(np.append(self.from_ids, target_id))
 
                     row = self.id_total
@@ -127,10 +125,6 @@ class PlotDistanceToNeighboringAnchors(QtWidgets.QMainWindow):
                 else:
                     self.from_id_roles[target_id] = False
 
-        for target_id in self.from_ids:
-            self.from_id_frequency_deques[target_id].append((self.from_id_count[target_id], time.monotonic()))
-
-        networks = list(self.network_serials.keys())
         for row in range(self.id_total):
             target_id = int(self.from_ids[row])
             if self.from_id_id_labels[row].text() != '0x{:08X}'.format(target_id):
@@ -138,7 +132,8 @@ class PlotDistanceToNeighboringAnchors(QtWidgets.QMainWindow):
                 self.from_id_id_labels[row].setStyleSheet(GetClickableColor())
                 self.from_id_id_labels[row].mouseReleaseEvent = partial(self.labelClickEvent, target_id)
 
-            freq = UwbNetwork.nodes[networks[0]].calculate_frequency(self.from_id_frequency_deques[target_id])
+            # Counted over every node that reported the anchor, like from_id_count
+            freq = sum(UwbNetwork.nodes[serial].get_serial_rate(DistanceV2.type, target_id) for serial in self.network_serials)
             self.from_id_count_labels[row].setText('{:5d}'.format(self.from_id_count[target_id]))
             self.from_id_freq_labels[row].setText('{:5.1f}Hz'.format(freq))
 
@@ -149,7 +144,6 @@ class PlotDistanceToNeighboringAnchors(QtWidgets.QMainWindow):
         for target_id in self.from_ids:
             self.network_serials = dict()
             self.from_id_count[target_id] = 0
-            self.from_id_frequency_deques[target_id] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
         for target_id in self.sub_windows:
             self.sub_windows[target_id].reset()
 
@@ -41,7 +41,6 @@ class PlotAnchorPositionStatusV4(QtWidgets.QMainWindow):
         self.from_id_enable_checks = dict()
         self.from_id_count = dict()
         self.from_ids = np.array([])
-        self.from_id_frequency_deques = dict()
         self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[AnchorPositionStatusV4.type] - len(UwbNetwork.nodes[self.serial].cdp_pkts[AnchorPositionStatusV4.type])
 
         self.grid_layout.addWidget(QtWidgets.QLabel("Tag Serial#"), 0, 0)
@@ -85,7 +84,6 @@ class PlotAnchorPositionStatusV4(QtWidgets.QMainWindow):
                 self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
                 self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
                 self.from_id_count.update([(target_id, 0)])
-                self.from_id_frequency_deques.update([(target_id, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
                 self.from_ids = np.sort(np.append(self.from_ids, target_id))
 
                 row = self.id_total
@@ -117,9 +115,6 @@ class PlotAnchorPositionStatusV4(QtWidgets.QMainWindow):
                 packet = UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - current_size]
                 self.sub_windows[target_id].update_data(packet)
 
-        for target_id in self.from_ids:
-            self.from_id_frequency_deques[target_id].append((self.from_id_count[target_id], time.monotonic()))
-
         for row in range(self.id_total):
             target_id = int(self.from_ids[row])
             if self.from_id_id_labels[row].text() != '0x{:08X}'.format(target_id):
@@ -127,7 +122,7 @@ class PlotAnchorPositionStatusV4(QtWidgets.QMainWindow):
                 self.from_id_id_labels[row].setStyleSheet(GetClickableColor())
                 self.from_id_id_labels[row].mouseReleaseEvent = partial(self.labelClickEvent, target_id)
 
-            freq = UwbNetwork.nodes[self.serial].calculate_frequency(self.from_id_frequency_deques[target_id])
+            freq = UwbNetwork.nodes[self.serial].get_serial_rate(self.type, target_id)
             self.from_id_count_labels[row].setText('{:5d}'.format(self.from_id_count[target_id]))
             self.from_id_freq_labels[row].setText('{:5.1f}Hz'.format(freq))
 
@@ -138,7 +133,6 @@ class PlotAnchorPositionStatusV4(QtWidgets.QMainWindow):
     def reset(self):
         for target_id in self.from_ids:
             self.from_id_count[target_id] = 0
-            self.from_id_frequency_deques[target_id] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
         for target_id in self.sub_windows:
             self.sub_windows[target_id].reset()
 
@@ -34,7 +34,6 @@ class PlotBootloadProgress(QtWidgets.QMainWindow):
         self.from_id_freq_labels = {}
         self.from_id_enable_checks = {}
         self.from_id_count = {}
-        self.from_id_frequency_deques = {}
         self.from_ids = np.array([])
 
         self.grid_layout.addWidget(QtWidgets.QLabel("Serial#"), 0, 0)
@@ -67,7 +66,6 @@ class PlotBootloadProgress(QtWidgets.QMainWindow):
                     self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
                     self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
                     self.from_id_count.update([(_target_id, 0)])
-                    self.from_id_frequency_deques.update([(_target_id, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
                     self.from_ids = np.sort(np.append(self.from_ids, _target_id))
 
                     _row = self.id_total
@@ -96,9 +94,6 @@ class PlotBootloadProgress(QtWidgets.QMainWindow):
                     _packet = UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size]
                     self.sub_windows[_target_id].updateLabels(_packet)
 
-            for _target_id in self.from_ids:
-                self.from_id_frequency_deques[_target_id].append((self.from_id_count[_target_id], time.monotonic()))
-
             for _row in range(self.id_total):
                 _target_id = int(self.from_ids[_row])
                 if self.from_id_id_labels[_row].text() != '0x{:08X}'.format(_target_id):
@@ -106,7 +101,7 @@ class PlotBootloadProgress(QtWidgets.QMainWindow):
                     self.from_id_id_labels[_row].setStyleSheet(GetClickableColor())
                     self.from_id_id_labels[_row].mouseReleaseEvent = partial(self.labelClickEvent, _target_id)
 
-                _freq = UwbNetwork.nodes[self.serial].calculate_frequency(self.from_id_frequency_deques[_target_id])
+                _freq = UwbNetwork.nodes[self.serial].get_serial_rate(self.type, _target_id)
                 self.from_id_count_labels[_row].setText('{:5d}'.format(self.from_id_count[_target_id]))
                 self.from_id_freq_labels[_row].setText('{:5.1f}Hz'.format(_freq))
 
@@ -35,11 +35,7 @@ class PlotDeviceActivityState(QtWidgets.QMainWindow):
         self.from_id_count_labels = dict()
         self.from_id_freq_labels = dict()
         self.from_id_enable_checks = dict()
-        self.from_id_times = dict()
-        self.from_id_count = dict()
-        self.from_ids = np.array([])
-        self.from_id_frequency_deques = dict()
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[DeviceActivityState.type] - len(UwbNetwork.nodes[self.serial].cdp_pkts[DeviceActivityState.type])
+        self.from_id_printed_counts = dict()
 
         self.grid_layout.addWidget(QtWidgets.QLabel('Serial #'), 0, 0)
         self.grid_layout.addWidget(QtWidgets.QLabel('Packet Count'), 0, 1)
@@ -71,75 +67,53 @@ class PlotDeviceActivityState(QtWidgets.QMainWindow):
         self.killTimer(self.timer)
 
     def update_labels(self):
-        current_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type]
-        current_size = current_count - self.previous_count
-        if current_size > 1000:
-            current_size = 1000
-        self.previous_count = current_count
-        for idx in range(current_size):
-            target_id = UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - current_size].serial_number.as_int
-            if not (target_id in self.from_ids):
-                self.from_id_id_labels.update([(self.id_total, QtWidgets.QLabel())])
-                self.from_id_count_labels.update([(self.id_total, QtWidgets.QLabel())])
-                self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
-                self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
-                self.from_id_times.update([(target_id, deque([], TRAIL_LENGTH))])
-                self.from_id_frequency_deques.update([(target_id, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
-                self.from_id_count.update([(target_id, 0)])
-                self.from_ids = np.sort(np.append(self.from_ids, target_id))
-
-                row = self.id_total
-                column = 0
-                self.grid_layout.addWidget(self.from_id_id_labels[self.id_total], row + 1, column + 0)
-                self.grid_layout.addWidget(self.from_id_count_labels[self.id_total], row + 1, column + 1)
-                self.grid_layout.addWidget(self.from_id_freq_labels[self.id_total], row + 1, column + 2)
-                self.grid_layout.addWidget(self.from_id_enable_checks[self.id_total], row + 1, column + 3)
-
-                if column > 0:
-                    row = 2
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Serial #"), row, column + 0)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Packet Count"), row, column + 1)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Frequency"), row, column + 2)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Print"), row, column + 3)
-                self.id_total += 1
-
-            self.from_id_times[target_id].append(UwbNetwork.nodes[self.serial].cdp_pkts_time[self.type][idx - current_size])
-            self.from_id_count[target_id] += 1
-
-            if target_id in self.from_ids:
-                row = np.where(self.from_ids == target_id)[0][0]
-                if self.from_id_enable_checks[row].isChecked():
-                    print(UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - current_size])
-
-            if target_id in self.sub_windows.keys():
-                packet = UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - current_size]
-
-                self.sub_windows[target_id].updateData(packet)
-
-        for target_id in self.from_ids:
-            self.from_id_frequency_deques[target_id].append((self.from_id_count[target_id], time.monotonic()))
+        serial_index = UwbNetwork.nodes[self.serial].get_serial_index(self.type)
+        if serial_index is None:
+            return
 
-        for row in range(self.id_total):
-            target_id = int(self.from_ids[row])
+        serial_numbers = serial_index.serial_numbers
+        while self.id_total < len(serial_numbers):
+            self.from_id_id_labels.update([(self.id_total, QtWidgets.QLabel())])
+            self.from_id_count_labels.update([(self.id_total, QtWidgets.QLabel())])
+            self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
+            self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
+
+            row = self.id_total
+            self.grid_layout.addWidget(self.from_id_id_labels[self.id_total], row + 1, 0)
+            self.grid_layout.addWidget(self.from_id_count_labels[self.id_total], row + 1, 1)
+            self.grid_layout.addWidget(self.from_id_freq_labels[self.id_total], row + 1, 2)
+            self.grid_layout.addWidget(self.from_id_enable_checks[self.id_total], row + 1, 3)
+            self.id_total += 1
+
+        now = time.monotonic() - UwbNetwork.time_initial
+        for row, target_id in enumerate(serial_numbers):
+            stream = serial_index.serials[target_id]
             if self.from_id_id_labels[row].text() != '0x{:08X}'.format(target_id):
                 self.from_id_id_labels[row].setText('0x{:08X}'.format(target_id))
                 self.from_id_id_labels[row].setStyleSheet(GetClickableColor())
                 self.from_id_id_labels[row].mouseReleaseEvent = partial(self.labelClickEvent, target_id)
 
-            if len(self.from_id_times[target_id]) == 0:
-                continue
+            count = stream.count
+            new_count = min(count - self.from_id_printed_counts.get(target_id, count), len(stream.data))
+            self.from_id_printed_counts[target_id] = count
+            if new_count > 0:
+                packets = list(stream.data)[-new_count:]
+                if self.from_id_enable_checks[row].isChecked():
+                    for packet in packets:
+                        print(packet)
+                if target_id in self.sub_windows.keys():
+                    self.sub_windows[target_id].updateData(packets[-1])
 
-            freq = UwbNetwork.nodes[self.serial].calculate_frequency(self.from_id_frequency_deques[target_id])
-            self.from_id_count_labels[row].setText('{:5d}'.format(self.from_id_count[target_id]))
+            freq = 0 if UwbNetwork.nodes[self.serial].paused else stream.rate.get_rate(now)
+            self.from_id_count_labels[row].setText('{:5d}'.format(count))
             self.from_id_freq_labels[row].setText('{:5.1f}Hz'.format(freq))
 
     def labelClickEvent(self, serial, e):
         self.sub_windows.update([(serial, PlotDeviceActivityStateSubWindow(serial, self))])
 
     def reset(self):
-        for target_id in self.from_ids:
-            self.from_id_count[target_id] = 0
-            self.from_id_frequency_deques[target_id] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
+        # The counts belong to the node index, which the node reset clears
+        self.from_id_printed_counts = dict()
 
 class PlotDeviceActivityStateSubWindow(pg.GraphicsLayoutWidget):
 
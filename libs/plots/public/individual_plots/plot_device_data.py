@@ -5,18 +5,19 @@
 from functools import partial
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtWidgets, QtCore
-import struct
 import time
 
 #Local Libraries
 import device_data_items
 from cdp import *
+from device_data_items import get_device_data_header
 from network_objects import *
 from settings import *
 from plots import *
 
 class PlotDeviceData(QtWidgets.QMainWindow):
     type = DeviceData.type
+    data_pushed = QtCore.Signal()  # Emitted from the receiving thread, handled in the GUI thread
     
     def __init__(self, serial):
         
@@ -43,41 +44,54 @@ class PlotDeviceData(QtWidgets.QMainWindow):
         self.device_counts = {}
         self.sub_windows = {}
         self.curr_row = 1
-        self.prev_node_count = 0
+        self.update_pending = False
+        self.data_pushed.connect(self.pushedEvent)
+        self.subscription = UwbNetwork.nodes[self.serial].subscribe(DeviceData.type, callback=self.notifyPushed)
         
         self.updateDevices()
         self.timer = self.startTimer(250)
 
+    def notifyPushed(self, subscription):
+        # Called for every data item, a single update reads all of those pushed until it runs
+        if not self.update_pending:
+            self.update_pending = True
+            self.data_pushed.emit()
+
+    def pushedEvent(self):
+        self.update_pending = False
+        if self.running:
+            self.updateDevices()
+
     def updateDevices(self):
-        if DeviceData.type in UwbNetwork.nodes[self.serial].cdp_pkts_count and UwbNetwork.nodes[self.serial].cdp_pkts_count[DeviceData.type] != 0:
-            while self.prev_node_count != UwbNetwork.nodes[self.serial].cdp_pkts_count[DeviceData.type]:
-                packet = UwbNetwork.nodes[self.serial].cdp_pkts[DeviceData.type][self.prev_node_count]
-                typing, device_id, sequence_num, tlv_header = struct.unpack("<BIBH", packet.device_data[:8])
-                packet_type_length = format(tlv_header, "#018b")
-                packet_type = int(packet_type_length[2:12], 2)
-                packet_length = int(packet_type_length[12:], 2)
-                packet_data = packet.device_data[8:]
-                if not CiholasSerialNumber(device_id).as_int in self.device_network.devices.keys():
-                    self.device_network.devices[device_id] = Device(device_id, self.prev_node_count)
-                    device_text = str(hex(device_id)).upper()
-                    device_text = device_text[2:]
-                    device_label = QtWidgets.QLabel('0x' + device_text)
-                    device_label.setStyleSheet(GetClickableColor())
-                    device_label.mouseReleaseEvent = partial(self.labelClickEvent, self.device_network, device_id)
-                    self.device_labels.append(device_label)
-                    self.grid_layout.addWidget(device_label, self.curr_row, 0)
-                    device_count = QtWidgets.QLabel()
-                    device_count.setAlignment(QtCore.Qt.AlignCenter)
-                    self.device_counts[device_id] = device_count
-                    self.grid_layout.addWidget(self.device_counts[device_id], self.curr_row, 1)
-                    self.curr_row += 1
-                    self.resize(self.window_length, self.window_width + 20*len(self.device_network.devices))
-
-                if packet_type not in self.device_network.devices[device_id].names:
-                    self.device_network.devices[device_id].addType(packet_type)
-                self.device_network.devices[device_id].updateData(packet_type, packet_data, packet_length)
-                self.device_counts[device_id].setText(str(self.device_network.devices[device_id].total_count))
-                self.prev_node_count += 1
+        packets, times, overrun = self.subscription.read()
+        if overrun:
+            # Those dropped are read from the node, unless it dropped them too
+            packets, times, first_unread = UwbNetwork.nodes[self.serial].resync(DeviceData.type, self.subscription)
+            packets = packets[first_unread:]
+            times = times[first_unread:]
+        for packet, packet_time in zip(packets, times):
+            device_id, packet_type, packet_length = get_device_data_header(packet.device_data)
+            packet_data = packet.device_data[8:]
+            if not CiholasSerialNumber(device_id).as_int in self.device_network.devices.keys():
+                self.device_network.devices[device_id] = Device(device_id)
+                device_text = str(hex(device_id)).upper()
+                device_text = device_text[2:]
+                device_label = QtWidgets.QLabel('0x' + device_text)
+                device_label.setStyleSheet(GetClickableColor())
+                device_label.mouseReleaseEvent = partial(self.labelClickEvent, self.device_network, device_id)
+                self.device_labels.append(device_label)
+                self.grid_layout.addWidget(device_label, self.curr_row, 0)
+                device_count = QtWidgets.QLabel()
+                device_count.setAlignment(QtCore.Qt.AlignCenter)
+                self.device_counts[device_id] = device_count
+                self.grid_layout.addWidget(self.device_counts[device_id], self.curr_row, 1)
+                self.curr_row += 1
+                self.resize(self.window_length, self.window_width + 20*len(self.device_network.devices))
+
+            if packet_type not in self.device_network.devices[device_id].names:
+                self.device_network.devices[device_id].addType(packet_type)
+            self.device_network.devices[device_id].updateData(packet_type, packet_data, packet_length, packet_time)
+            self.device_counts[device_id].setText(str(self.device_network.devices[device_id].total_count))
 
     def labelClickEvent(self, network, device_id, e):
         if device_id in self.sub_windows.keys():
@@ -94,22 +108,22 @@ class PlotDeviceData(QtWidgets.QMainWindow):
             self.close()
             return
 
-        if self.running:
-            self.updateDevices()
-        else:
+        # Data items are read as they are pushed, the timer only watches for the monitor to stop
+        if not self.running:
             self.killTimer(self.timer)
             self.close()
 
     def closeEvent(self, e):
         self.running = False
         self.killTimer(self.timer)
+        UwbNetwork.nodes[self.serial].unsubscribe(DeviceData.type, self.subscription)
         for window in self.sub_windows.values():
             if window.isVisible():
                 window.close()
         self.close()
 
     def reset(self):
-        self.prev_node_count = 0
+        self.subscription.clear()
         self.device_network.clear()
         for device_id, label in self.device_counts.items():
             label.setText("0")
@@ -162,7 +176,7 @@ class PlotDeviceDataSubwindow(QtWidgets.QMainWindow):
 
     def updateLabels(self):
         for dd_type in self.device.names.keys():
-            self.device.updateFrequencies(dd_type, self.device_network.isPaused())
+            self.device.updateFrequencies(dd_type, UwbNetwork.nodes[self.device_network.pinging_anchor])
             if not dd_type in self.type_labels.keys():
                 self.type_labels[dd_type] = QtWidgets.QLabel(self.device.names[dd_type])
                 self.count_labels[dd_type] = QtWidgets.QLabel(str(self.device.counts[dd_type]))
@@ -254,7 +268,7 @@ class DeviceNetwork():
 
 class Device():
 
-    def __init__(self, device_id, init_count):
+    def __init__(self, device_id):
         self.id = device_id
         self.total_count = 0
         self.start_count = 0
@@ -263,7 +277,6 @@ class Device():
         self.times = {}
         self.counts = {}
         self.frequencies = {}
-        self.frequency_deques = {}
         self.packet_lengths = {}
 
     def addType(self, ddi_type):
@@ -283,9 +296,8 @@ class Device():
         self.times[ddi_type] = deque([], TRAIL_LENGTH)
         self.counts[ddi_type] = 0
         self.frequencies[ddi_type] = 0
-        self.frequency_deques[ddi_type] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
     
-    def updateData(self, ddi_type, data, data_length):
+    def updateData(self, ddi_type, data, data_length, data_time):
         device_data_types = {1: device_data_items.VersionStringResponse,
                              3: device_data_items.MagnetometerCalibrationResponse,
                              4: device_data_items.DeviceStatus,
@@ -296,16 +308,14 @@ class Device():
         device_ddi = device_data_types[ddi_type](self.id, data)
         self.packets[ddi_type].append(device_ddi)
         self.packet_lengths[ddi_type].append(data_length)
-        self.times[ddi_type].append(time.monotonic()-UwbNetwork.time_initial)
+        # Received by the node at data_time, since UwbNetwork.time_initial
+        self.times[ddi_type].append(data_time)
         self.counts[ddi_type] += 1
         self.total_count += 1
 
-    def updateFrequencies(self, ddi_type, paused):
-        self.frequency_deques[ddi_type].append([self.counts[ddi_type], time.monotonic()])
-        if paused or len(self.frequency_deques[ddi_type]) < 2:
-            self.frequencies[ddi_type] = 0
-        else:
-            self.frequencies[ddi_type] = (self.frequency_deques[ddi_type][-1][0] - self.frequency_deques[ddi_type][0][0]) / (self.frequency_deques[ddi_type][-1][1] - self.frequency_deques[ddi_type][0][1])
+    def updateFrequencies(self, ddi_type, node):
+        # Counted by the node as the DeviceData are received, 0 while paused
+        self.frequencies[ddi_type] = node.get_device_data_rate(self.id, ddi_type)
 
     def clear(self):
         for ddi_type in self.names.keys():
@@ -314,5 +324,4 @@ class Device():
             self.times[ddi_type] = deque([], TRAIL_LENGTH)
             self.counts[ddi_type] = 0
             self.frequencies[ddi_type] = 0
-            self.frequency_deques[ddi_type] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
             self.total_count = 0
@@ -36,7 +36,6 @@ class PlotDeviceHardwareStatusV2(QtWidgets.QMainWindow):
         self.from_id_freq_labels = {}
         self.from_id_enable_checks = {}
         self.from_id_count = {}
-        self.from_id_frequency_deques = {}
 
         self.grid_layout.addWidget(QtWidgets.QLabel("Serial#"), 0, 0)
         self.grid_layout.addWidget(QtWidgets.QLabel("Packet Count"), 0, 1)
@@ -68,7 +67,6 @@ class PlotDeviceHardwareStatusV2(QtWidgets.QMainWindow):
                     self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
                     self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
                     self.from_id_count.update([(_target_id, 0)])
-                    self.from_id_frequency_deques.update([(_target_id, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
                     self.from_ids = np.sort(np.append(self.from_ids, _target_id))
 
                     _row = self.id_total
@@ -100,9 +98,6 @@ class PlotDeviceHardwareStatusV2(QtWidgets.QMainWindow):
 
                 self.prev_count += 1
 
-            for _target_id in self.from_ids:
-                self.from_id_frequency_deques[_target_id].append((self.from_id_count[_target_id], time.monotonic()))
-
             for _row in range(self.id_total):
                 _target_id = int(self.from_ids[_row])
                 if self.from_id_id_labels[_row].text() != '0x{:08X}'.format(_target_id):
@@ -110,7 +105,7 @@ class PlotDeviceHardwareStatusV2(QtWidgets.QMainWindow):
                     self.from_id_id_labels[_row].setStyleSheet(GetClickableColor())
                     self.from_id_id_labels[_row].mouseReleaseEvent = partial(self.labelClickEvent, _target_id)
 
-                _freq = UwbNetwork.nodes[self.serial].calculate_frequency(self.from_id_frequency_deques[_target_id])
+                _freq = UwbNetwork.nodes[self.serial].get_serial_rate(self.type, _target_id)
                 self.from_id_count_labels[_row].setText('{:5d}'.format(self.from_id_count[_target_id]))
                 self.from_id_freq_labels[_row].setText('{:5.1f}Hz'.format(_freq))
 
@@ -33,7 +33,6 @@ class PlotGyroV3(QtWidgets.QMainWindow):
         self.from_id_count_labels = dict()
         self.from_id_freq_labels = dict()
         self.from_id_enable_checks = dict()
-        self.from_id_frequency_deques = dict()
         self.from_id_count = dict()
         self.from_ids = np.array([])
         self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type] - len(UwbNetwork.nodes[self.serial].cdp_pkts[self.type])
@@ -74,7 +73,6 @@ class PlotGyroV3(QtWidgets.QMainWindow):
                 self.from_id_count_labels.update([(self.id_total, QtWidgets.QLabel())])
                 self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
                 self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
-                self.from_id_frequency_deques.update([(_target_id, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
                 self.from_id_count.update([(_target_id, 0)])
                 self.from_ids = np.sort(np.append(self.from_ids, _target_id))
 
@@ -109,9 +107,6 @@ class PlotGyroV3(QtWidgets.QMainWindow):
 
                 self.sub_windows[_target_id].update_data(_x, _y, _z, _time)
 
-        for _target_id in self.from_ids:
-            self.from_id_frequency_deques[_target_id].append((self.from_id_count[_target_id], time.monotonic()))
-
         for _row in range(self.id_total):
             _target_id = int(self.from_ids[_row])
             if self.from_id_id_labels[_row].text() != '0x{:08X}'.format(_target_id):
@@ -119,7 +114,7 @@ class PlotGyroV3(QtWidgets.QMainWindow):
                 self.from_id_id_labels[_row].setStyleSheet(GetClickableColor())
                 self.from_id_id_labels[_row].mouseReleaseEvent = partial(self.labelClickEvent, _target_id)
 
-            _freq = UwbNetwork.nodes[self.serial].calculate_frequency(self.from_id_frequency_deques[_target_id])
+            _freq = UwbNetwork.nodes[self.serial].get_serial_rate(self.type, _target_id)
             self.from_id_count_labels[_row].setText('{:5d}'.format(self.from_id_count[_target_id]))
             self.from_id_freq_labels[_row].setText('{:5.1f}Hz'.format(_freq))
 
@@ -130,7 +125,6 @@ class PlotGyroV3(QtWidgets.QMainWindow):
     def reset(self):
         for target_id in self.from_ids:
             self.from_id_count[target_id] = 0
-            self.from_id_frequency_deques[target_id] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
         for target_id in self.sub_windows:
             self.sub_windows[target_id].reset()
         self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type]
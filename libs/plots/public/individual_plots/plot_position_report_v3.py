@@ -12,6 +12,7 @@ import time
 
 # Local libraries
 from cdp import PositionV3
+from column_store import ColumnStore
 from network_objects import *
 from settings import *
 
@@ -38,10 +39,7 @@ class PlotPositionReportV3(QtWidgets.QMainWindow):
         self.from_id_count_labels = dict()
         self.from_id_freq_labels = dict()
         self.from_id_enable_checks = dict()
-        self.from_id_count = dict()
-        self.from_ids = np.array([])
-        self.from_id_frequency_deques = dict()
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[PositionV3.type] - len(UwbNetwork.nodes[self.serial].cdp_pkts[PositionV3.type])
+        self.from_id_read_counts = dict()  # Count of the SerialIndex stream of every serial number at the previous update
 
         self.grid_layout.addWidget(QtWidgets.QLabel("Serial#"), 0, 0)
         self.grid_layout.addWidget(QtWidgets.QLabel("Packet Count"), 0, 1)
@@ -72,67 +70,54 @@ class PlotPositionReportV3(QtWidgets.QMainWindow):
         self.killTimer(self.timer)
 
     def update_labels(self):
-        _current_size = UwbNetwork.nodes[self.serial].cdp_pkts_count[PositionV3.type] - self.previous_count
-        if _current_size > 1000: _current_size = 1000
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[PositionV3.type]
-        for idx in range(_current_size):
-            _target_id = UwbNetwork.nodes[self.serial].cdp_pkts[PositionV3.type][idx - _current_size].serial_number.as_int
-            if not (_target_id in self.from_ids):
-                self.from_id_id_labels.update([(self.id_total, QtWidgets.QLabel())])
-                self.from_id_count_labels.update([(self.id_total, QtWidgets.QLabel())])
-                self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
-                self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
-                self.from_id_count.update([(_target_id, 0)])
-                self.from_id_frequency_deques.update([(_target_id, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
-                self.from_ids = np.sort(np.append(self.from_ids, _target_id))
-
-                _row = self.id_total
-                _column = 0
-                self.grid_layout.addWidget(self.from_id_id_labels[self.id_total], _row + 1, _column + 0)
-                self.grid_layout.addWidget(self.from_id_count_labels[self.id_total], _row + 1, _column + 1)
-                self.grid_layout.addWidget(self.from_id_freq_labels[self.id_total], _row + 1, _column + 2)
-                self.grid_layout.addWidget(self.from_id_enable_checks[self.id_total], _row + 1, _column + 3)
-
-                if _column > 0:
-                    _row = 2
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Serial#"), _row, _column + 0)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Packet Count"), _row, _column + 1)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Frequency"), _row, _column + 2)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Print"), _row, _column + 3)
-                self.id_total += 1
-
-            self.from_id_count[_target_id] += 1
-
-            if _target_id in self.from_ids:
-                _row = np.where(self.from_ids==_target_id)[0][0]
-                if self.from_id_enable_checks[_row].isChecked():
-                    print(UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size])
-
-            if _target_id in self.sub_windows.keys():
-                _packet = UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size]
-                self.sub_windows[_target_id].update_data(_packet)
-
-        for _target_id in self.from_ids:
-            self.from_id_frequency_deques[_target_id].append((self.from_id_count[_target_id], time.monotonic()))
-
-        for _row in range(self.id_total):
-            _target_id = int(self.from_ids[_row])
+        _serial_index = UwbNetwork.nodes[self.serial].get_serial_index(self.type)
+        if _serial_index is None: return
+
+        _serial_numbers = _serial_index.serial_numbers
+        while self.id_total < len(_serial_numbers):
+            self.from_id_id_labels.update([(self.id_total, QtWidgets.QLabel())])
+            self.from_id_count_labels.update([(self.id_total, QtWidgets.QLabel())])
+            self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
+            self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
+
+            _row = self.id_total
+            self.grid_layout.addWidget(self.from_id_id_labels[self.id_total], _row + 1, 0)
+            self.grid_layout.addWidget(self.from_id_count_labels[self.id_total], _row + 1, 1)
+            self.grid_layout.addWidget(self.from_id_freq_labels[self.id_total], _row + 1, 2)
+            self.grid_layout.addWidget(self.from_id_enable_checks[self.id_total], _row + 1, 3)
+            self.id_total += 1
+
+        _now = time.monotonic() - UwbNetwork.time_initial
+        for _row, _target_id in enumerate(_serial_numbers):
+            _stream = _serial_index.serials[_target_id]
             if self.from_id_id_labels[_row].text() != '0x{:08X}'.format(_target_id):
                 self.from_id_id_labels[_row].setText('0x{:08X}'.format(_target_id))
                 self.from_id_id_labels[_row].setStyleSheet(GetClickableColor())
                 self.from_id_id_labels[_row].mouseReleaseEvent = partial(self.labelClickEvent, _target_id)
 
-            _freq = UwbNetwork.nodes[self.serial].calculate_frequency(self.from_id_frequency_deques[_target_id])
-            self.from_id_count_labels[_row].setText('{:5d}'.format(self.from_id_count[_target_id]))
+            # Data items received since the previous update, at most those the index still holds
+            _count = _stream.count
+            _new_count = min(_count - self.from_id_read_counts.get(_target_id, _count - len(_stream.data)), len(_stream.data))
+            self.from_id_read_counts[_target_id] = _count
+            if _new_count > 0:
+                _packets = list(_stream.data)[-_new_count:]
+                if self.from_id_enable_checks[_row].isChecked():
+                    for _packet in _packets:
+                        print(_packet)
+                if _target_id in self.sub_windows:
+                    for _packet in _packets:
+                        self.sub_windows[_target_id].update_data(_packet)
+
+            _freq = 0 if UwbNetwork.nodes[self.serial].paused else _stream.rate.get_rate(_now)
+            self.from_id_count_labels[_row].setText('{:5d}'.format(_count))
             self.from_id_freq_labels[_row].setText('{:5.1f}Hz'.format(_freq))
 
     def labelClickEvent(self, serial, e):
         self.sub_windows.update([(serial, PlotPositionV3SubWindow(serial, self))])
 
     def reset(self):
-        for target_id in self.from_ids:
-            self.from_id_count[target_id] = 0
-            self.from_id_frequency_deques[target_id] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
+        # The counts belong to the node index, which the node reset clears
+        self.from_id_read_counts = dict()
         for target_id in self.sub_windows:
             self.sub_windows[target_id].reset()
 
@@ -148,9 +133,9 @@ class PlotPositionV3SubWindow(pg.LayoutWidget):
         self.resize(800, 800)
         self.parent = parent
 
-        self.data_x = deque([], TRAIL_LENGTH)
-        self.data_y = deque([], TRAIL_LENGTH)
-        self.data_z = deque([], TRAIL_LENGTH)
+        # Positions in meters, plotted once per timer tick
+        self.positions = ColumnStore(TRAIL_LENGTH, [('x', np.float64), ('y', np.float64), ('z', np.float64)])
+        self.quality = None
 
         self.graph_xy = pg.PlotWidget(name='XY', title='XY')
         self.graph_xy.showGrid(x=True, y=True)
@@ -181,35 +166,37 @@ class PlotPositionV3SubWindow(pg.LayoutWidget):
         self.running = True
 
     def update_data(self, packet):
-
-        self.data_x.append(packet.x / 1000.0)
-        self.data_y.append(packet.y / 1000.0)
-        self.data_z.append(packet.z / 1000.0)
-        if len(self.data_x) > 1:
-            self.stats_quality.setText("Quality: {:5d}".format(packet.quality))
-
-            self.plot_xy.setData(self.data_x    , self.data_y)
-            self.plot_xy_pt.setData([self.data_x[-1]], [self.data_y[-1]])
-
-            self.plot_xz.setData(self.data_x    , self.data_z)
-            self.plot_xz_pt.setData([self.data_x[-1]], [self.data_z[-1]])
-
-            self.stats_xyz_avg.setText("xyz_avg: ({:0.3f}, {:0.3f}, {:0.3f})".format(np.mean(np.array(self.data_x)[-100:]), np.mean(np.array(self.data_y)[-100:]), np.mean(np.array(self.data_z)[-100:])))
-            self.stats_xyz_std.setText("xyz_std: ({:0.3f}, {:0.3f}, {:0.3f})".format(np.std(np.array(self.data_x)[-100:]), np.std(np.array(self.data_y)[-100:]), np.std(np.array(self.data_z)[-100:])))
+        self.positions.append((packet.x / 1000.0, packet.y / 1000.0, packet.z / 1000.0))
+        self.quality = packet.quality
 
     def timerEvent(self, e):
         if not UwbNetwork.running or not self.parent.running:
             self.close()
             return
 
+        if self.quality is None: return
+        _quality = self.quality
+        self.quality = None
+
+        _x, _y, _z = self.positions.get_columns('x', 'y', 'z')
+        if len(_x) > 1:
+            self.stats_quality.setText("Quality: {:5d}".format(_quality))
+
+            self.plot_xy.setData(_x, _y)
+            self.plot_xy_pt.setData(_x[-1:], _y[-1:])
+
+            self.plot_xz.setData(_x, _z)
+            self.plot_xz_pt.setData(_x[-1:], _z[-1:])
+
+            self.stats_xyz_avg.setText("xyz_avg: ({:0.3f}, {:0.3f}, {:0.3f})".format(np.mean(_x[-100:]), np.mean(_y[-100:]), np.mean(_z[-100:])))
+            self.stats_xyz_std.setText("xyz_std: ({:0.3f}, {:0.3f}, {:0.3f})".format(np.std(_x[-100:]), np.std(_y[-100:]), np.std(_z[-100:])))
+
     def closeEvent(self, e):
         self.killTimer(self.timer)
         self.running = False
 
     def reset(self):
-        self.data_x = deque([], TRAIL_LENGTH)
-        self.data_y = deque([], TRAIL_LENGTH)
-        self.data_z = deque([], TRAIL_LENGTH)
+        self.positions.clear()
 
     def changeGraph(self, state):
         self.graph_xy.clear()
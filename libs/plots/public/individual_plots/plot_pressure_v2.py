@@ -35,12 +35,11 @@ class PlotPressureV2(QtWidgets.QMainWindow):
         self.from_id_count_labels = dict()
         self.from_id_freq_labels = dict()
         self.from_id_enable_checks = dict()
-        self.from_id_frequency_deques = dict()
         self.from_id_times = dict()
         self.from_id_count = dict()
         self.from_id_p_data = dict()
         self.from_ids = np.array([])
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type] - len(UwbNetwork.nodes[self.serial].cdp_pkts[self.type])
+        self.subscription = UwbNetwork.nodes[self.serial].subscribe(self.type)
 
         self.grid_layout.addWidget(QtWidgets.QLabel("Serial#"), 0, 0)
         self.grid_layout.addWidget(QtWidgets.QLabel("Packet Count"), 0, 1)
@@ -71,20 +70,25 @@ class PlotPressureV2(QtWidgets.QMainWindow):
     def closeEvent(self, e):
         self.killTimer(self.timer)
         self.running = False
+        UwbNetwork.nodes[self.serial].unsubscribe(self.type, self.subscription)
         self.close()
 
     def update_labels(self):
-        _current_size = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type] - self.previous_count
-        if _current_size > 1000: _current_size = 1000
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type]
-        for idx in range(_current_size):
-            _target_id = UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size].serial_number.as_int
+        _data_items, _times, _overrun = self.subscription.read()
+        _first_unread = 0
+        if _overrun:
+            # Data items were dropped before they were read, plot again those the node holds
+            _data_items, _times, _first_unread = UwbNetwork.nodes[self.serial].resync(self.type, self.subscription)
+            for _target_id in self.from_ids:
+                self.from_id_times[_target_id].clear()
+                self.from_id_p_data[_target_id].clear()
+        for _index, (_data_item, _time) in enumerate(zip(_data_items, _times)):
+            _target_id = _data_item.serial_number.as_int
             if not (_target_id in self.from_ids):
                 self.from_id_id_labels.update([(self.id_total, QtWidgets.QLabel())])
                 self.from_id_count_labels.update([(self.id_total, QtWidgets.QLabel())])
                 self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
                 self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
-                self.from_id_frequency_deques.update([(_target_id, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
                 self.from_id_times.update([(_target_id, deque([], TRAIL_LENGTH))])
                 self.from_id_count.update([(_target_id, 0)])
                 self.from_id_p_data.update([(_target_id, deque([], TRAIL_LENGTH))])
@@ -105,15 +109,12 @@ class PlotPressureV2(QtWidgets.QMainWindow):
                     self.grid_layout.addWidget(QtWidgets.QLabel("Enable"), _row, _column + 3)
                 self.id_total += 1
 
-            self.from_id_times[_target_id].append(UwbNetwork.nodes[self.serial].cdp_pkts_time[self.type][idx - _current_size])
+            self.from_id_times[_target_id].append(_time)
 
-            self.from_id_count[_target_id] += 1
+            if _index >= _first_unread: self.from_id_count[_target_id] += 1
 
-            _scale = UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size].scale / 2147483647.0
-            self.from_id_p_data[_target_id].append(UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size].pressure * _scale)
-
-        for _target_id in self.from_ids:
-            self.from_id_frequency_deques[_target_id].append((self.from_id_count[_target_id], time.monotonic()))
+            _scale = _data_item.scale / 2147483647.0
+            self.from_id_p_data[_target_id].append(_data_item.pressure * _scale)
 
         for _row in range(self.id_total):
             _target_id = int(self.from_ids[_row])
@@ -122,7 +123,7 @@ class PlotPressureV2(QtWidgets.QMainWindow):
 
             if len(self.from_id_times[_target_id]) == 0: continue
 
-            _freq = UwbNetwork.nodes[self.serial].calculate_frequency(self.from_id_frequency_deques[_target_id])
+            _freq = UwbNetwork.nodes[self.serial].get_serial_rate(self.type, _target_id)
             self.from_id_count_labels[_row].setText('{:5d}'.format(self.from_id_count[_target_id]))
             self.from_id_freq_labels[_row].setText('{:5.1f}Hz'.format(_freq))
 
@@ -139,7 +140,6 @@ class PlotPressureV2(QtWidgets.QMainWindow):
         if self.sub_window.isVisible():
             for target_id in self.from_ids:
                 self.from_id_count[target_id] = 0
-                self.from_id_frequency_deques[target_id] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
                 self.from_id_p_data[target_id] = deque([], TRAIL_LENGTH)
                 self.from_id_times[target_id] = deque([], TRAIL_LENGTH)
             self.sub_window.color_offset = 0
@@ -148,7 +148,7 @@ class PlotPressureV2(QtWidgets.QMainWindow):
                 self.sub_window.update_data('pressure', '0x{:08X}'.format(target_id),
                                             np.array([]),
                                             np.array([]))
-            self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type]
+            self.subscription.clear()
 
 
 class PlotPressureV2SubWindow(pg.GraphicsLayoutWidget):
@@ -35,10 +35,7 @@ class PlotQuaternionV3(QtWidgets.QMainWindow):
         self.from_id_count_labels = dict()
         self.from_id_freq_labels = dict()
         self.from_id_enable_checks = dict()
-        self.from_id_frequency_deques = dict()
-        self.from_id_count = dict()
-        self.from_ids = np.array([])
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type] - len(UwbNetwork.nodes[self.serial].cdp_pkts[self.type])
+        self.from_id_read_counts = dict()  # Count of the SerialIndex stream of every serial number at the previous update
 
         self.grid_layout.addWidget(QtWidgets.QLabel("Serial#"), 0, 0)
         self.grid_layout.addWidget(QtWidgets.QLabel("Packet Count"), 0, 1)
@@ -65,76 +62,60 @@ class PlotQuaternionV3(QtWidgets.QMainWindow):
         self.running = False
 
     def update_labels(self):
-
-        _current_size = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type] - self.previous_count
-        if _current_size > 1000: _current_size = 1000
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type]
-        for idx in range(_current_size):
-            _target_id = UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size].serial_number.as_int
-            if not (_target_id in self.from_ids):
-                self.from_id_id_labels.update([(self.id_total, QtWidgets.QLabel())])
-                self.from_id_count_labels.update([(self.id_total, QtWidgets.QLabel())])
-                self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
-                self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
-                self.from_id_frequency_deques.update([(_target_id, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
-                self.from_id_count.update([(_target_id, 0)])
-                self.from_ids = np.sort(np.append(self.from_ids, _target_id))
-
-                _row = self.id_total
-                _column = 0
-                self.grid_layout.addWidget(self.from_id_id_labels[self.id_total], _row+1, _column + 0)
-                self.grid_layout.addWidget(self.from_id_count_labels[self.id_total], _row+1, _column + 1)
-                self.grid_layout.addWidget(self.from_id_freq_labels[self.id_total], _row+1, _column + 2)
-                self.grid_layout.addWidget(self.from_id_enable_checks[self.id_total], _row+1, _column + 3)
-
-                if _column > 0:
-                    _row = 2
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Serial#"), _row, _column + 0)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Packet Count"), _row, _column + 1)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Frequency"), _row, _column + 2)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Print"), _row, _column + 3)
-                self.id_total += 1
-
-            self.from_id_count[_target_id] += 1
-
-            if _target_id in self.from_ids:
-                _row = np.where(self.from_ids==_target_id)[0][0]
-                if self.from_id_enable_checks[_row].isChecked():
-                    print(UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size])
-
-            if _target_id in self.sub_windows.keys():
-                _x = (UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size].x * 1.0) / (2.0**30)
-                _y = (UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size].y * 1.0) / (2.0**30)
-                _w = (UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size].w * 1.0) / (2.0**30)
-                _z = (UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size].z * 1.0) / (2.0**30)
-                _time = UwbNetwork.nodes[self.serial].cdp_pkts[self.type][idx - _current_size].network_time * TICK
-
-                self.sub_windows[_target_id].update_data(_x, _y, _z, _w, _time)
-
-        for _target_id in self.from_ids:
-            self.from_id_frequency_deques[_target_id].append((self.from_id_count[_target_id], time.monotonic()))
-
-        for _row in range(self.id_total):
-            _target_id = int(self.from_ids[_row])
+        _serial_index = UwbNetwork.nodes[self.serial].get_serial_index(self.type)
+        if _serial_index is None: return
+
+        _serial_numbers = _serial_index.serial_numbers
+        while self.id_total < len(_serial_numbers):
+            self.from_id_id_labels.update([(self.id_total, QtWidgets.QLabel())])
+            self.from_id_count_labels.update([(self.id_total, QtWidgets.QLabel())])
+            self.from_id_freq_labels.update([(self.id_total, QtWidgets.QLabel())])
+            self.from_id_enable_checks.update([(self.id_total, QtWidgets.QCheckBox())])
+
+            _row = self.id_total
+            self.grid_layout.addWidget(self.from_id_id_labels[self.id_total], _row + 1, 0)
+            self.grid_layout.addWidget(self.from_id_count_labels[self.id_total], _row + 1, 1)
+            self.grid_layout.addWidget(self.from_id_freq_labels[self.id_total], _row + 1, 2)
+            self.grid_layout.addWidget(self.from_id_enable_checks[self.id_total], _row + 1, 3)
+            self.id_total += 1
+
+        _now = time.monotonic() - UwbNetwork.time_initial
+        for _row, _target_id in enumerate(_serial_numbers):
+            _stream = _serial_index.serials[_target_id]
             if self.from_id_id_labels[_row].text() != '0x{:08X}'.format(_target_id):
                 self.from_id_id_labels[_row].setText('0x{:08X}'.format(_target_id))
                 self.from_id_id_labels[_row].setStyleSheet(GetClickableColor())
                 self.from_id_id_labels[_row].mouseReleaseEvent = partial(self.labelClickEvent, _target_id)
 
-            _freq = UwbNetwork.nodes[self.serial].calculate_frequency(self.from_id_frequency_deques[_target_id])
-            self.from_id_count_labels[_row].setText('{:5d}'.format(self.from_id_count[_target_id]))
+            # Data items received since the previous update, at most those the index still holds
+            _count = _stream.count
+            _new_count = min(_count - self.from_id_read_counts.get(_target_id, _count - len(_stream.data)), len(_stream.data))
+            self.from_id_read_counts[_target_id] = _count
+            if _new_count > 0:
+                _packets = list(_stream.data)[-_new_count:]
+                if self.from_id_enable_checks[_row].isChecked():
+                    for _packet in _packets:
+                        print(_packet)
+                if _target_id in self.sub_windows:
+                    for _packet in _packets:
+                        _x = (_packet.x * 1.0) / (2.0**30)
+                        _y = (_packet.y * 1.0) / (2.0**30)
+                        _w = (_packet.w * 1.0) / (2.0**30)
+                        _z = (_packet.z * 1.0) / (2.0**30)
+                        self.sub_windows[_target_id].update_data(_x, _y, _z, _w, _packet.network_time * TICK)
+
+            _freq = 0 if UwbNetwork.nodes[self.serial].paused else _stream.rate.get_rate(_now)
+            self.from_id_count_labels[_row].setText('{:5d}'.format(_count))
             self.from_id_freq_labels[_row].setText('{:5.1f}Hz'.format(_freq))
 
     def labelClickEvent(self, serial, e):
         self.sub_windows.update([(serial, PlotQuatV3SubWindow(serial, self))])
 
     def reset(self):
-        for target_id in self.from_ids:
-            self.from_id_count[target_id] = 0
-            self.from_id_frequency_deques[target_id] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
+        # The counts belong to the node index, which the node reset clears
+        self.from_id_read_counts = dict()
         for target_id in self.sub_windows:
             self.sub_windows[target_id].reset()
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[self.type]
 
 
 class PlotQuatV3SubWindow(QtWidgets.QMainWindow):
@@ -36,9 +36,7 @@ class PlotTimedRxV5(QtWidgets.QMainWindow):
         self.from_id_iid_tp_data = dict()
         self.from_id_iid_fp_data = dict()
         self.from_id_iid_rx_qual = dict()
-        self.from_id_frequency_deques = dict()
-        self.from_ids = np.array([])
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[TimedRxV5.type] - len(UwbNetwork.nodes[self.serial].cdp_pkts[TimedRxV5.type])
+        self.from_id_read_counts = dict()  # Count of the SerialIndex stream of every serial number at the previous update
 
         self.rf_plot_window = RfPlotSubWindow(self.serial, self)
         self.rf_plot_window.show()
@@ -72,69 +70,63 @@ class PlotTimedRxV5(QtWidgets.QMainWindow):
         self.running = False
 
     def update_labels(self):
-        _current_size = UwbNetwork.nodes[self.serial].cdp_pkts_count[TimedRxV5.type] - self.previous_count
-        if _current_size > 1000: _current_size = 1000
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[TimedRxV5.type]
-        for idx in range(_current_size):
-            _target_id = UwbNetwork.nodes[self.serial].cdp_pkts[TimedRxV5.type][idx - _current_size].source_serial_number.as_int
-            if not (_target_id in self.from_ids):
-                self.from_id_id_labels.update([(self.id_total, QtWidgets.QLabel())])
-                self.from_id_iid_cf_labels.update([(self.id_total, [QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel()])])
-                self.from_id_iid_rxq_labels.update([(self.id_total, [QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel()])])
-                self.from_id_iid_checks.update([(self.id_total, [QtWidgets.QCheckBox(), QtWidgets.QCheckBox(), QtWidgets.QCheckBox(), QtWidgets.QCheckBox(), QtWidgets.QCheckBox(), QtWidgets.QCheckBox()])])
+        _serial_index = UwbNetwork.nodes[self.serial].get_serial_index(TimedRxV5.type)
+        if _serial_index is None: return
+
+        _serial_numbers = _serial_index.serial_numbers
+        while self.id_total < len(_serial_numbers):
+            self.from_id_id_labels.update([(self.id_total, QtWidgets.QLabel())])
+            self.from_id_iid_cf_labels.update([(self.id_total, [QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel()])])
+            self.from_id_iid_rxq_labels.update([(self.id_total, [QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel(), QtWidgets.QLabel()])])
+            self.from_id_iid_checks.update([(self.id_total, [QtWidgets.QCheckBox(), QtWidgets.QCheckBox(), QtWidgets.QCheckBox(), QtWidgets.QCheckBox(), QtWidgets.QCheckBox(), QtWidgets.QCheckBox()])])
+
+            _row = self.id_total
+            self.grid_layout.addWidget(self.from_id_id_labels[self.id_total], _row + 1, 0)
+            self.grid_layout.addWidget(self.from_id_iid_rxq_labels[self.id_total][0], _row + 1, 1)
+            self.grid_layout.addWidget(self.from_id_iid_cf_labels[self.id_total][0], _row + 1, 2)
+            self.grid_layout.addWidget(self.from_id_iid_checks[self.id_total][0], _row + 1, 3)
+            self.id_total += 1
+
+        _now = time.monotonic() - UwbNetwork.time_initial
+        for _row, _target_id in enumerate(_serial_numbers):
+            _stream = _serial_index.serials[_target_id]
+            if not _target_id in self.from_id_iid_times:
                 self.id_iid_plotting.update([(_target_id, [False, False, False, False, False, False])])
                 self.from_id_iid_times.update([(_target_id, [deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH)])])
-                self.from_id_frequency_deques.update([(_target_id, deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH))])
                 self.from_id_iid_count.update([(_target_id, [0, 0, 0, 0, 0, 0])])
                 self.from_id_iid_tp_data.update([(_target_id, [deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH)])])
                 self.from_id_iid_fp_data.update([(_target_id, [deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH)])])
                 self.from_id_iid_rx_qual.update([(_target_id, [0, 0, 0, 0, 0, 0])])
-                self.from_ids = np.sort(np.append(self.from_ids, _target_id))
-
-                _row = self.id_total
-                _column = 0
-                self.grid_layout.addWidget(self.from_id_id_labels[self.id_total], _row+1, _column + 0)
-                self.grid_layout.addWidget(self.from_id_iid_rxq_labels[self.id_total][0], _row+1, _column + 1)
-                self.grid_layout.addWidget(self.from_id_iid_cf_labels[self.id_total][0], _row+1, _column + 2)
-                self.grid_layout.addWidget(self.from_id_iid_checks[self.id_total][0], _row+1, _column + 3)
-
-                if _column > 0:
-                    _row = 2
-                    self.grid_layout.addWidget(QtWidgets.QLabel("Serial#"), _row, _column + 0)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("RxQ"), _row, _column + 1)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("#/Freq ID0"), _row, _column + 2)
-                    self.grid_layout.addWidget(QtWidgets.QLabel("En"), _row, _column + 3)
-                self.id_total += 1
-
-            _iid = UwbNetwork.nodes[self.serial].cdp_pkts[TimedRxV5.type][idx - _current_size].interface_id
-            self.from_id_iid_times[_target_id][_iid].append(UwbNetwork.nodes[self.serial].cdp_pkts_time[TimedRxV5.type][idx - _current_size])
-            self.from_id_iid_count[_target_id][_iid] += 1
-
-            _fp = UwbNetwork.nodes[self.serial].cdp_pkts[TimedRxV5.type][idx - _current_size].signal_strength.get_first_path(UwbNetwork.prf)
-            _tp = UwbNetwork.nodes[self.serial].cdp_pkts[TimedRxV5.type][idx - _current_size].signal_strength.get_total_path(UwbNetwork.prf)
-            self.from_id_iid_fp_data[_target_id][_iid].append(_fp)
-            self.from_id_iid_tp_data[_target_id][_iid].append(_tp)
-
-            self.from_id_iid_rx_qual[_target_id][_iid] = UwbNetwork.nodes[self.serial].cdp_pkts[TimedRxV5.type][idx - _current_size].rx_nt_quality
-
-        for _target_id in self.from_ids:
-            self.from_id_frequency_deques[_target_id].append((self.from_id_iid_count[_target_id][0], time.monotonic()))
-
-        for _row in range(self.id_total):
-            _target_id = int(self.from_ids[_row])
+
             if self.from_id_id_labels[_row].text() != '0x{:08X}'.format(_target_id):
                 self.from_id_id_labels[_row].setText('0x{:08X}'.format(_target_id))
                 for _iid in range(6):
-                    if self.id_iid_plotting[self.from_ids[_row]][_iid]:
+                    if self.id_iid_plotting[_target_id][_iid]:
                         self.from_id_iid_checks[_row][_iid].setCheckState(2) #Qt.Qt.Checked)
                     else:
                         self.from_id_iid_checks[_row][_iid].setCheckState(0) #Qt.Qt.Unchecked)
 
+            # Data items received since the previous update, at most those the index still holds
+            _count = _stream.count
+            _new_count = min(_count - self.from_id_read_counts.get(_target_id, _count - len(_stream.data)), len(_stream.data))
+            self.from_id_read_counts[_target_id] = _count
+            if _new_count > 0:
+                for _packet, _time in zip(list(_stream.data)[-_new_count:], list(_stream.times)[-_new_count:]):
+                    _iid = _packet.interface_id
+                    self.from_id_iid_times[_target_id][_iid].append(_time)
+                    self.from_id_iid_count[_target_id][_iid] += 1
+
+                    self.from_id_iid_fp_data[_target_id][_iid].append(_packet.signal_strength.get_first_path(UwbNetwork.prf))
+                    self.from_id_iid_tp_data[_target_id][_iid].append(_packet.signal_strength.get_total_path(UwbNetwork.prf))
+
+                    self.from_id_iid_rx_qual[_target_id][_iid] = _packet.rx_nt_quality
+
+            _freq = 0 if UwbNetwork.nodes[self.serial].paused else _stream.rate.get_rate(_now)
+
             for _iid in range(6):
 
                 if len(self.from_id_iid_times[_target_id][_iid]) == 0: continue
 
-                _freq = UwbNetwork.nodes[self.serial].calculate_frequency(self.from_id_frequency_deques[_target_id])
                 self.from_id_iid_cf_labels[_row][_iid].setText('{:5d} / {:5.1f}Hz'.format(self.from_id_iid_count[_target_id][_iid], _freq))
                 self.from_id_iid_rxq_labels[_row][_iid].setText('{:d}'.format(self.from_id_iid_rx_qual[_target_id][_iid]))
                 if self.from_id_iid_checks[_row][_iid].isChecked():
@@ -156,16 +148,14 @@ class PlotTimedRxV5(QtWidgets.QMainWindow):
 
     def reset(self):
         if self.isVisible():
-            for target_id in self.from_ids:
+            for target_id in self.from_id_iid_times:
                 self.from_id_iid_times[target_id] = [deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH)]
-                self.from_id_frequency_deques[target_id] = deque([], FREQUENCY_CALCULATION_DEQUE_LENGTH)
                 self.from_id_iid_tp_data[target_id] = [deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH)]
                 self.from_id_iid_fp_data[target_id] = [deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH), deque([], TRAIL_LENGTH)]
                 self.from_id_iid_count[target_id] = [0, 0, 0, 0, 0, 0]
                 self.from_id_iid_rx_qual[target_id] = [0, 0, 0, 0, 0, 0]
             self.rf_plot_window.color_offset = 0
-            for row in range(self.id_total):
-                target_id = int(self.from_ids[row])
+            for target_id in self.from_id_iid_times:
                 for iid in range(6):
                     self.rf_plot_window.update_data('tp', '0x{:08X}:{:d}'.format(target_id, iid),
                                                     np.array([]),
@@ -173,7 +163,8 @@ class PlotTimedRxV5(QtWidgets.QMainWindow):
                     self.rf_plot_window.update_data('fp', '0x{:08X}:{:d}'.format(target_id, iid),
                                                     np.array([]),
                                                     np.array([]))
-        self.previous_count = UwbNetwork.nodes[self.serial].cdp_pkts_count[TimedRxV5.type]
+        # The counts of the node index start over with the node reset
+        self.from_id_read_counts = dict()
 
 
 class RfPlotSubWindow(pg.GraphicsLayoutWidget):
@@ -0,0 +1,51 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import numpy as np
+from collections import deque
+
+# Local libraries
+from settings import *
+
+
+class RateEstimator:
+    """
+    Events per second over the last window seconds, counted in fixed buckets of bucket_length
+    seconds as the events happen. add() is called by a single receiving thread, get_rate()
+    may be called from any thread and only looks at window / bucket_length buckets.
+    """
+    __slots__ = ('bucket_length', 'window', 'buckets', 'bucket_end', 'current', 'first')
+
+    def __init__(self, bucket_length=RATE_BUCKET_LENGTH, window=FREQUENCY_CALCULATION_TIME_INTERVAL):
+        self.bucket_length = bucket_length
+        self.window = window
+        self.buckets = deque([], int(window / bucket_length) + 1)  # (end time, count) of the finished buckets
+        self.bucket_end = -np.inf  # End time of the current bucket
+        self.current = 0           # Events in the current bucket
+        self.first = None          # Time of the first event
+
+    def add(self, time):
+        if time < self.bucket_end:
+            self.current += 1
+            return
+        if self.first is None:
+            self.first = time
+        else:
+            self.buckets.append((self.bucket_end, self.current))
+        self.bucket_end = (time // self.bucket_length + 1) * self.bucket_length
+        self.current = 1
+
+    def get_rate(self, now):
+        """Events per second over the window before now, times in the same clock as add()."""
+        first = self.first
+        if first is None or now <= first:
+            return 0
+        start = now - self.window
+        count = sum(bucket_count for bucket_end, bucket_count in list(self.buckets) if bucket_end > start)
+        if self.bucket_end > start:
+            count += self.current
+        if now - first < self.window:
+            # Intervals between the events so far, a single event has no rate yet
+            return (count - 1) / (now - first) if count > 1 else 0
+        return count / self.window
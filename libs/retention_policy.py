@@ -0,0 +1,125 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import json
+import sys
+
+# Local libraries
+import cdp
+from lazy_data_item import LazyDataItem, get_item_bytes
+
+DEFAULT_KEY = 'default'
+LIMIT_NAMES = ('count', 'age', 'bytes')
+BYTE_UNITS = {'k': 1024, 'm': 1024**2, 'g': 1024**3}
+
+# Bytes held besides the bytes of a data item, measured over the cdp data item types
+ITEM_OVERHEAD = sys.getsizeof(0.0) + 16  # Reception time and the two deque slots
+LAZY_ITEM_SIZE = sys.getsizeof(LazyDataItem(0, None, 0, 0, 0, None))
+CDP_ITEM_SIZE = 550      # Undecoded cdp data item, its attribute dict and header attributes
+DECODED_ITEM_SIZE = 690  # Decoded cdp data item, its attribute dict and header attributes
+DECODED_BYTE_SIZE = 4    # Decoded attribute objects per byte of the data item
+
+
+def get_data_item_size(data_item):
+    """
+    Estimated bytes a node holds for a data item and its reception time, from the length of the
+    data item's bytes plus a fixed overhead per object. Never decodes the data item.
+    """
+    size = ITEM_OVERHEAD
+    if isinstance(data_item, LazyDataItem):
+        size += LAZY_ITEM_SIZE
+        # Read before the data item, decoding drops the packet once the data item is set
+        if data_item._packet is not None:
+            # Undecoded, it keeps its part of the packet
+            return size + data_item.di_size
+        data_item = data_item._data_item
+    if get_item_bytes(data_item) is not None:
+        return size + CDP_ITEM_SIZE + data_item.di_size
+    # Decoded, cdp keeps every attribute as an object of its own
+    return size + DECODED_ITEM_SIZE + DECODED_BYTE_SIZE * data_item.__dict__.get('di_size', 0)
+
+
+def parse_type(key):
+    """Returns the data item type of a data item name (e.g. AccelerometerV2) or number (e.g. 0x0139)."""
+    if key == DEFAULT_KEY:
+        return key
+    try:
+        return int(key, 0)
+    except ValueError:
+        pass
+    data_item_class = getattr(cdp, key, None)
+    if data_item_class is None or cdp.CDP.data_item_classes.get(getattr(data_item_class, 'type', None)) is not data_item_class:
+        raise ValueError("Unknown data item type: {}".format(key))
+    return data_item_class.type
+
+
+def parse_bytes(value):
+    """Returns a number of bytes from an int or a string with an optional k, M or G suffix."""
+    if isinstance(value, str) and value[-1:].lower() in BYTE_UNITS:
+        return int(float(value[:-1]) * BYTE_UNITS[value[-1].lower()])
+    return int(value)
+
+
+class RetentionPolicy:
+    """
+    Limits on the data items a node keeps for each data item type: the most recent count,
+    those received in the last age seconds and as many as fit in a budget of bytes. The
+    tightest limit applies. Limits of the 'default' key apply to the types without their own,
+    and count falls back to the node trail length.
+    """
+
+    def __init__(self):
+        self.limits = dict()  # Limits by name indexed by data item type or 'default'
+
+    def set_limits(self, key, limits):
+        """Sets the limits of a data item name or number, or 'default', from a dict of limits by name."""
+        di_type = parse_type(str(key))
+        parsed = dict()
+        for name, value in limits.items():
+            if name not in LIMIT_NAMES:
+                raise ValueError("Unknown retention limit {} for {}, expected one of {}".format(name, key, ', '.join(LIMIT_NAMES)))
+            value = parse_bytes(value) if name == 'bytes' else (float(value) if name == 'age' else int(value))
+            if value <= 0:
+                raise ValueError("Retention limit {} for {} must be positive".format(name, key))
+            parsed[name] = value
+        self.limits.setdefault(di_type, dict()).update(parsed)
+
+    def parse_spec(self, spec):
+        """Sets limits from a TYPE:LIMIT=VALUE[,LIMIT=VALUE...] string, e.g. AccelerometerV2:age=10,count=2000"""
+        key, separator, limits = spec.partition(':')
+        if not separator or not limits:
+            raise ValueError("Retention limits must look like TYPE:LIMIT=VALUE[,LIMIT=VALUE...], got {}".format(spec))
+        parsed = dict()
+        for limit in limits.split(','):
+            name, separator, value = limit.partition('=')
+            if not separator:
+                raise ValueError("Retention limit must look like LIMIT=VALUE, got {}".format(limit))
+            parsed[name.strip()] = value.strip()
+        self.set_limits(key.strip(), parsed)
+
+    def load_file(self, path):
+        """Sets limits from a JSON object of limits by name, indexed by data item name, number or 'default'."""
+        with open(path) as retention_file:
+            config = json.load(retention_file)
+        if not isinstance(config, dict) or not all(isinstance(limits, dict) for limits in config.values()):
+            raise ValueError("{} must hold a JSON object of limits by data item type".format(path))
+        for key, limits in config.items():
+            self.set_limits(key, limits)
+
+    def get_limits(self, di_type):
+        limits = dict(self.limits.get(DEFAULT_KEY, ()))
+        limits.update(self.limits.get(di_type, ()))
+        return limits
+
+    def get_stream_limits(self, di_type, item_size, trail_length):
+        """
+        Returns the number of data items and the age in seconds, or None, to keep for a type.
+        A budget of bytes becomes a number of data items of item_size bytes, see get_data_item_size.
+        Node.update_item_sizes() calls it again as the estimate of item_size changes.
+        """
+        limits = self.get_limits(di_type)
+        count = limits.get('count', trail_length)
+        if 'bytes' in limits:
+            count = min(count, max(1, limits['bytes'] // item_size))
+        return count, limits.get('age')
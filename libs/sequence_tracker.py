@@ -0,0 +1,89 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Local libraries
+from settings import *
+
+SEQUENCE_MODULO = 1 << 32  # CDP header sequence numbers are 32 bit and wrap around
+
+
+class SequenceTracker:
+    """
+    Continuity of the CDP header sequence numbers of one device on one listening address.
+    The sequence numbers seen among the last SEQUENCE_WINDOW are kept as the bits of an
+    integer, so a packet arriving late fills its gap back in and is counted as reordered,
+    and a packet seen twice is counted as a duplicate.
+    """
+    __slots__ = ('window', 'highest', 'seen', 'span', 'received', 'lost', 'gaps', 'reordered', 'duplicates', 'resets')
+
+    def __init__(self, window=SEQUENCE_WINDOW):
+        self.window = window
+        self.highest = None  # Highest sequence number received
+        self.seen = 0        # Bit n is set when highest - n was received
+        self.span = 0        # Sequence numbers covered by the window so far
+        self.received = 0
+        self.lost = 0        # Sequence numbers skipped and not received since, in total
+        self.gaps = 0        # Number of times sequence numbers were skipped
+        self.reordered = 0
+        self.duplicates = 0
+        self.resets = 0      # Device restarts, seen as sequence jumps larger than SEQUENCE_RESET_GAP
+
+    def update(self, sequence):
+        if self.highest is None:
+            self.restart(sequence)
+            return
+
+        ahead = (sequence - self.highest) % SEQUENCE_MODULO
+        behind = SEQUENCE_MODULO - ahead
+        if ahead == 0:
+            self.duplicates += 1
+        elif ahead <= SEQUENCE_RESET_GAP:
+            self.received += 1
+            if ahead > 1:
+                self.gaps += 1
+                self.lost += ahead - 1
+            self.seen = ((self.seen << ahead) | 1) & ((1 << self.window) - 1)
+            self.span = min(self.span + ahead, self.window)
+            self.highest = sequence
+        elif behind < self.window:
+            bit = 1 << behind
+            if self.seen & bit:
+                self.duplicates += 1
+            elif behind < self.span:
+                self.received += 1
+                self.reordered += 1
+                self.lost -= 1
+                self.seen |= bit
+            else:
+                # Older than the first packet received, it was never counted as lost
+                self.received += 1
+                self.reordered += 1
+        elif behind <= SEQUENCE_RESET_GAP:
+            # Too late to tell a reordered packet from a duplicate
+            self.received += 1
+            self.reordered += 1
+        else:
+            self.resets += 1
+            self.restart(sequence)
+
+    def restart(self, sequence):
+        self.received += 1
+        self.highest = sequence
+        self.seen = 1
+        self.span = 1
+
+    def get_window_loss(self):
+        """Returns (missing, span) over the last SEQUENCE_WINDOW sequence numbers."""
+        # bin().count() rather than int.bit_count(), which needs Python 3.10
+        return self.span - bin(self.seen).count('1'), self.span
+
+
+def get_loss_percentage(trackers):
+    """Percentage of the sequence numbers missing from the windows of trackers, nan before any packet."""
+    missing = 0
+    span = 0
+    for tracker in trackers:
+        tracker_missing, tracker_span = tracker.get_window_loss()
+        missing += tracker_missing
+        span += tracker_span
+    return 100 * missing / span if span else float('nan')
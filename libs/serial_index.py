@@ -0,0 +1,138 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# System libraries
+import struct
+from bisect import bisect_left, insort
+from collections import deque
+from operator import attrgetter
+
+# Local libraries
+import cdp
+from lazy_data_item import LazyDataItem
+from rate_estimator import RateEstimator
+from settings import *
+
+SERIAL_STRUCT = struct.Struct('<I')
+INDEX_ENTRY_SIZE = 8 + 8 + 24  # Data item and time slots of the deques, and the time
+
+
+def get_serial_attribute(di_type):
+    """Returns the name of the first serial number attribute of a data item type, None without one."""
+    data_item_class = cdp.CDP.data_item_classes.get(di_type)
+    for attribute in getattr(data_item_class, 'definition', []):
+        if isinstance(attribute, cdp.DISerialNumberAttr):
+            return attribute.name
+    return None
+
+
+def get_serial_offset(di_type):
+    """
+    Returns the offset of the first serial number attribute in the bytes of a data item type,
+    None without one or when an attribute before it has no fixed size.
+    """
+    data_item_class = cdp.CDP.data_item_classes.get(di_type)
+    if data_item_class is None or '_decode' in vars(data_item_class):
+        return None
+    offset = 0
+    for attribute in data_item_class.definition:
+        if isinstance(attribute, cdp.DISerialNumberAttr):
+            return offset
+        if attribute.is_list or attribute.size < 0:
+            return None
+        offset += attribute.size
+    return None
+
+
+class SerialStream:
+    """Data items of one type a node reported about one embedded serial number, e.g. one tag seen by an anchor."""
+    __slots__ = ('data', 'times', 'count', 'rate')
+
+    def __init__(self, trail_length):
+        self.data = deque([], trail_length)
+        self.times = deque([], trail_length)  # Reception times, since UwbNetwork.time_initial
+        self.count = 0
+        self.rate = RateEstimator()           # Data items per second, read with get_rate(now since UwbNetwork.time_initial)
+
+
+class SerialIndex:
+    """
+    Data items of one type of a node grouped by the serial number embedded in them, with
+    their counts and rates, shared by every window. Node.update builds it from the data items
+    kept once a window asks for it with Node.get_serial_index, then adds them as they are received.
+    The serial number is the first serial number attribute of the type, e.g. source_serial_number
+    for TimedRxV5. It is read from the bytes of data items that are not decoded yet.
+    """
+
+    def __init__(self, di_type, trail_length, max_age=None):
+        self.attribute = get_serial_attribute(di_type)
+        self.get_decoded_serial = attrgetter(self.attribute + '.as_int')
+        self.offset = get_serial_offset(di_type)
+        self.trail_length = trail_length
+        self.max_age = max_age      # in seconds, like the max_age of the node stream
+        self.serials = dict()       # SerialStream indexed by embedded serial number
+        self.serial_numbers = []    # Embedded serial numbers in ascending order
+
+    def get_serial(self, data_item):
+        """Returns the embedded serial number of a data item as an int, without decoding it when possible."""
+        offset = self.offset
+        if type(data_item) is LazyDataItem:
+            # Read before the data item, decoding drops the packet once the data item is set
+            packet = data_item._packet
+            if packet is not None and offset is not None and data_item._end - data_item._start >= offset + 4:
+                return SERIAL_STRUCT.unpack_from(packet, data_item._start + offset)[0]
+            return self.get_decoded_serial(data_item)
+        attributes = data_item.__dict__
+        serial = attributes.get(self.attribute)
+        if serial is not None:
+            return serial.as_int
+        # Same as get_item_bytes(), without the call
+        data = attributes.get('di_data')
+        if data is not None and offset is not None and len(data) == attributes['di_size'] >= offset + 4:
+            return SERIAL_STRUCT.unpack_from(data, offset)[0]
+        return self.get_decoded_serial(data_item)
+
+    def add(self, data_item, time):
+        serial = self.get_serial(data_item)
+        stream = self.serials.get(serial)
+        if stream is None:
+            stream = SerialStream(self.trail_length)
+            self.serials[serial] = stream
+            # Replaced as a whole, windows may be iterating it
+            serial_numbers = list(self.serial_numbers)
+            insort(serial_numbers, serial)
+            self.serial_numbers = serial_numbers
+        stream.data.append(data_item)
+        stream.times.append(time)
+        stream.count += 1
+        stream.rate.add(time)
+        if self.max_age is not None:
+            # The data item just appended is never too old, so the loop stops
+            times = stream.times
+            oldest = time - self.max_age
+            while times[0] < oldest:
+                times.popleft()
+                stream.data.popleft()
+
+    def get_footprint(self, item_size, oldest):
+        """
+        Approximate bytes held by the index, with item_size bytes for each data item received
+        before oldest, the reception time of the oldest data item the node stream still holds.
+        Those are only kept by the index.
+        """
+        size = 0
+        for stream in list(self.serials.values()):
+            # Copied, the receiving thread may drop the oldest meanwhile
+            times = list(stream.times)
+            size += len(times) * INDEX_ENTRY_SIZE + bisect_left(times, oldest) * item_size
+        return size
+
+    def evict(self):
+        """Drops the data items, keeping the serial numbers and counts."""
+        for stream in list(self.serials.values()):
+            stream.data.clear()
+            stream.times.clear()
+
+    def clear(self):
+        self.serials = dict()
+        self.serial_numbers = []
@@ -8,6 +8,43 @@ UDP_IP = '239.255.76.67'
 UDP_PORT = 7667
 IFACE_IP = '127.0.0.1'
 
+###################
+# SOCKET DEFAULTS #
+###################
+MAX_CDP_PACKET_SIZE = 65536               # 2^16 is the max size of a CDP packet
+SOCKET_RECEIVE_BUFFER_SIZE = 4*1024*1024  # in bytes, requested SO_RCVBUF for every CDP socket
+RECEIVE_BUFFER_COUNT = 1024               # Number of preallocated datagram buffers per socket
+RECEIVE_BATCH_SIZE = 256                  # Max number of datagrams drained from a socket per wakeup
+DUPLICATE_WINDOW = 0.5                    # in seconds, how long a CDP packet id is remembered to drop duplicates
+
+INGEST_TIMING_SAMPLES = 1024              # Most recent datagrams used for the decode and update time percentiles
+INGEST_PERCENTILES = (50, 90, 99)
+
+SEQUENCE_WINDOW = 1024                    # CDP sequence numbers per source and stream used for the loss percentage and to spot reorders
+SEQUENCE_RESET_GAP = 0x10000              # Sequence jumps larger than this are a device restart, not a loss
+
+CAPTURE_EXTENSION = '.cdpcap'
+CAPTURE_INDEX_EXTENSION = '.cdpidx'
+CAPTURE_BLOCK_SIZE = 1024**2              # in bytes, received datagrams gathered before they are written to the capture file
+CAPTURE_FLUSH_INTERVAL = 1                # in seconds, longest a received datagram waits to be written to the capture file
+CAPTURE_ROTATE_SIZE = 1024**3             # in bytes, size at which a new capture file is started
+CAPTURE_ROTATE_TIME = 3600                # in seconds, age at which a new capture file is started
+CAPTURE_MAX_PENDING = 64*1024**2          # in bytes, datagrams waiting to be written before new ones are dropped
+CAPTURE_COMPRESSION = 'zlib'              # codec the blocks of the capture files are compressed with: none, zlib or lzma
+CAPTURE_COMPRESSION_LEVEL = 1             # zlib level or lzma preset, -1 for the codec default
+CAPTURE_DELTA = True                      # delta encode the reception times and CDP sequences of the capture files
+EXPORT_CHUNK_ROWS = 65536                 # Data items of a type gathered before their columns are written to the export files
+
+THREAD_ENGINE = 'threads'                 # One receiving thread, and one decoding thread, per listening address
+REACTOR_ENGINE = 'reactor'                # One thread receiving every listening address, and one decoding thread
+INGEST_ENGINES = (THREAD_ENGINE, REACTOR_ENGINE)
+
+#####################
+# HEADLESS DEFAULTS #
+#####################
+HEADLESS_REPORT_INTERVAL = 10             # in seconds, how often the statistics are written
+HEADLESS_TRAIL_LENGTH = 1                 # Data items kept per node and type, only counts are reported
+
 ######################
 # GLOBAL DEFINITIONS #
 ######################
@@ -19,9 +56,15 @@ ANT_DELAY = 16440
 MS_TO_SECONDS = .001
 
 TRAIL_LENGTH = 1000
+COLUMN_FLUSH_ROWS = 64  # Data items gathered before their numeric fields are written to the node columns
+MEMORY_BUDGET = 1024**3       # in bytes, data item history kept over every node before the least recently used is evicted
+MEMORY_BUDGET_TARGET = 0.9    # Fraction of the budget the history is evicted down to
+MEMORY_BUDGET_INTERVAL = 1    # in seconds, how often the footprint is measured
+ITEM_SIZE_SAMPLES = 16        # Most recent data items of each type their size is re-estimated from, every MEMORY_BUDGET_INTERVAL
+ITEM_SIZE_TOLERANCE = 0.1     # Fraction by which a byte budget's number of data items must change before the history is resized
 QPLOT_FREQUENCY = 100  #in mS
 FREQUENCY_CALCULATION_TIME_INTERVAL = 30 # in seconds
-FREQUENCY_CALCULATION_DEQUE_LENGTH = int(FREQUENCY_CALCULATION_TIME_INTERVAL / (QPLOT_FREQUENCY * MS_TO_SECONDS))
+RATE_BUCKET_LENGTH = 1 # in seconds, data items are counted per bucket to compute their rates at ingest
 TOTAL_PKTS_FOR_FREQ_CALC = 50
 NUM_PROCESSES = 1
 
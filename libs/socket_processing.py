@@ -3,30 +3,146 @@
 
 # System libraries
 import sys
+import select
 import socket
 import struct
 import time
 import ipaddress
-from pyqtgraph import QtCore
+import threading
 
 # Local libraries
 import cdp
-from collections import deque
+from datagram_ring import DatagramRing
+from duplicate_filter import DuplicateFilter
+from lazy_data_item import LazyDataItem, get_data_item_class, get_item_formats, make_decoded_item
 from network_objects import *
+from packet_parsing import parse_cdp_header, parse_data_items, select_data_items
 from settings import *
 
+# Linux only socket option that attaches the number of datagrams dropped by the kernel
+# (because the socket receive buffer was full) to every recvmsg call as ancillary data.
+SO_RXQ_OVFL = getattr(socket, 'SO_RXQ_OVFL', 40)
+unpack_rxq_ovfl = struct.Struct("=I").unpack
 
-class SocketProcessing(QtCore.QThread):
-    """Handling of CDP data reception. Uses Qt Thread to work with data plotting."""
-    raw_data = deque([])
+# Linux only socket option that attaches the time the kernel received every datagram to
+# recvmsg calls, as a CLOCK_REALTIME struct timespec of two native longs.
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+timespec = struct.Struct("@ll")
 
-    def __init__(self, ip, port, interface):
-        QtCore.QThread.__init__(self)
+# Data item types the cdp library decodes, any other type shows up as an Unknown type
+KNOWN_DATA_ITEM_TYPES = frozenset(cdp.CDP.data_item_classes)
+# struct formats of the data item types a DecodePool decodes in its processes
+DATA_ITEM_FORMATS = get_item_formats()
+
+
+def get_packet_filters():
+    """Snapshot of the device and type filters to apply before decoding, None when not filtering."""
+    device_filter = UwbNetwork.device_filter
+    type_filter = UwbNetwork.type_filter
+    if device_filter is not None: device_filter = frozenset(device_filter)
+    if type_filter is not None: type_filter = frozenset(type_filter)
+    return device_filter, type_filter
+
+
+def get_packet_node(serial_number, sequence, stream=None):
+    """Returns the node that sent a CDP packet, after tracking its sequence, or None while the node is paused."""
+    if not serial_number in UwbNetwork.nodes:
+        Node(serial_number)
+
+    node = UwbNetwork.nodes[serial_number]
+    # Packet loss is tracked even while paused, after duplicates were dropped
+    node.update_sequence(SocketProcessing.duplicate_filter.get_sequence_stream(stream), sequence)
+    if node.paused:
+        # Node.update discards everything while paused, do not bother building data items
+        return None
+    return node
+
+
+def update_node(node, data_items, timestamp=None):
+    """Updates node with the data items of one packet received at timestamp, now when not given. Returns the time spent."""
+    if timestamp is None:
+        timestamp = time.monotonic()
+    update_start = time.perf_counter()
+    for data_item in data_items:
+        node.update(data_item, data_item.di_name, timestamp)
+    return time.perf_counter() - update_start
+
+
+def apply_data_items(serial_number, sequence, packet, items, stream=None, timestamp=None):
+    """
+    Builds the data items of one CDP packet from their (type, start, end) offsets and updates the node that sent it.
+    stream is the listening address the packet was received on and timestamp the time.monotonic() at which it
+    was received, now when not given. Returns the time spent in Node.update, in seconds.
+    """
+    node = get_packet_node(serial_number, sequence, stream)
+    if node is None:
+        return 0.0
+
+    cdp_serial_number = cdp.CiholasSerialNumber(serial_number)
+    if UwbNetwork.lazy_decode:
+        data_items = [LazyDataItem(di_type, packet, start, end, sequence, cdp_serial_number) for di_type, start, end in items]
+    else:
+        data_items = []
+        for di_type, start, end in items:
+            data_item = get_data_item_class(di_type)(packet[start:end])
+            data_item.cdp_header_sequence = sequence
+            data_item.cdp_header_serial = cdp_serial_number
+            data_items.append(data_item)
+    return update_node(node, data_items, timestamp)
+
+
+def apply_decoded_items(serial_number, sequence, items, stream=None, timestamp=None):
+    """
+    Same as apply_data_items for the (type, size, values) records of a DecodePool, values being the
+    decoded attributes of the data item or its bytes.
+    """
+    node = get_packet_node(serial_number, sequence, stream)
+    if node is None:
+        return 0.0
+
+    cdp_serial_number = cdp.CiholasSerialNumber(serial_number)
+    data_items = []
+    for di_type, size, values in items:
+        if type(values) is bytes:
+            data_item = get_data_item_class(di_type)(values)
+            data_item.cdp_header_sequence = sequence
+            data_item.cdp_header_serial = cdp_serial_number
+        else:
+            data_item = make_decoded_item(di_type, size, values, sequence, cdp_serial_number)
+        data_items.append(data_item)
+    return update_node(node, data_items, timestamp)
+
+
+class SocketProcessing(threading.Thread):
+    """Handling of CDP data reception. Does not depend on Qt so it also runs headless."""
+    receive_buffer_size = SOCKET_RECEIVE_BUFFER_SIZE
+    queue_capacity = RECEIVE_BUFFER_COUNT
+    overflow_policy = DatagramRing.DROP_OLDEST
+    duplicate_filter = DuplicateFilter()  # Shared by every listening address
+    block_timeout = 0.250                 # Seconds to wait for a free slot with the block policy
+    print_timeouts = True                 # Show a time out on the console while no data is received
+    recorder = None                       # CaptureRecorder writing every received datagram, shared by every listening address
+
+    def __init__(self, ip, port, interface, decode_pool=None):
+        threading.Thread.__init__(self, daemon=True)
         self._stopevent = False
+        # Every listening address has its own ring of datagrams waiting to be decoded.
+        # When decoding happens in other processes, the ring lives in shared memory.
+        self.decode_pool = decode_pool
+        if self.decode_pool is None:
+            self.ring = DatagramRing(self.queue_capacity, overflow_policy=self.overflow_policy, key=(ip, port, interface))
+        else:
+            self.ring = self.decode_pool.create_ring((ip, port, interface), self.queue_capacity, self.overflow_policy)
+        # Datagrams that arrive while the ring is full are received here and discarded
+        self.discard_buffer = bytearray(MAX_CDP_PACKET_SIZE)
+        self.kernel_drops = None  # Only available on platforms supporting SO_RXQ_OVFL
+        self.kernel_timestamps = False  # Receive times come from the kernel on platforms supporting SO_TIMESTAMPNS
+        self.clock_offset = 0.0         # time.time() - time.monotonic(), to convert kernel receive times
 
         # Setup UDP socket for listening to CDP packets
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.set_receive_buffer_size()
 
         if ipaddress.ip_address(ip).is_multicast:
             try :
@@ -40,20 +156,134 @@ class SocketProcessing(QtCore.QThread):
 
         if sys.platform == 'win32': self.sock.bind((interface, port))
         else:                       self.sock.bind((ip, port))
-        self.sock.settimeout(0.250)
+        self.sock.setblocking(False)
+
+        self.ancillary_size = 0
+        if sys.platform.startswith('linux'):
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+                self.ancillary_size = socket.CMSG_SPACE(4)
+                self.kernel_drops = 0
+            except OSError as ose:
+                print("Kernel drop counter is not available on {}:{}: {}".format(ip, port, ose))
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+                self.ancillary_size += socket.CMSG_SPACE(timespec.size)
+                self.kernel_timestamps = True
+            except OSError as ose:
+                print("Kernel receive timestamps are not available on {}:{}: {}".format(ip, port, ose))
+
+    def set_receive_buffer_size(self):
+        """Requests a larger socket receive buffer so bursts are not dropped by the kernel."""
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer_size)
+        except OSError as ose:
+            print("Unable to set the socket receive buffer to {} bytes: {}".format(self.receive_buffer_size, ose))
+        # Linux doubles the requested value for bookkeeping and silently caps it at net.core.rmem_max
+        actual_size = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if sys.platform.startswith('linux'): actual_size //= 2
+        if actual_size < self.receive_buffer_size:
+            print("Socket receive buffer is {} bytes instead of {} bytes, consider raising net.core.rmem_max".format(actual_size, self.receive_buffer_size))
 
     def run(self):
         """Main thread loop. Listens to sockets and processes data"""
         while UwbNetwork.running and not self._stopevent:
-            try:
-                data, addr = self.sock.recvfrom(65536) # 2^16 is the max size of a CDP packet
-            except socket.timeout:
-                print("time out", end='\r', flush=True)
+            ready, _, _ = select.select([self.sock], [], [], 0.250)
+            if not ready:
+                if self.print_timeouts: print("time out", end='\r', flush=True)
                 continue
 
-            self.raw_data.append(data)
+            self.service()
         self.sock.close()
 
+    def service(self):
+        """
+        Receives the datagrams that are ready on the socket and hands them to the decode stage.
+        Returns the batch of (slot, nbytes) that was handed off.
+        """
+        batch = self.receive_batch()
+        self.ring.stats.record_received(batch)
+        if self.recorder is not None:
+            # Recorded as received, duplicates included
+            self.recorder.record(self.ring, batch)
+        batch = self.duplicate_filter.remove_duplicates(self.ring, batch)
+        if self.decode_pool is None:
+            self.ring.commit(batch)
+        else:
+            self.decode_pool.submit(self.ring, batch, *get_packet_filters())
+        return batch
+
+    def get_diagnostics(self):
+        """Counters, rates and timings of the listening address, from the socket to Node.update."""
+        diagnostics = self.ring.counters()
+        diagnostics['kernel_drops'] = self.kernel_drops
+        diagnostics.update(self.ring.stats.snapshot())
+        return diagnostics
+
+    def receive_batch(self):
+        """
+        Drains the datagrams that are ready on the socket directly into free slots of the ring.
+        Returns a list of (slot, nbytes) that still has to be committed to the ring.
+        """
+        batch = []
+        if self.kernel_timestamps:
+            self.clock_offset = time.time() - time.monotonic()
+        while len(batch) < RECEIVE_BATCH_SIZE:
+            idx = self.ring.reserve()
+            if idx is None:
+                if batch:
+                    # Hand off what was received so far, decoding it frees slots
+                    break
+                if self.ring.overflow_policy == DatagramRing.BLOCK:
+                    # Leave the datagrams in the socket until a decoder catches up
+                    if not self.ring.wait_for_slot(self.block_timeout):
+                        break
+                    continue
+                self.receive_overflow(batch)
+                break
+
+            try:
+                nbytes, self.ring.timestamps[idx] = self.receive_into(self.ring.slots[idx])
+            except (BlockingIOError, InterruptedError):
+                self.ring.release(idx)
+                break
+            batch.append((idx, nbytes))
+        return batch
+
+    def receive_overflow(self, batch):
+        """Receives one datagram while the ring is full and applies the overflow policy to it."""
+        try:
+            nbytes, timestamp = self.receive_into(self.discard_buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+
+        idx = None
+        if self.ring.overflow_policy == DatagramRing.DROP_OLDEST:
+            idx = self.ring.evict_oldest()
+        if idx is None:
+            self.ring.drop()
+        else:
+            self.ring.slots[idx][:nbytes] = self.discard_buffer[:nbytes]
+            self.ring.timestamps[idx] = timestamp
+            batch.append((idx, nbytes))
+
+    def receive_into(self, buffer):
+        """Receives one datagram into buffer. Returns its size and the time.monotonic() at which it was received."""
+        if not self.ancillary_size:
+            return self.sock.recv_into(buffer), time.monotonic()
+
+        nbytes, ancdata, flags, addr = self.sock.recvmsg_into([buffer], self.ancillary_size)
+        timestamp = None
+        for level, cmsg_type, cmsg_data in ancdata:
+            if level == socket.SOL_SOCKET and cmsg_type == SO_RXQ_OVFL:
+                self.kernel_drops, = unpack_rxq_ovfl(cmsg_data)
+            elif level == socket.SOL_SOCKET and cmsg_type == SO_TIMESTAMPNS:
+                seconds, nanoseconds = timespec.unpack(cmsg_data)
+                timestamp = seconds + nanoseconds * 1e-9 - self.clock_offset
+        if timestamp is None:
+            timestamp = time.monotonic()
+        return nbytes, timestamp
+
     def wait(self):
         self._stopevent = True
 
@@ -63,38 +293,89 @@ class SocketProcessing(QtCore.QThread):
 
 class CdpProcess(SocketProcessing):
 
-    def __init__(self):
-        QtCore.QThread.__init__(self)
-        self.buffer_empty_count = 0
+    def __init__(self, ring):
+        threading.Thread.__init__(self, daemon=True)
+        self.ring = ring
         self._stopevent = False
 
     def run(self):
         while UwbNetwork.running and not self._stopevent:
-            try:
-                packet = cdp.CDP(super(CdpProcess, self).raw_data.popleft())
-            except IndexError:
-                self.buffer_empty_count += 1
-                if self.buffer_empty_count > 20:
-                    self.usleep(1)
-                    self.buffer_empty_count = 0
-                continue
-            except ValueError as e:
-                if str(e) == 'Incomplete CDP Packet':
-                    print(e)
-                    pass
-                elif 'Unrecognized String' in str(e):
-                    print(e)
-                    continue
-                elif 'Packet Size Error' in str(e):
-                    continue
-                else:
-                    raise
+            # Sleeps until the receive thread commits datagrams, waking up regularly to check for stop
+            self.decode_slots(self.ring, self.ring.pop_batch(RECEIVE_BATCH_SIZE, 0.250))
+
+    def decode_slots(self, ring, slots):
+        # Data items decode lazily from the bytes they were created with,
+        # so copy the datagrams out of the ring before recycling the slots.
+        if not slots:
+            return
+        datagrams = [(bytes(ring.datagram(idx)), ring.timestamps[idx]) for idx in slots]
+        ring.release_batch(slots)
+
+        for data, timestamp in datagrams:
+            self.process_datagram(data, ring, timestamp)
+
+    def process_datagram(self, data, ring, timestamp):
+        """
+        Walks the CDP headers and only builds the data items the device and type filters want.
+        timestamp is the time.monotonic() at which the datagram was received.
+        """
+        stats = ring.stats
+        start = time.perf_counter()
+        try:
+            serial_number, sequence = parse_cdp_header(data)
+        except ValueError as e:
+            # Counted and skipped like the decode pool does, a bad packet must not stop the decoder
+            stats.record_error(str(e))
+            stats.record_decode(time.perf_counter() - start)
+            if 'Packet Size Error' not in str(e):
+                print(e)
+            return
+
+        update_time = 0.0
+        device_filter, type_filter = UwbNetwork.device_filter, UwbNetwork.type_filter
+        if device_filter is None or serial_number in device_filter:
+            items, leftover = parse_data_items(data)
+            if leftover:
+                # The complete data items before the truncated one are still used
+                stats.record_error('Incomplete CDP Packet')
+                print('Incomplete CDP Packet')
+            if type_filter is not None:
+                items = select_data_items(items, type_filter, KNOWN_DATA_ITEM_TYPES)
+
+            stats.record_queue_wait(time.monotonic() - timestamp)
+            update_time = apply_data_items(serial_number, sequence, data, items, ring.key, timestamp)
+            stats.record_update(update_time)
+        stats.record_decode(time.perf_counter() - start - update_time)
 
-            if not packet.serial_number.as_int in UwbNetwork.nodes:
-                Node(packet.serial_number.as_int)
+    def wait(self):
+        self._stopevent = True
+
+    def __del__(self):
+        self.wait()
+
+
+class CdpCollector(SocketProcessing):
+    """Builds the data items decoded by a DecodePool and applies them to the network nodes."""
+
+    def __init__(self, decode_pool):
+        threading.Thread.__init__(self, daemon=True)
+        self.decode_pool = decode_pool
+        self._stopevent = False
+
+    def run(self):
+        while UwbNetwork.running and not self._stopevent:
+            results = self.decode_pool.get_results(0.250)
+            if results is None:
+                continue
 
-            for data_item in packet.data_items:
-                UwbNetwork.nodes[packet.serial_number.as_int].update(data_item, data_item.di_name, time.monotonic())
+            ring, records = results
+            stream = None if ring is None else ring.key
+            for serial_number, sequence, items, timestamp in records:
+                if ring is not None:
+                    ring.stats.record_queue_wait(time.monotonic() - timestamp)
+                update_time = apply_decoded_items(serial_number, sequence, items, stream, timestamp)
+                if ring is not None:
+                    ring.stats.record_update(update_time)
 
     def wait(self):
         self._stopevent = True
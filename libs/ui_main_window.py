@@ -6,6 +6,7 @@ import numpy as np
 from functools import partial
 from pyqtgraph import QtCore, QtWidgets
 import time
+from datetime import datetime
 
 # Local libraries
 from cdp import *
@@ -13,12 +14,19 @@ from network_objects import *
 from network_discovery_window import NetworkDiscoveryWindow
 from type_filter_window import TypeFilterWindow
 from aggregate_plot_window import AggregatePlotWindow
+from columnar_export import export_history
+from diagnostics_window import DiagnosticsWindow
 from plots import *
 from settings import *
 from socket_processing import *
 
 
+def format_loss(loss_percentage):
+    return '-' if np.isnan(loss_percentage) else '{:.2f}%'.format(loss_percentage)
+
+
 class UiMainWindow(QtWidgets.QMainWindow):
+    replay = None  # CaptureReplay feeding the nodes, if any
 
     def __init__(self, num_processes, ip=None, port=None, ifc=None):
         super().__init__()
@@ -32,6 +40,7 @@ class UiMainWindow(QtWidgets.QMainWindow):
         self.network_discovery_window = NetworkDiscoveryWindow(num_processes, ip, port, ifc)
         self.aggregate_plot_window = AggregatePlotWindow()
         self.type_filter_window = TypeFilterWindow()
+        self.diagnostics_window = DiagnosticsWindow(self.network_discovery_window)
         self.network_discovery_window.show()
 
         self.type_filter_button = QtWidgets.QPushButton('Filter Data Types')
@@ -52,9 +61,17 @@ class UiMainWindow(QtWidgets.QMainWindow):
 
         self.toggle_pause_play_btn = QtWidgets.QPushButton('Pause')
         self.toggle_pause_play_btn.clicked.connect(self.toggle_pause_play)
-        self.grid_layout.addWidget(self.toggle_pause_play_btn, 3, 0, 1, 2)
+        self.grid_layout.addWidget(self.toggle_pause_play_btn, 3, 0)
         self.paused = False
 
+        self.diagnostics_btn = QtWidgets.QPushButton('Diagnostics')
+        self.diagnostics_btn.clicked.connect(self.open_diagnostics_window)
+        self.grid_layout.addWidget(self.diagnostics_btn, 3, 1)
+
+        self.export_btn = QtWidgets.QPushButton('Export History')
+        self.export_btn.clicked.connect(self.export_history)
+        self.grid_layout.addWidget(self.export_btn, 1, 2)
+
         self.serial_title = QtWidgets.QLabel('SERIAL NUM')
         self.serial_title.setStyleSheet(GetTitleColor())
         self.serial_title.setAlignment(QtCore.Qt.AlignCenter)
@@ -65,11 +82,18 @@ class UiMainWindow(QtWidgets.QMainWindow):
         self.total_count_title.setAlignment(QtCore.Qt.AlignCenter)
         self.serial_title.setMargin(5)
 
+        self.loss_title = QtWidgets.QLabel('LOSS')
+        self.loss_title.setStyleSheet(GetTitleColor())
+        self.loss_title.setAlignment(QtCore.Qt.AlignCenter)
+        self.loss_title.setMargin(5)
+
         self.grid_layout.addWidget(self.serial_title, 4, 0)
         self.grid_layout.addWidget(self.total_count_title, 4, 1)
+        self.grid_layout.addWidget(self.loss_title, 4, 2)
 
         self.serial_labels = dict()
         self.total_count_labels = dict()
+        self.loss_labels = dict()
         self.count = 0
 
         self.central.setLayout(self.grid_layout)
@@ -98,10 +122,13 @@ class UiMainWindow(QtWidgets.QMainWindow):
 
 
         if self.type_filter_window.filtering and not self.currently_filtering:
+            # Types left out of the filter are skipped before they are even decoded
+            UwbNetwork.type_filter = self.type_filter_window.current_types
             for serial in UwbNetwork.nodes:
                 UwbNetwork.nodes[serial].start_filtering(self.type_filter_window.current_types)
                 self.currently_filtering = True
         elif not self.type_filter_window.filtering and self.currently_filtering:
+            UwbNetwork.type_filter = None
             for serial in UwbNetwork.nodes:
                 UwbNetwork.nodes[serial].stop_filtering()
                 self.currently_filtering = False
@@ -115,18 +142,31 @@ class UiMainWindow(QtWidgets.QMainWindow):
             self.total_count_labels.update([(self.count, QtWidgets.QLabel())])
             self.total_count_labels[self.count].setAlignment(QtCore.Qt.AlignCenter)
 
+            self.loss_labels.update([(self.count, QtWidgets.QLabel())])
+            self.loss_labels[self.count].setAlignment(QtCore.Qt.AlignCenter)
+
             _row = self.count % 25
-            _column = 2 * int((self.count) / 25)
+            _column = 3 * int((self.count) / 25)
             self.grid_layout.addWidget(self.serial_labels[self.count], _row + 5, _column + 0)
             self.grid_layout.addWidget(self.total_count_labels[self.count], _row + 5, _column + 1)
+            self.grid_layout.addWidget(self.loss_labels[self.count], _row + 5, _column + 2)
 
             self.count += 1
 
+        UwbNetwork.memory_budget.update(UwbNetwork.nodes)
+        summary = UwbNetwork.memory_budget.get_summary()
+        if SocketProcessing.recorder is not None:
+            summary += ' - ' + SocketProcessing.recorder.get_summary()
+        if self.replay is not None:
+            summary += ' - ' + self.replay.get_summary()
+        self.statusBar().showMessage(summary)
+
         if UwbNetwork.nodes.keys():
             _ids = np.sort(list(UwbNetwork.nodes.keys()))
             for _row in range(self.count):
                 self.serial_labels[_row].setText('0x{:08X}'.format(_ids[_row]))
                 self.total_count_labels[_row].setText('{:7d}'.format(UwbNetwork.nodes[_ids[_row]].cdp_total))
+                self.loss_labels[_row].setText(format_loss(UwbNetwork.nodes[_ids[_row]].get_loss_percentage()))
 
     def closeEvent(self, e):
         UwbNetwork.running = False
@@ -134,6 +174,7 @@ class UiMainWindow(QtWidgets.QMainWindow):
         for _type_val, _plot in self.plot_windows.items():
             _plot.close()
 
+        self.diagnostics_window.close()
         self.network_discovery_window.close()
         exit()
 
@@ -163,10 +204,20 @@ class UiMainWindow(QtWidgets.QMainWindow):
         self.network_discovery_window.show()
         self.network_discovery_window.reopen()
 
+    def open_diagnostics_window(self):
+        self.diagnostics_window.activateWindow()
+        self.diagnostics_window.show()
+
     def open_aggregate_plots_window(self):
         self.aggregate_plot_window.activateWindow()
         self.aggregate_plot_window.show()
 
+    def export_history(self):
+        """Exports the data items every node holds to numpy archives in a new directory of the working directory."""
+        directory = 'cuwb_export_{}'.format(datetime.now().strftime('%Y%m%d_%H%M%S'))
+        rows = export_history(UwbNetwork.nodes, directory)
+        print("Exported {} rows of {} data types to {}".format(sum(rows.values()), len(rows), directory))
+
     def reset_all_windows(self):
         for node in UwbNetwork.nodes:
             UwbNetwork.nodes[node].reset()
@@ -319,9 +370,9 @@ class StatsWindow(QtWidgets.QMainWindow):
 
                 self.type_count += 1
 
-            for type in UwbNetwork.nodes[self.serial].cdp_pkts.keys():
-                UwbNetwork.nodes[self.serial].cdp_pkts_frequency_deques[type].append((UwbNetwork.nodes[self.serial].cdp_pkts_count[type], time.monotonic()))
-                UwbNetwork.nodes[self.serial].cdp_pkts_freq[type] = UwbNetwork.nodes[self.serial].calculate_frequency(UwbNetwork.nodes[self.serial].cdp_pkts_frequency_deques[type])
+            _sequence_counters = UwbNetwork.nodes[self.serial].get_sequence_counters()
+            self.statusBar().showMessage('Loss: {} - Lost: {lost} - Gaps: {gaps} - Reordered: {reordered} - Duplicates: {duplicates} - Restarts: {resets}'.format(
+                format_loss(UwbNetwork.nodes[self.serial].get_loss_percentage()), **_sequence_counters))
 
             _cdp_types = np.sort(list(UwbNetwork.nodes[self.serial].cdp_pkts.keys()))
             for _row in range(self.type_count):
@@ -343,7 +394,8 @@ class StatsWindow(QtWidgets.QMainWindow):
                 _previous_count = self.count_labels[_row].text()
                 if _previous_count: _previous_count = int(_previous_count)
                 self.count_labels[_row].setText('{:5d}'.format(UwbNetwork.nodes[self.serial].cdp_pkts_count[_cdp_types[_row]]))
-                self.disp_freqs[_row].setText('{:0.3f} Hz'.format(UwbNetwork.nodes[self.serial].cdp_pkts_freq[_cdp_types[_row]]))
+                _freq = 0 if UwbNetwork.nodes[self.serial].paused else UwbNetwork.nodes[self.serial].cdp_pkts_freq[_cdp_types[_row]]
+                self.disp_freqs[_row].setText('{:0.3f} Hz'.format(_freq))
                 if not _previous_count: _previous_count = int(self.count_labels[_row].text())
 
 
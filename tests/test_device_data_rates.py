@@ -0,0 +1,40 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Run from the repository root: python -m pytest tests
+
+import os
+import struct
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libs'))
+
+import pytest
+
+from network_objects import UwbNetwork, Node, DEVICE_DATA_TYPE
+
+
+class DeviceDataStandIn:
+    """The device_data bytes of a DeviceData data item, as the DeviceData window reads them."""
+    type = DEVICE_DATA_TYPE
+
+    def __init__(self, device_id, ddi_type, sequence):
+        payload = b'v1.0'
+        self.device_data = struct.pack('<BIBH', 0, device_id, sequence, ddi_type << 6 | len(payload)) + payload
+
+
+def test_device_data_rates_are_counted_at_ingest(monkeypatch):
+    UwbNetwork.nodes.clear()
+    node = Node(0x1000)
+    for index in range(20):
+        node.update(DeviceDataStandIn(0x400, 1, index), 'DeviceData', UwbNetwork.time_initial + index * 0.5)
+        if index % 2 == 0:
+            node.update(DeviceDataStandIn(0x400, 4, index), 'DeviceData', UwbNetwork.time_initial + index * 0.5)
+
+    monkeypatch.setattr('time.monotonic', lambda: UwbNetwork.time_initial + 10)
+    assert node.get_device_data_rate(0x400, 1) == pytest.approx(19 / 10)
+    assert node.get_device_data_rate(0x400, 4) == pytest.approx(9 / 10)
+    assert node.get_device_data_rate(0x401, 1) == 0
+
+    node.pause()
+    assert node.get_device_data_rate(0x400, 1) == 0
@@ -0,0 +1,72 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Run from the repository root: python -m pytest tests
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libs'))
+
+import cdp
+from lazy_data_item import LazyDataItem, get_item_bytes
+from network_objects import UwbNetwork, Node
+from retention_policy import RetentionPolicy, get_data_item_size
+
+
+def make_undecoded_item(data_item):
+    packet = cdp.CDP(serial_number=0x1000)
+    packet.add_data_item(data_item)
+    return list(cdp.CDP(packet.encode()).data_items)[0]
+
+
+def make_lazy_item():
+    packet = cdp.CDP(serial_number=0x1000)
+    packet.add_data_item(cdp.PositionV3(serial_number=cdp.CiholasSerialNumber(0x2000), network_time=1,
+                                        x=1, y=-1, z=2, quality=100, anchor_count=4, flags=0, smoothing=0))
+    packet_bytes = packet.encode()
+    # The data item follows the CDP header, its 4 byte type and size included
+    item_bytes = packet.data_items[0]._encode()
+    start = len(packet_bytes) - len(item_bytes) + 4
+    return LazyDataItem(cdp.PositionV3.type, packet_bytes, start, len(packet_bytes), 1, packet.serial_number)
+
+
+def test_lazy_item_is_sized_without_decoding():
+    data_item = make_lazy_item()
+    undecoded_size = get_data_item_size(data_item)
+    assert data_item._data_item is None
+    assert data_item.x == 1
+
+    assert get_data_item_size(data_item) > undecoded_size
+
+
+def test_item_is_sized_from_its_bytes_without_decoding():
+    temperature = make_undecoded_item(cdp.TemperatureV2(serial_number=cdp.CiholasSerialNumber(0x2000), temperature=1, scale=1))
+    position = make_undecoded_item(cdp.PositionV3(serial_number=cdp.CiholasSerialNumber(0x2000), network_time=1,
+                                                  x=1, y=-1, z=2, quality=100, anchor_count=4, flags=0, smoothing=0))
+    size_difference = get_data_item_size(position) - get_data_item_size(temperature)
+    assert get_item_bytes(temperature) is not None and get_item_bytes(position) is not None
+    assert size_difference == position.di_size - temperature.di_size
+
+
+def test_byte_budget_follows_the_item_size_estimate(monkeypatch):
+    UwbNetwork.nodes.clear()
+    retention_policy = RetentionPolicy()
+    retention_policy.set_limits('PositionV3', dict(bytes=100000))
+    monkeypatch.setattr(Node, 'retention_policy', retention_policy)
+    node = Node(0x1000)
+    for index in range(200):
+        node.update(make_lazy_item(), 'PositionV3', UwbNetwork.time_initial + index)
+    stream = node.streams[cdp.PositionV3.type]
+    undecoded_length = stream.data.maxlen
+    assert undecoded_length == 100000 // get_data_item_size(make_lazy_item())
+
+    # Windows decode the data items, the next estimate keeps fewer of them from the next data item on
+    for data_item in stream.data:
+        data_item.x
+    node.update_item_sizes()
+    assert stream.data.maxlen == undecoded_length
+    node.update(make_lazy_item(), 'PositionV3', UwbNetwork.time_initial + 200)
+    assert stream.data.maxlen == 100000 // stream.item_size < undecoded_length
+    assert len(stream.data) == len(stream.times) == stream.data.maxlen
+    assert stream.resized_length is None
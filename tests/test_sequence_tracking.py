@@ -0,0 +1,80 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Run from the repository root: python -m pytest tests
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libs'))
+
+import cdp
+from datagram_ring import DatagramRing
+from duplicate_filter import DuplicateFilter
+from network_objects import UwbNetwork
+from settings import RECEIVE_BATCH_SIZE
+from socket_processing import SocketProcessing, CdpProcess
+
+SERIAL = 0x1234
+INTERFACES = ('10.0.0.1', '10.0.0.2')
+
+
+def make_packet(sequence):
+    packet = cdp.CDP(serial_number=SERIAL)
+    packet.sequence = sequence
+    return packet.encode()
+
+
+def receive_on_every_interface(monkeypatch, duplicate_window, count=4000, missing=()):
+    """
+    Every packet of one device arrives on two interfaces, the copies in a random order. missing
+    holds the (sequence, interface) of the copies that never arrive.
+    """
+    UwbNetwork.nodes.clear()
+    duplicate_filter = DuplicateFilter(duplicate_window)
+    rings = [DatagramRing(16, key=('239.255.76.67', 7667, interface)) for interface in INTERFACES]
+    decoder = CdpProcess(rings[0])
+    random.seed(1)
+    # The decoders key the sequences with the shared filter
+    monkeypatch.setattr(SocketProcessing, 'duplicate_filter', duplicate_filter)
+    for sequence in range(count):
+        data = make_packet(sequence)
+        for ring in random.sample(rings, len(rings)):
+            if (sequence, ring.key[2]) in missing:
+                continue
+            idx = ring.reserve()
+            ring.slots[idx][:len(data)] = data
+            ring.timestamps[idx] = time.monotonic()
+            ring.commit(duplicate_filter.remove_duplicates(ring, [(idx, len(data))]))
+            decoder.decode_slots(ring, ring.pop_batch(RECEIVE_BATCH_SIZE, 0))
+    return UwbNetwork.nodes[SERIAL]
+
+
+def test_two_interfaces_without_loss(monkeypatch):
+    node = receive_on_every_interface(monkeypatch, duplicate_window=0.5)
+    counters = node.get_sequence_counters()
+    assert counters['received'] == 4000
+    assert counters['lost'] == 0
+    assert counters['gaps'] == 0
+    assert node.get_loss_percentage() == 0
+
+
+def test_two_interfaces_without_duplicate_filter(monkeypatch):
+    # Every listening address sees the complete stream, the copies are not losses either
+    node = receive_on_every_interface(monkeypatch, duplicate_window=0)
+    counters = node.get_sequence_counters()
+    assert counters['received'] == 8000
+    assert counters['lost'] == 0
+    assert node.get_loss_percentage() == 0
+
+
+def test_two_interfaces_with_loss(monkeypatch):
+    # Only packets missing on every interface are lost
+    missing = {(100, INTERFACES[0]), (200, INTERFACES[1]), (300, INTERFACES[0]), (300, INTERFACES[1])}
+    node = receive_on_every_interface(monkeypatch, duplicate_window=0.5, missing=missing)
+    counters = node.get_sequence_counters()
+    assert counters['received'] == 3999
+    assert counters['lost'] == 1
+    assert counters['gaps'] == 1
@@ -0,0 +1,68 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Run from the repository root: python -m pytest tests
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libs'))
+
+import cdp
+from lazy_data_item import LazyDataItem
+from network_objects import UwbNetwork, Node
+from serial_index import INDEX_ENTRY_SIZE
+
+
+def make_packet(source_serial):
+    packet = cdp.CDP(serial_number=0x1000)
+    packet.add_data_item(cdp.TimedRxV5(source_serial_number=cdp.CiholasSerialNumber(source_serial)))
+    return packet.encode()
+
+
+def make_undecoded_item(source_serial):
+    return list(cdp.CDP(make_packet(source_serial)).data_items)[0]
+
+
+def make_lazy_item(source_serial):
+    packet = make_packet(source_serial)
+    size = len(cdp.TimedRxV5()._encode()) - 4
+    return LazyDataItem(cdp.TimedRxV5.type, packet, len(packet) - size, len(packet), 1, cdp.CiholasSerialNumber(0x1000))
+
+
+def test_index_is_built_once_requested_without_decoding():
+    UwbNetwork.nodes.clear()
+    node = Node(0x1000)
+    data_items = [make_undecoded_item(0x30), make_lazy_item(0x10), make_undecoded_item(0x30)]
+    node.update(data_items[0], 'TimedRxV5', UwbNetwork.time_initial)
+    node.update(data_items[1], 'TimedRxV5', UwbNetwork.time_initial + 1)
+    assert node.get_serial_index(cdp.TimedRxV5.type) is None
+    assert node.streams[cdp.TimedRxV5.type].serial_index is None
+
+    # Built on the next data item from those kept
+    node.update(data_items[2], 'TimedRxV5', UwbNetwork.time_initial + 2)
+    assert 'source_serial_number' not in data_items[2].__dict__
+    assert data_items[1]._data_item is None
+    serial_index = node.get_serial_index(cdp.TimedRxV5.type)
+    assert serial_index.serial_numbers == [0x10, 0x30]
+    assert serial_index.serials[0x30].count == 2
+    assert list(serial_index.serials[0x30].data) == [data_items[0], data_items[2]]
+
+    # Decoded data items are indexed from their attributes
+    data_items[0].source_serial_number
+    node.update(data_items[0], 'TimedRxV5', UwbNetwork.time_initial + 3)
+    assert serial_index.serials[0x30].count == 3
+
+
+def test_footprint_counts_the_data_items_only_the_index_holds(monkeypatch):
+    UwbNetwork.nodes.clear()
+    monkeypatch.setattr(Node, 'trail_length', 4)
+    node = Node(0x1000)
+    node.get_serial_index(cdp.TimedRxV5.type)
+    node.update(make_undecoded_item(0x10), 'TimedRxV5', UwbNetwork.time_initial)
+    for index in range(4):
+        node.update(make_undecoded_item(0x30), 'TimedRxV5', UwbNetwork.time_initial + 1 + index)
+
+    # The data item of 0x10 left the node stream, only the index keeps it
+    stream = node.streams[cdp.TimedRxV5.type]
+    assert stream.get_footprint() == 5 * stream.item_size + 5 * INDEX_ENTRY_SIZE
@@ -0,0 +1,90 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Run from the repository root: python -m pytest tests
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libs'))
+
+import pytest
+
+import cdp
+from network_objects import UwbNetwork, Node
+
+
+def make_temperatures(count):
+    return [cdp.TemperatureV2(serial_number=cdp.CiholasSerialNumber(0x2000), temperature=index, scale=1)
+            for index in range(count)]
+
+
+def update(node, data_items):
+    for data_item in data_items:
+        node.update(data_item, data_item.di_name, UwbNetwork.time_initial + data_item.temperature)
+
+
+def test_resync_returns_the_data_items_dropped():
+    UwbNetwork.nodes.clear()
+    node = Node(0x1000)
+    data_items = make_temperatures(20)
+    subscription = node.subscribe(cdp.TemperatureV2.type, capacity=4)
+    update(node, data_items[:3])
+    assert subscription.read() == (data_items[:3], pytest.approx([0, 1, 2]), 0)
+
+    update(node, data_items[3:10])
+    read_items, read_times, overrun = subscription.read()
+    assert read_items == data_items[3:7] and overrun == 3
+
+    resync_items, resync_times, first_unread = node.resync(cdp.TemperatureV2.type, subscription)
+    assert resync_items == data_items[:10]
+    assert resync_times == pytest.approx(list(range(10)))
+    assert first_unread == 3
+
+    update(node, data_items[10:12])
+    assert subscription.read() == (data_items[10:12], pytest.approx([10, 11]), 0)
+
+
+def test_resync_drops_the_pending_data_items():
+    UwbNetwork.nodes.clear()
+    node = Node(0x1000)
+    data_items = make_temperatures(8)
+    subscription = node.subscribe(cdp.TemperatureV2.type, capacity=2)
+    update(node, data_items[:5])
+    assert subscription.read()[2] == 3
+
+    # Received after the overrun was read, before resync
+    update(node, data_items[5:6])
+    resync_items, resync_times, first_unread = node.resync(cdp.TemperatureV2.type, subscription)
+    assert resync_items == data_items[:6] and first_unread == 0
+
+    update(node, data_items[6:8])
+    assert subscription.read() == (data_items[6:8], pytest.approx([6, 7]), 0)
+
+
+def test_callback_is_called_on_every_push():
+    UwbNetwork.nodes.clear()
+    node = Node(0x1000)
+    data_items = make_temperatures(4)
+    notified = []
+    subscription = node.subscribe(cdp.TemperatureV2.type, capacity=2, callback=notified.append)
+    update(node, data_items)
+    assert notified == [subscription] * 4
+
+    # Overruns are notified too, the reader catches up with resync
+    read_items, read_times, overrun = subscription.read()
+    assert read_items == data_items[:2] and overrun == 2
+
+
+def test_history_pairs_the_data_items_with_their_times():
+    UwbNetwork.nodes.clear()
+    node = Node(0x1000)
+    data_items = make_temperatures(4)
+    update(node, data_items[:3])
+
+    # The receiving thread appended a data item, not its time yet
+    stream = node.streams[cdp.TemperatureV2.type]
+    stream.data.append(data_items[3])
+    history_items, history_times = stream.get_history()
+    assert history_items == data_items[:3]
+    assert history_times == pytest.approx([0, 1, 2])
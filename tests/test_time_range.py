@@ -0,0 +1,44 @@
+# Ciholas, Inc. - www.ciholas.com
+# Licensed under: creativecommons.org/licenses/by/4.0
+
+# Run from the repository root: python -m pytest tests
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'libs'))
+
+import pytest
+
+import cdp
+from network_objects import UwbNetwork, Node
+
+
+def make_node(count):
+    UwbNetwork.nodes.clear()
+    node = Node(0x1000)
+    data_items = [cdp.TemperatureV2(serial_number=cdp.CiholasSerialNumber(0x2000), temperature=index, scale=1)
+                  for index in range(count)]
+    for data_item in data_items:
+        node.update(data_item, data_item.di_name, UwbNetwork.time_initial + data_item.temperature)
+    return node, data_items
+
+
+def test_time_range_returns_the_data_items_received_within_it():
+    node, data_items = make_node(20)
+    range_items, range_times = node.get_time_range(cdp.TemperatureV2.type, 4.5, 9)
+    assert range_items == data_items[5:9]
+    assert range_times == pytest.approx([5, 6, 7, 8])
+
+    assert node.get_time_range(cdp.TemperatureV2.type, -10, 2)[0] == data_items[:2]
+    assert node.get_time_range(cdp.TemperatureV2.type, 18, 100)[0] == data_items[18:]
+    assert node.get_time_range(cdp.TemperatureV2.type, 9, 9) == ([], [])
+    assert node.get_time_range(cdp.TemperatureV2.type, 30, 40) == ([], [])
+    assert node.get_time_range(cdp.PositionV3.type, 0, 10) == ([], [])
+
+
+def test_time_range_skips_the_data_items_dropped():
+    node, data_items = make_node(Node.trail_length + 10)
+    range_items, range_times = node.get_time_range(cdp.TemperatureV2.type, 0, 15)
+    assert range_items == data_items[10:15]
+    assert range_times == pytest.approx([10, 11, 12, 13, 14])